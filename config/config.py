@@ -47,7 +47,47 @@ class Config:
             "task_ignore_result": _get_bool_env("CELERY_TASK_IGNORE_RESULT"),
             "result_expires": int(_get_env("CELERY_RESULT_EXPIRES")),
             "broker_connection_retry_on_startup": _get_bool_env("CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP"),
+            "beat_schedule": {
+                "flush-retrieval-records": {
+                    "task": "internal.task.dataset_task.flush_retrieval_records",
+                    "schedule": float(_get_env("RETRIEVAL_RECORD_FLUSH_INTERVAL")),
+                },
+                "reconcile-dataset-counters": {
+                    "task": "internal.task.dataset_task.reconcile_dataset_counters",
+                    "schedule": float(_get_env("DATASET_COUNTER_RECONCILE_INTERVAL")),
+                },
+            },
         }
+        self.RETRIEVAL_RECORD_FLUSH_BATCH_SIZE = int(_get_env("RETRIEVAL_RECORD_FLUSH_BATCH_SIZE"))
+        self.DATASET_COUNTER_RECONCILE_BATCH_SIZE = int(_get_env("DATASET_COUNTER_RECONCILE_BATCH_SIZE"))
+
+        # 智能体推理步骤存储配置
+        self.AGENT_THOUGHT_ASYNC_SAVE = _get_bool_env("AGENT_THOUGHT_ASYNC_SAVE")
+
+        # 会话后台任务配置
+        self.CONVERSATION_BACKGROUND_WORKERS = int(_get_env("CONVERSATION_BACKGROUND_WORKERS"))
+        self.CONVERSATION_BACKGROUND_MAX_PENDING = int(_get_env("CONVERSATION_BACKGROUND_MAX_PENDING"))
+        self.CONVERSATION_SUMMARY_DEBOUNCE = float(_get_env("CONVERSATION_SUMMARY_DEBOUNCE"))
+
+        # 应用运行时缓存配置
+        self.APP_RUNTIME_CACHE_SIZE = int(_get_env("APP_RUNTIME_CACHE_SIZE"))
+
+        # 工作流编译缓存配置
+        self.WORKFLOW_CACHE_SIZE = int(_get_env("WORKFLOW_CACHE_SIZE"))
+
+        # 知识库文档构建流水线配置，解析/关键词提取进程数、阶段间队列长度、跨文档向量写入批次大小
+        self.INDEXING_PARSE_WORKERS = int(_get_env("INDEXING_PARSE_WORKERS"))
+        self.INDEXING_KEYWORD_WORKERS = int(_get_env("INDEXING_KEYWORD_WORKERS"))
+        self.INDEXING_QUEUE_SIZE = int(_get_env("INDEXING_QUEUE_SIZE"))
+        self.INDEXING_VECTOR_BATCH_SIZE = int(_get_env("INDEXING_VECTOR_BATCH_SIZE"))
+        self.INDEXING_INCREMENTAL = _get_bool_env("INDEXING_INCREMENTAL")
+        self.INDEXING_ENABLED_UPDATE_WORKERS = int(_get_env("INDEXING_ENABLED_UPDATE_WORKERS"))
+        self.INDEXING_ENABLED_UPDATE_BATCH_SIZE = int(_get_env("INDEXING_ENABLED_UPDATE_BATCH_SIZE"))
 
         # 辅助Agent应用id标识
         self.ASSISTANT_AGENT_ID = _get_env("ASSISTANT_AGENT_ID")
+
+        # 运维账号邮箱列表
+        self.OPERATOR_ACCOUNT_EMAILS = [
+            email.strip() for email in _get_env("OPERATOR_ACCOUNT_EMAILS").split(",") if email.strip()
+        ]
@@ -31,6 +31,42 @@ DEFAULT_CONFIG = {
     "CELERY_RESULT_EXPIRES": 3600,
     "CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP": "True",
 
+    # 检索记录批量落库配置，定时任务执行间隔(秒)及每批写入的记录数
+    "RETRIEVAL_RECORD_FLUSH_INTERVAL": 10,
+    "RETRIEVAL_RECORD_FLUSH_BATCH_SIZE": 1000,
+
+    # 知识库计数校准配置，定时任务执行间隔(秒)及每批校准的知识库数
+    "DATASET_COUNTER_RECONCILE_INTERVAL": 3600,
+    "DATASET_COUNTER_RECONCILE_BATCH_SIZE": 500,
+
+    # 流式对话结束后是否交由Celery异步存储智能体推理步骤
+    "AGENT_THOUGHT_ASYNC_SAVE": "False",
+
+    # 会话后台任务配置，工作线程数、等待队列上限及摘要防抖时间(秒)
+    "CONVERSATION_BACKGROUND_WORKERS": 4,
+    "CONVERSATION_BACKGROUND_MAX_PENDING": 1000,
+    "CONVERSATION_SUMMARY_DEBOUNCE": 3,
+
+    # 应用运行时缓存配置，每个进程最多缓存的应用运行时数
+    "APP_RUNTIME_CACHE_SIZE": 128,
+
+    # 工作流编译缓存配置，每个进程最多缓存的编译后工作流图程序数
+    "WORKFLOW_CACHE_SIZE": 64,
+
+    # 知识库文档构建流水线配置(每个Celery worker)
+    "INDEXING_PARSE_WORKERS": 2,
+    "INDEXING_KEYWORD_WORKERS": 2,
+    "INDEXING_QUEUE_SIZE": 4,
+    "INDEXING_VECTOR_BATCH_SIZE": 32,
+    "INDEXING_INCREMENTAL": "True",
+
+    # 文档启用状态同步配置(向量数据库批量更新并发数及每批节点数)
+    "INDEXING_ENABLED_UPDATE_WORKERS": 4,
+    "INDEXING_ENABLED_UPDATE_BATCH_SIZE": 200,
+
     # 辅助Agent智能体应用id
-    "ASSISTANT_AGENT_ID": "6774fcef-b594-8008-b30c-a05b8190afe6"
+    "ASSISTANT_AGENT_ID": "6774fcef-b594-8008-b30c-a05b8190afe6",
+
+    # 运维账号邮箱列表(逗号分隔)，只有运维账号可以查看进程内执行器、缓存等运行统计信息
+    "OPERATOR_ACCOUNT_EMAILS": "",
 }
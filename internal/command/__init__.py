@@ -0,0 +1,10 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 21:05
+#Author  :Emcikem
+@File    :__init__.py.py
+"""
+from .app_statistic_command import backfill_app_statistics
+
+__all__ = ["backfill_app_statistics"]
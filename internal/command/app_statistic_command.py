@@ -0,0 +1,32 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 21:05
+#Author  :Emcikem
+@File    :app_statistic_command.py
+"""
+from datetime import date, timedelta
+from typing import Optional
+
+import click
+from flask.cli import with_appcontext
+
+
+@click.command("backfill-app-statistics")
+@click.option("--start-date", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="开始日期(包含)，默认为30天前")
+@click.option("--end-date", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="结束日期(包含)，默认为今天")
+@click.option("--app-id", type=click.UUID, default=None, help="只回填指定应用，默认回填全部应用")
+@with_appcontext
+def backfill_app_statistics(start_date, end_date, app_id: Optional[str]) -> None:
+    """根据消息表重建指定日期范围内的应用每日统计，用法：flask backfill-app-statistics --start-date 2026-01-01"""
+    from app.http.module import injector
+    from internal.service import AppStatisticService
+
+    # 1.计算回填的日期区间[start_date, end_date)
+    end_date = end_date.date() + timedelta(days=1) if end_date else date.today() + timedelta(days=1)
+    start_date = start_date.date() if start_date else end_date - timedelta(days=31)
+
+    # 2.逐天重建应用每日统计
+    app_statistic_service = injector.get(AppStatisticService)
+    total = app_statistic_service.backfill(start_date, end_date, app_id)
+    click.echo(f"应用每日统计回填完成，日期范围：{start_date} ~ {end_date - timedelta(days=1)}，写入记录数：{total}")
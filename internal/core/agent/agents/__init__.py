@@ -6,8 +6,9 @@
 @File    :__init__.py.py
 """
 from .agent_queue_manager import AgentQueueManager
+from .agent_stream_aggregator import AgentStreamAggregator
 from .base_agent import BaseAgent
 from .function_call_agent import FunctionCallAgent
 from .react_agent import ReACTAgent
 
-__all__ = ["BaseAgent", "FunctionCallAgent", "ReACTAgent", "AgentQueueManager"]
+__all__ = ["BaseAgent", "FunctionCallAgent", "ReACTAgent", "AgentQueueManager", "AgentStreamAggregator"]
@@ -0,0 +1,70 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 21:30
+#Author  :Emcikem
+@File    :agent_event_benchmark.py
+"""
+import time
+import tracemalloc
+import uuid
+from queue import Queue
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage, messages_to_dict
+
+from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+
+
+def build_messages(history_rounds: int) -> list:
+    """构造包含系统预设、多轮历史及工具结果的长会话消息列表"""
+    messages = [SystemMessage("你是一个知识库问答助手，请根据检索到的上下文回答用户的问题。" * 60)]
+    for index in range(history_rounds):
+        messages.append(HumanMessage(f"第{index}轮提问：请总结一下这份文档的主要内容。" * 10))
+        messages.append(AIMessage(f"第{index}轮回答：文档主要介绍了知识库的构建流程与检索策略。" * 30))
+    messages.append(ToolMessage(tool_call_id="call_1", name="dataset_retrieval", content="检索到的片段内容。" * 400))
+    return messages
+
+
+def publish_events(messages: list, chunk_count: int, delta_only: bool) -> Queue:
+    """模拟LLM节点流式输出，delta_only为False时每个片段事件都携带完整的消息列表(旧协议)"""
+    q = Queue()
+    task_id = uuid.uuid4()
+    event_id = uuid.uuid4()
+    for _ in range(chunk_count):
+        q.put(AgentThought(
+            id=event_id,
+            task_id=task_id,
+            event=QueueEvent.AGENT_MESSAGE,
+            thought="片段",
+            message=[] if delta_only else messages_to_dict(messages),
+            answer="片段",
+        ))
+    q.put(AgentThought(
+        id=event_id,
+        task_id=task_id,
+        event=QueueEvent.AGENT_MESSAGE,
+        message=messages_to_dict(messages),
+    ))
+    return q
+
+
+def measure(messages: list, chunk_count: int, delta_only: bool) -> tuple[float, float]:
+    """返回事件全部滞留在队列中(消费端落后)时的内存峰值(MB)及耗时(秒)"""
+    tracemalloc.start()
+    start_at = time.perf_counter()
+    q = publish_events(messages, chunk_count, delta_only)
+    elapsed = time.perf_counter() - start_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del q
+    return peak / 1024 / 1024, elapsed
+
+
+if __name__ == "__main__":
+    messages = build_messages(20)
+
+    peak, elapsed = measure(messages, 500, False)
+    print(f"full message per chunk: peak {peak:.2f}MB, {elapsed:.2f}s")
+
+    peak, elapsed = measure(messages, 500, True)
+    print(f"delta only: peak {peak:.2f}MB, {elapsed:.2f}s")
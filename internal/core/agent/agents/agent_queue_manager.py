@@ -19,22 +19,13 @@ from internal.entity.conversation_entity import InvokeFrom
 
 
 class AgentQueueManager:
-    """智能体队列管理器"""
-    user_id: UUID
-    task_id: UUID
-    invoke_from: InvokeFrom
+    """智能体队列管理器，任务归属(用户及调用来源)在创建任务队列时传递，同一个管理器可以服务多个用户的任务"""
     redis_client: Redis
     _queues: dict[str, Queue]
 
-    def __init__(
-            self,
-            user_id: UUID,
-            invoke_from: InvokeFrom,
-    ) -> None:
+    def __init__(self) -> None:
         """构造函数，初始化智能体队列管理器"""
         # 1.初始化数据集
-        self.user_id = user_id
-        self.invoke_from = invoke_from
         self._queues = {}
 
         # 2.内部初始化redis_client
@@ -93,6 +84,10 @@ class AgentQueueManager:
         """停止监听队列信息"""
         self.queue(task_id).put(None)
 
+    def remove_queue(self, task_id: UUID) -> None:
+        """监听结束后移除任务对应的队列，避免复用的智能体中队列字典无限增长"""
+        self._queues.pop(str(task_id), None)
+
     def publish(self, task_id: UUID, agent_thought: AgentThought) -> None:
         """发布时间信息到队列"""
         # 1.将事件添加到队列中
@@ -120,30 +115,26 @@ class AgentQueueManager:
             return True
         return False
 
+    def create_queue(self, task_id: UUID, user_id: UUID, invoke_from: InvokeFrom) -> Queue:
+        """根据传递的task_id创建任务队列，并记录任务归属的用户及调用来源"""
+        # 1.添加缓存标识
+        user_prefix = "account" if invoke_from in [
+            InvokeFrom.WEB_APP, InvokeFrom.DEBUGGER, InvokeFrom.ASSISTANT_AGENT
+        ] else 'end-user'
+
+        # 2.设置任务对应的缓存健，代表这次任务已经开始了
+        self.redis_client.setex(
+            self.generate_task_belong_cache_key(task_id),
+            1800,
+            f"{user_prefix}-{str(user_id)}",
+        )
+
+        # 3.将任务队列添加到队列字典中
+        return self.queue(task_id)
+
     def queue(self, task_id: UUID) -> Queue:
-        """根据传递的task_id获取对应的任务队列消息"""
-        # 1.从队列字典中获取对应的任务队列
-        q = self._queues.get(str(task_id))
-
-        # 2.检测队列是否存在，如果不存在则创建队列，并添加缓存标识
-        if not q:
-            # 3.添加缓存标识
-            user_prefix = "account" if self.invoke_from in [
-                InvokeFrom.WEB_APP, InvokeFrom.DEBUGGER, InvokeFrom.ASSISTANT_AGENT
-            ] else 'end-user'
-
-            # 4.设置任务对应的缓存健，代表这次任务已经开始了
-            self.redis_client.setex(
-                self.generate_task_belong_cache_key(task_id),
-                1800,
-                f"{user_prefix}-{str(self.user_id)}",
-            )
-
-            # 5.将任务队列添加到队列字典中
-            q = Queue()
-            self._queues[str(task_id)] = q
-
-        return q
+        """根据传递的task_id获取对应的任务队列消息，不存在时创建"""
+        return self._queues.setdefault(str(task_id), Queue())
 
     @classmethod
     def set_stop_flag(cls, task_id: UUID, invoke_from: InvokeFrom, user_id: UUID) -> None:
@@ -0,0 +1,82 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 21:45
+#Author  :Emcikem
+@File    :agent_stream_aggregator.py
+"""
+import json
+from typing import Any, Generator, Iterable
+
+from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
+
+# SSE事件默认输出的智能体事件字段
+DEFAULT_SSE_FIELDS = {
+    "event", "thought", "observation", "tool", "tool_input", "answer",
+    "total_token_count", "total_price", "latency",
+}
+
+
+class AgentStreamAggregator:
+    """智能体流式事件聚合器，按事件id聚合智能体事件，agent_message事件的thought/answer增量写入列表缓冲区，
+    其余字段以该事件id的最后一个事件为准，结束时每个事件只拼接一次，整体耗时与事件数成线性关系"""
+
+    def __init__(self) -> None:
+        """构造函数，初始化事件字典及缓冲区"""
+        self._agent_thoughts: dict[str, AgentThought] = {}
+        self._thought_buffers: dict[str, list[str]] = {}
+        self._answer_buffers: dict[str, list[str]] = {}
+
+    def add(self, agent_thought: AgentThought) -> None:
+        """添加一个智能体事件，ping事件不参与聚合，agent_message事件为叠加，其余事件均为覆盖"""
+        if agent_thought.event == QueueEvent.PING:
+            return
+
+        event_id = str(agent_thought.id)
+        if agent_thought.event == QueueEvent.AGENT_MESSAGE:
+            if event_id not in self._thought_buffers:
+                self._thought_buffers[event_id] = []
+                self._answer_buffers[event_id] = []
+            self._thought_buffers[event_id].append(agent_thought.thought)
+            self._answer_buffers[event_id].append(agent_thought.answer)
+        self._agent_thoughts[event_id] = agent_thought
+
+    def aggregate(
+            self,
+            agent_thoughts: Iterable[AgentThought],
+            fields: set[str] = None,
+            **extra: Any,
+    ) -> Generator[str, None, None]:
+        """聚合智能体事件流，同时将每个事件编码成SSE数据帧返回，extra为每个数据帧额外携带的字段"""
+        for agent_thought in agent_thoughts:
+            self.add(agent_thought)
+            yield self.encode(agent_thought, fields, **extra)
+
+    @classmethod
+    def encode(cls, agent_thought: AgentThought, fields: set[str] = None, **extra: Any) -> str:
+        """将智能体事件编码成SSE数据帧，数据涵盖指定的事件字段、事件id、任务id及extra字段"""
+        data = {
+            **agent_thought.model_dump(include=fields or DEFAULT_SSE_FIELDS),
+            "id": str(agent_thought.id),
+            **extra,
+            "task_id": str(agent_thought.task_id),
+        }
+        return f"event: {agent_thought.event}\ndata:{json.dumps(data)}\n\n"
+
+    @property
+    def agent_thoughts(self) -> list[AgentThought]:
+        """只读属性，返回聚合后的智能体事件列表，顺序为每个事件id首次出现的顺序"""
+        agent_thoughts = []
+        for event_id, agent_thought in self._agent_thoughts.items():
+            if agent_thought.event == QueueEvent.AGENT_MESSAGE and event_id in self._thought_buffers:
+                agent_thought = agent_thought.model_copy(update={
+                    "thought": "".join(self._thought_buffers[event_id]),
+                    "answer": "".join(self._answer_buffers[event_id]),
+                })
+            agent_thoughts.append(agent_thought)
+        return agent_thoughts
+
+    @property
+    def answer(self) -> str:
+        """只读属性，返回所有agent_message事件拼接后的答案"""
+        return "".join("".join(answer_buffer) for answer_buffer in self._answer_buffers.values())
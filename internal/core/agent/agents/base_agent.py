@@ -9,6 +9,7 @@ import uuid
 from abc import abstractmethod
 from threading import Thread
 from typing import Optional, Any, Iterator
+from uuid import UUID
 
 from pydantic import PrivateAttr
 
@@ -19,8 +20,10 @@ from langgraph.graph.state import CompiledStateGraph
 
 from internal.core.agent.entities.agent_entity import AgentConfig, AgentState
 from internal.core.agent.entities.queue_entity import AgentResult, AgentThought, QueueEvent
+from internal.entity.conversation_entity import InvokeFrom
 from internal.exception import FailException
 from .agent_queue_manager import AgentQueueManager
+from .agent_stream_aggregator import AgentStreamAggregator
 
 class BaseAgent(Serializable, Runnable):
     """基于Runnable的智能体基类"""
@@ -43,18 +46,15 @@ class BaseAgent(Serializable, Runnable):
         """构造函数，初始化智能体图结构程序"""
         super().__init__(*args, llm=llm, agent_config=agent_config, **kwargs)
         self._agent = self._build_agent()
-        self._agent_queue_manager = AgentQueueManager(
-            user_id=agent_config.user_id,
-            invoke_from=agent_config.invoke_from,
-        )
+        self._agent_queue_manager = AgentQueueManager()
 
     @abstractmethod
     def _build_agent(self) -> CompiledStateGraph:
         """构建智能体函数，等待子类实现"""
         raise NotImplementedError("_build_agent()未实现")
 
-    def invoke(self, input: AgentState, config: Optional[RunnableConfig] = None) -> AgentResult:
-        """块内容响应，一次性生成完整内容后返回"""
+    def invoke(self, input: AgentState, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AgentResult:
+        """块内容响应，一次性生成完整内容后返回，kwargs(user_id、invoke_from)透传给stream"""
         # 1.调用stream法法获取流式事件输出数据
         content = input["messages"][0].content
         query = ""
@@ -66,48 +66,30 @@ class BaseAgent(Serializable, Runnable):
             image_urls = [chunk["image_url"]["url"] for chunk in content if chunk.get("type") == "image_url"]
 
         agent_result = AgentResult(query=query, image_urls=image_urls)
-        agent_thoughts = {}
-        for agent_thought in self.stream(input, config):
-            # 2.提取事件id并转换成字符串
-            event_id = str(agent_thought.id)
-
-            # 3.除了ping事件，其他事件全部记录
-            if agent_thought.event != QueueEvent.PING:
-                # 4.单独处理agent_message事件，因为该事件为数据叠加
-                if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                    # 5.检测是否已经存储了事件
-                    if event_id not in agent_thoughts:
-                        # 6.初始化智能体消息事件
-                        agent_thoughts[event_id] = agent_thought
-                    else:
-                        # 7.叠加智能体消息事件
-                        agent_thoughts[event_id] = agent_thoughts[event_id].model_copy(update={
-                            "thought": agent_thoughts[event_id].thought + agent_thought.thought,
-                            "answer": agent_thoughts[event_id].answer + agent_thought.answer,
-                            "latency": agent_thought.latency,
-                        })
-                    # 8.更新智能体消息答案
-                    agent_result.answer += agent_thought.answer
-                else:
-                    # 9.除了其他类型的智能体事件，类型均为覆盖
-                    agent_thoughts[event_id] = agent_thought
-
-                    # 10.单独判断是否为异常消息类型，如果是则修改状态并记录错误
-                    if agent_thought.event in [QueueEvent.STOP, QueueEvent.TIMEOUT, QueueEvent.ERROR]:
-                        agent_result.error = agent_thought.observation if agent_thought.event == QueueEvent.ERROR else ""
-
-        # 11.将推理字典转换成列表并存储
-        agent_result.agent_thoughts = [agent_thought for agent_thought in agent_thoughts.values()]
-
-        # 12.完善message
+        aggregator = AgentStreamAggregator()
+        for agent_thought in self.stream(input, config, **kwargs):
+            # 2.使用聚合器聚合事件，agent_message事件为数据叠加，其他事件均为覆盖
+            aggregator.add(agent_thought)
+
+        # 3.提取聚合后的推理列表与答案
+        agent_thoughts = aggregator.agent_thoughts
+        agent_result.agent_thoughts = agent_thoughts
+        agent_result.answer = aggregator.answer
+
+        # 4.单独判断是否存在异常消息类型，如果是则记录错误
+        for agent_thought in agent_thoughts:
+            if agent_thought.event in [QueueEvent.STOP, QueueEvent.TIMEOUT, QueueEvent.ERROR]:
+                agent_result.error = agent_thought.observation if agent_thought.event == QueueEvent.ERROR else ""
+
+        # 5.完善message
         agent_result.message = next(
-            (agent_thought.message for agent_thought in agent_thoughts.values()
+            (agent_thought.message for agent_thought in agent_thoughts
             if agent_thought.event == QueueEvent.AGENT_MESSAGE),
             []
         )
 
-        # 13.更新总耗时
-        agent_result.latency = sum([agent_thought.latency for agent_thought in agent_thoughts.values()])
+        # 6.更新总耗时
+        agent_result.latency = sum([agent_thought.latency for agent_thought in agent_thoughts])
 
         return agent_result
 
@@ -115,9 +97,12 @@ class BaseAgent(Serializable, Runnable):
         self,
         input: AgentState,
         config: Optional[RunnableConfig] = None,
+        user_id: Optional[UUID] = None,
+        invoke_from: InvokeFrom = InvokeFrom.WEB_APP,
         **kwargs: Optional[Any],
     ) -> Iterator[AgentThought]:
-        """流式输出，每个not节点或者LLM每生成一个token时则会返回相应内容"""
+        """流式输出，每个not节点或者LLM每生成一个token时则会返回相应内容，
+        user_id及invoke_from在每次调用时传递，用于标记任务归属及工具调用身份，因此构建好的智能体可以在多个用户间复用"""
         # 1.检测子类是否已构成Agent智能体，如果未构建则抛出错误
         if not self._agent:
             raise FailException("智能体未成功构建，请核实后尝试")
@@ -127,15 +112,21 @@ class BaseAgent(Serializable, Runnable):
         input["history"] = input.get("history", [])
         input["iteration_count"] = input.get("iteration_count", 0)
 
-        # 3.创建子线程并执行
+        # 3.创建任务队列并记录任务归属
+        self._agent_queue_manager.create_queue(input["task_id"], user_id, invoke_from)
+
+        # 4.创建子线程并执行，调用身份通过configurable传递给工具节点
         thread = Thread(
             target=self._agent.invoke,
-            args=(input,),
+            args=(input, {"configurable": {"user_id": user_id, "invoke_from": invoke_from}}),
         )
         thread.start()
 
-        # 4.调用队列管理器监听数据并返回迭代器
-        yield from self._agent_queue_manager.listen(input["task_id"])
+        # 5.调用队列管理器监听数据并返回迭代器，监听结束(含客户端断开)后移除任务队列
+        try:
+            yield from self._agent_queue_manager.listen(input["task_id"])
+        finally:
+            self._agent_queue_manager.remove_queue(input["task_id"])
 
     @property
     def agent_queue_manager(self) -> AgentQueueManager:
@@ -18,6 +18,7 @@ from langchain_core.messages import (
     RemoveMessage,
     messages_to_dict, AIMessage, AIMessageChunk
 )
+from langchain_core.runnables import RunnableConfig
 from langgraph.constants import END
 from langgraph.graph import StateGraph
 from langgraph.graph.state import CompiledStateGraph
@@ -187,12 +188,12 @@ class FunctionCallAgent(BaseAgent):
                         for keyword in review_config["keywords"]:
                             content = re.sub(re.escape(keyword), "**", content, flags=re.IGNORECASE)
 
+                    # 8.流式片段事件只携带增量内容，推理使用的消息列表在该步骤的最后一个事件中统一携带
                     self.agent_queue_manager.publish(state["task_id"], AgentThought(
                         id=id,
                         task_id=state["task_id"],
                         event=QueueEvent.AGENT_MESSAGE,
                         thought=content,
-                        message=messages_to_dict(state["messages"]),
                         answer=content,
                         latency=(time.perf_counter() - start_at),
                     ))
@@ -201,18 +202,18 @@ class FunctionCallAgent(BaseAgent):
             self.agent_queue_manager.publish_error(state["task_id"], f"LLM节点发生错误，错误消息:{str(e)}")
             raise e
 
-        # 8.计算LLM的输入+输出token总数
+        # 9.计算LLM的输入+输出token总数
         input_token_count = self.llm.get_num_tokens_from_messages(state["messages"])
         output_token_count = self.llm.get_num_tokens_from_messages([gathered])
 
-        # 9.获取输入/输出价格和单位
+        # 10.获取输入/输出价格和单位
         input_price, output_price, unit = self.llm.get_pricing()
 
-        # 10.计算总token+总成本
+        # 11.计算总token+总成本
         total_token_count = input_token_count + output_token_count
         total_price = (input_token_count * input_price + output_price * output_token_count) * unit
 
-        # 11.如果类型为推理则添加智能体推理事件
+        # 12.如果类型为推理则添加智能体推理事件
         if generation_type == "thoughts":
             self.agent_queue_manager.publish(state["task_id"], AgentThought(
                 id=id,
@@ -235,7 +236,7 @@ class FunctionCallAgent(BaseAgent):
                 latency=(time.perf_counter() - start_at),
             ))
         elif generation_type == "message":
-            # 8.如果LLM直接生成answer则表示已经拿到了最终答案，推送一条空内容用户计算总token+总成本，并停止监听
+            # 13.如果LLM直接生成answer则表示已经拿到了最终答案，推送一条空内容并携带消息列表快照及总token+总成本，并停止监听
             self.agent_queue_manager.publish(state["task_id"], AgentThought(
                 id=id,
                 task_id=state["task_id"],
@@ -264,10 +265,15 @@ class FunctionCallAgent(BaseAgent):
 
         return {"messages": [gathered], "iteration": state["iteration_count"] + 1}
 
-    def _tools_node(self, state: AgentState) -> AgentState:
-        """工具执行节点"""
-        # 1.将工具立本转换成字典，便于调用指定的工具
+    def _tools_node(self, state: AgentState, config: RunnableConfig) -> AgentState:
+        """工具执行节点，本次调用的用户及调用来源通过config传递给工具(如知识库检索)"""
+        # 1.将工具立本转换成字典，便于调用指定的工具，并提取本次调用的身份信息
         tools_by_name = {tool.name: tool for tool in self.agent_config.tools}
+        configurable = config.get("configurable", {})
+        tool_config = RunnableConfig(configurable={
+            "user_id": configurable.get("user_id"),
+            "invoke_from": configurable.get("invoke_from"),
+        })
 
         # 2.提取消息中的工具调用参数
         tool_calls = state["messages"][-1].tool_calls
@@ -282,7 +288,7 @@ class FunctionCallAgent(BaseAgent):
             try:
                 # 5.获取工具并调用工具
                 tool = tools_by_name[tool_call["name"]]
-                tool_result = tool.invoke(tool_call["args"])
+                tool_result = tool.invoke(tool_call["args"], tool_config)
             except Exception as e:
                 # 6.添加错误工具消息
                 tool_result = f"工具执行出错：{str(e)}"
@@ -134,12 +134,12 @@ class ReACTAgent(FunctionCallAgent):
                     for keyword in review_config["keywords"]:
                         content = re.sub(re.escape(keyword), "**", content, flags=re.IGNORECASE)
 
+                # 流式片段事件只携带增量内容，推理使用的消息列表在该步骤的最后一个事件中统一携带
                 self.agent_queue_manager.publish(state["task_id"], AgentThought(
                     id=id,
                     task_id=state["task_id"],
                     event=QueueEvent.AGENT_MESSAGE,
                     thought=content,
-                    message=messages_to_dict(state["messages"]),
                     answer=content,
                     latency=(time.perf_counter() - start_at),
                 ))
@@ -158,7 +158,6 @@ class ReACTAgent(FunctionCallAgent):
                             task_id=state["task_id"],
                             event=QueueEvent.AGENT_MESSAGE,
                             thought=gathered.content,
-                            message=messages_to_dict(state["messages"]),
                             answer=gathered.content,
                             latency=(time.perf_counter() - start_at),
                         ))
@@ -218,12 +217,11 @@ class ReACTAgent(FunctionCallAgent):
                     task_id=state["task_id"],
                     event=QueueEvent.AGENT_MESSAGE,
                     thought=gathered.content,
-                    message=messages_to_dict(state["messages"]),
                     answer=gathered.content,
                     latency=(time.perf_counter() - start_at),
                 ))
 
-        # 14.如果LLM直接生成answer则表示已经拿到了最终答案，推送一条空内容用户计算总token+总成本，并停止监听
+        # 14.如果LLM直接生成answer则表示已经拿到了最终答案，推送一条空内容并携带消息列表快照及总token+总成本，并停止监听
         if generation_type == "message":
             self.agent_queue_manager.publish(state["task_id"], AgentThought(
                 id=id,
@@ -13,7 +13,6 @@ from langchain_core.tools import BaseTool
 from langgraph.graph import MessagesState
 
 from internal.entity.app_entity import DEFAULT_APP_CONFIG
-from internal.entity.conversation_entity import InvokeFrom
 
 # Agent智能体系统预设提示词模版
 AGENT_SYSTEM_PROMPT_TEMPLATE = """你是一个高度定制的智能体应用，旨在为用户提供准确，专业的内容生成和问题解答，请严格遵守一下规则：
@@ -96,11 +95,8 @@ REACT_AGENT_SYSTEM_PROMPT_TEMPLATE = """你是一个高度定制的智能体应
 </工具描述>"""
 
 class AgentConfig(BaseModel):
-    """智能体配置信息，涵盖：LLM大语言模型、预设prompt、关联插件、知识库、工作流、是否开启长期记忆内容、后期可以随时扩展"""
-    # 用户的唯一标识及调用来源，默认来源是WEB_APP
-    user_id: UUID
-    invoke_from: InvokeFrom = InvokeFrom.WEB_APP
-
+    """智能体配置信息，涵盖：LLM大语言模型、预设prompt、关联插件、知识库、工作流、是否开启长期记忆内容、后期可以随时扩展，
+    用户的唯一标识及调用来源不属于配置，在调用智能体时传递"""
     # 最大迭代次数
     MAX_ITERATION_COUNT: int = 5
 
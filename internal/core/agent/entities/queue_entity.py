@@ -27,7 +27,8 @@ class QueueEvent(str, Enum):
     PING = "ping" # ping联通事件
 
 class AgentThought(BaseModel):
-    """智能体推理观察事件内容"""
+    """智能体推理观察事件内容，同一个id的agent_message事件为流式片段，片段事件只携带thought/answer增量，
+    推理使用的消息列表及token、价格、耗时等统计数据只在该步骤的最后一个事件中携带一次"""
     id: UUID # 事件对应的id，同一个事件的id是一样的
     task_id: UUID # 任务id
 
@@ -41,7 +42,7 @@ class AgentThought(BaseModel):
     tool_input: dict = Field(default_factory=dict) # 工具的输入
 
     # 消息相关的数据
-    message: list[dict] = Field(default_factory=dict) # 推理使用的消息列表
+    message: list[dict] = Field(default_factory=list) # 推理使用的消息列表，只在步骤的最后一个事件中携带
     message_token_count: int = 0 # 消息花费的token数
     message_unit_price: float = 0  # 单价
     message_price_unit: float = 0  # 价格单价
@@ -7,9 +7,10 @@
 """
 import os.path
 import tempfile
+from concurrent.futures import Executor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Union
+from typing import Union, Optional
 
 import requests
 from injector import inject
@@ -40,19 +41,32 @@ class FileExtractor:
             self,
             upload_file: UploadFile,
             return_text: bool = False,
-            is_unstructured: bool = True
+            is_unstructured: bool = True,
+            executor: Optional[Executor] = None,
     ) -> Union[list[LCDocument], str]:
         """加载传入的upload_file记录，返回Langchain文档列表或者字符串"""
+        return self.load_from_key(upload_file.key, return_text, is_unstructured, executor)
+
+    def load_from_key(
+            self,
+            key: str,
+            return_text: bool = False,
+            is_unstructured: bool = True,
+            executor: Optional[Executor] = None,
+    ) -> Union[list[LCDocument], str]:
+        """加载对象存储中指定key的文件，传递executor(如进程池)时文件解析将在该执行器中运行"""
         # 1.创建一个临时的文件夹
         with tempfile.TemporaryDirectory() as temp_dir:
             # 2.构建一个临时文件路径
-            file_path = os.path.join(temp_dir, os.path.basename(upload_file.key))
+            file_path = os.path.join(temp_dir, os.path.basename(key))
 
             # 3.将队形存储中的文件下载到本地
-            self.cos_service.download_file(upload_file.key, file_path)
+            self.cos_service.download_file(key, file_path)
 
             # 4.从指定的路径中去加载文件
-            return self.load_from_file(file_path, return_text, is_unstructured)
+            if executor is None:
+                return self.load_from_file(file_path, return_text, is_unstructured)
+            return executor.submit(self.load_from_file, file_path, return_text, is_unstructured).result()
 
     @classmethod
     def load_from_url(
@@ -7,8 +7,10 @@
 """
 from .semantic_retriever import SemanticRetriever
 from .full_text_retriever import FullTextRetriever
+from .hybrid_retriever import HybridRetriever
 
 __all__ = [
     "SemanticRetriever",
     "FullTextRetriever",
+    "HybridRetriever",
 ]
\ No newline at end of file
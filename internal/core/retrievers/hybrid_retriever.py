@@ -0,0 +1,82 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 15:02
+#Author  :Emcikem
+@File    :hybrid_retriever.py
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document as LCDocument
+from langchain_core.retrievers import BaseRetriever
+from pydantic import Field
+
+from .full_text_retriever import FullTextRetriever
+from .semantic_retriever import SemanticRetriever
+
+# 混合检索共享的线程池，用于并行执行相似性检索(含query向量计算)
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid_retriever")
+
+
+class HybridRetriever(BaseRetriever):
+    """混合检索器，并行执行相似性检索与全文检索，使用加权RRF融合结果，并按segment_id去重"""
+    semantic_retriever: SemanticRetriever
+    full_text_retriever: FullTextRetriever
+    weights: list[float] = Field(default_factory=lambda: [0.5, 0.5])
+    rrf_k: int = 60
+    k: int = 4
+    timings: dict[str, float] = Field(default_factory=dict)
+
+    def _get_relevant_documents(
+            self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[LCDocument]:
+        """根据传递的query并行执行两路检索并融合结果，各阶段耗时(秒)记录在timings中"""
+        # 1.相似性检索(含query向量计算)不涉及数据库会话，投递到线程池执行，全文检索在当前线程(应用上下文)中执行
+        start = time.perf_counter()
+        semantic_future = _executor.submit(self._timed, self.semantic_retriever.invoke, query)
+        full_text_documents, full_text_time = self._timed(self.full_text_retriever.invoke, query)
+        semantic_documents, semantic_time = semantic_future.result()
+
+        # 2.使用RRF合并两路检索结果
+        fusion_start = time.perf_counter()
+        lc_documents = self._rrf_fusion([semantic_documents, full_text_documents])
+
+        # 3.记录各阶段耗时
+        self.timings = {
+            "semantic": semantic_time,
+            "full_text": full_text_time,
+            "fusion": time.perf_counter() - fusion_start,
+            "total": time.perf_counter() - start,
+        }
+
+        return lc_documents[:self.k]
+
+    def _rrf_fusion(self, documents_list: list[list[LCDocument]]) -> list[LCDocument]:
+        """使用加权倒数排名融合(RRF)合并多路检索结果"""
+        scores: dict[str, float] = {}
+        documents: dict[str, LCDocument] = {}
+        for lc_documents, weight in zip(documents_list, self.weights):
+            for rank, lc_document in enumerate(lc_documents, start=1):
+                segment_id = str(lc_document.metadata["segment_id"])
+                scores[segment_id] = scores.get(segment_id, 0) + weight / (self.rrf_k + rank)
+                documents.setdefault(segment_id, lc_document)
+
+        return self._sort_documents(documents, scores)
+
+    @classmethod
+    def _sort_documents(cls, documents: dict[str, LCDocument], scores: dict[str, float]) -> list[LCDocument]:
+        """按照融合得分从高到低排序，并将融合得分写入文档元数据"""
+        sorted_ids = sorted(scores.keys(), key=lambda segment_id: scores[segment_id], reverse=True)
+        for segment_id in sorted_ids:
+            documents[segment_id].metadata["score"] = scores[segment_id]
+        return [documents[segment_id] for segment_id in sorted_ids]
+
+    @classmethod
+    def _timed(cls, func: Callable[[str], Any], query: str) -> tuple[Any, float]:
+        """执行传递的检索函数，并返回结果及耗时"""
+        start = time.perf_counter()
+        result = func(query)
+        return result, time.perf_counter() - start
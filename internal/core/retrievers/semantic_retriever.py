@@ -5,43 +5,38 @@
 #Author  :Emcikem
 @File    :semantic_retriever.py
 """
-from typing import List
 from uuid import UUID
 
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document as LCDocument
 from pydantic import Field
 from langchain_core.retrievers import BaseRetriever
-from langchain_weaviate import WeaviateVectorStore
-from weaviate.classes.query import Filter
+
+from internal.service import EmbeddingsService, VectorDatabaseService
 
 
 class SemanticRetriever(BaseRetriever):
     """相似性检索器/向量检索器"""
 
     dataset_ids: list[UUID]
-    vector_store: WeaviateVectorStore
+    vector_database_service: VectorDatabaseService
+    embeddings_service: EmbeddingsService
     search_kwargs: dict = Field(default_factory=dict)
 
     def _get_relevant_documents(
             self, query: str, *, run_manager: CallbackManagerForRetrieverRun
     ) -> list[LCDocument]:
         """根据传递的query执行相似性检索"""
-        # 1.提取最大搜索条件k，默认值为4
-        k = self.search_kwargs.pop("k", 4)
-
-        # 2.执行相似度检索并获取得分信息
-        search_result = self.vector_store.similarity_search_with_relevance_scores(
-            query=query,
+        # 1.提取最大搜索条件k，默认值为4，并计算query向量(相同query直接命中向量缓存)
+        k = self.search_kwargs.get("k", 4)
+        vector = self.embeddings_service.embed_query(query)
+
+        # 2.执行相似度检索并获取得分信息，向量数据库后端只返回文档与片段均已启用的记录
+        search_result = self.vector_database_service.similarity_search(
+            dataset_ids=self.dataset_ids,
+            vector=vector,
             k=k,
-            **{
-                "filters": Filter.all_of([
-                    Filter.by_property("dataset_id").contains_any([str(dataset_id) for dataset_id in self.dataset_ids]),
-                    Filter.by_property("document_enabled").equal(True),
-                    Filter.by_property("segment_enabled").equal(True),
-                ]),
-                **self.search_kwargs,
-            }
+            score_threshold=self.search_kwargs.get("score_threshold", 0),
         )
         if search_result is None or len(search_result) == 0:
             return []
@@ -52,6 +47,4 @@ class SemanticRetriever(BaseRetriever):
         for lc_document, score in zip(lc_documents, scores):
             lc_document.metadata["score"] = score
 
-        return lc_documents
-
-
+        return list(lc_documents)
@@ -0,0 +1,10 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 17:50
+#Author  :Emcikem
+@File    :__init__.py.py
+"""
+from .token_offset_text_splitter import TokenOffsetTextSplitter
+
+__all__ = ["TokenOffsetTextSplitter"]
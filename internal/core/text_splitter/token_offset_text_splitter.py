@@ -0,0 +1,110 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 17:50
+#Author  :Emcikem
+@File    :token_offset_text_splitter.py
+"""
+import re
+from bisect import bisect_left, bisect_right
+from typing import Any, Optional
+
+from langchain_text_splitters import TextSplitter
+
+from internal.core.token_counter import TokenCounter
+
+
+class TokenOffsetTextSplitter(TextSplitter):
+    """
+    基于token偏移量的文本分割器，参数与RecursiveCharacterTextSplitter保持一致。
+    每个文档只编码一次，将各级分隔符的匹配位置换算成token下标，片段的token数即两个下标之差，无需反复计算长度。
+    每个片段优先在窗口内优先级最高的分隔符处截断(分隔符保留在前一个片段末尾)，均不存在时按chunk_size截断。
+    """
+
+    def __init__(
+            self,
+            token_counter: TokenCounter,
+            separators: list[str],
+            is_separator_regex: bool = True,
+            **kwargs: Any,
+    ):
+        """构造函数，token_counter负责编码文本，长度计算函数固定为token_counter.count"""
+        super().__init__(length_function=token_counter.count, **kwargs)
+        self._token_counter = token_counter
+        self._separators = separators
+        self._is_separator_regex = is_separator_regex
+
+    def split_text(self, text: str) -> list[str]:
+        """将文本分割成token数不超过chunk_size的片段列表"""
+        # 1.编码文本获取每个token的起始字符位置
+        offsets = self._token_counter.token_offsets(text)
+        token_total = len(offsets)
+        if token_total == 0:
+            return []
+
+        # 2.计算每一级分隔符对应的token边界，空分隔符表示任意token边界均可截断，找不到分隔符边界时按token截断
+        levels = []
+        for separator in self._separators:
+            if separator == "":
+                break
+            pattern = separator if self._is_separator_regex else re.escape(separator)
+            levels.append(self._get_token_boundaries([match.end() for match in re.finditer(pattern, text)], offsets))
+        boundaries = sorted(set().union(*levels))
+
+        # 3.从前往后依次生成片段，下一个片段需要覆盖上一个片段的截断位置之后的内容，避免产生只包含重叠内容的片段
+        chunks = []
+        start = 0
+        previous_end = 0
+        while start < token_total:
+            # 4.计算片段的截断位置
+            limit = start + self._chunk_size
+            if limit >= token_total:
+                end = token_total
+            else:
+                end = self._find_boundary(levels, max(start, previous_end), limit) or limit
+
+            # 5.根据token下标截取片段内容
+            chunk = text[offsets[start]:offsets[end] if end < token_total else len(text)]
+            if self._strip_whitespace:
+                chunk = chunk.strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= token_total:
+                break
+
+            # 6.计算下一个片段的起始位置，重叠部分从不早于end-chunk_overlap的第一个分隔符边界开始，
+            # 重叠窗口内不存在分隔符边界时按token截断，与RecursiveCharacterTextSplitter一样始终保留重叠
+            next_start = end
+            if self._chunk_overlap > 0:
+                target = max(end - self._chunk_overlap, start + 1)
+                index = bisect_left(boundaries, target)
+                if index < len(boundaries) and boundaries[index] < end:
+                    next_start = boundaries[index]
+                else:
+                    next_start = target
+            previous_end = end
+            start = next_start
+
+        return chunks
+
+    @classmethod
+    def _get_token_boundaries(cls, char_positions: list[int], offsets: list[int]) -> list[int]:
+        """将递增的字符位置换算成递增且去重的token下标，位于token内部的位置取下一个token的起始处"""
+        boundaries = []
+        index = 0
+        for char_position in char_positions:
+            while index < len(offsets) and offsets[index] < char_position:
+                index += 1
+            if 0 < index < len(offsets) and (not boundaries or boundaries[-1] != index):
+                boundaries.append(index)
+        return boundaries
+
+    @classmethod
+    def _find_boundary(cls, levels: list[list[int]], floor: int, limit: int) -> Optional[int]:
+        """在(floor, limit]范围内查找优先级最高的分隔符的最后一个边界"""
+        for level in levels:
+            index = bisect_right(level, limit) - 1
+            if index >= 0 and level[index] > floor:
+                return level[index]
+        return None
+
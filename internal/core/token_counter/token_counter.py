@@ -0,0 +1,94 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 17:05
+#Author  :Emcikem
+@File    :token_counter.py
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import tiktoken
+
+# 默认的词表模型，gpt-3.5系列使用cl100k_base词表
+DEFAULT_MODEL_NAME = "gpt-3.5-turbo"
+
+# 每个词表模型对应的编码器及计数缓存，进程内所有TokenCounter实例共享
+_encodings: dict[str, tiktoken.Encoding] = {}
+_caches: dict[str, OrderedDict] = {}
+_lock = threading.Lock()
+
+
+class TokenCounter:
+    """token计数器，每个词表模型只加载一次编码器，并使用有界LRU缓存重复文本的token数"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        """构造函数，获取模型对应的编码器及缓存，缓存容量与可缓存文本长度从环境变量读取"""
+        self.model_name = model_name
+        self.max_size = int(os.getenv("TOKEN_COUNT_CACHE_MAX_SIZE", 4096))
+        self.max_text_length = int(os.getenv("TOKEN_COUNT_CACHE_MAX_TEXT_LENGTH", 4096))
+
+        with _lock:
+            if model_name not in _encodings:
+                try:
+                    _encodings[model_name] = tiktoken.encoding_for_model(model_name)
+                except KeyError:
+                    _encodings[model_name] = tiktoken.get_encoding("cl100k_base")
+                _caches[model_name] = OrderedDict()
+        self._encoding = _encodings[model_name]
+        self._cache = _caches[model_name]
+
+    def count(self, text: str) -> int:
+        """计算单条文本的token数，可直接作为文本分割器的length_function"""
+        with _lock:
+            token_count = self._cache.get(text)
+            if token_count is not None:
+                self._cache.move_to_end(text)
+                return token_count
+
+        token_count = len(self._encoding.encode_ordinary(text))
+        self._set_cache({text: token_count})
+        return token_count
+
+    def count_batch(self, texts: list[str]) -> list[int]:
+        """批量计算文本的token数，未命中缓存的文本使用tiktoken批量编码(多线程)"""
+        # 1.查询缓存，记录未命中的文本(去重)
+        token_counts = [None] * len(texts)
+        misses: dict[str, list[int]] = {}
+        with _lock:
+            for index, text in enumerate(texts):
+                token_count = self._cache.get(text)
+                if token_count is None:
+                    misses.setdefault(text, []).append(index)
+                else:
+                    self._cache.move_to_end(text)
+                    token_counts[index] = token_count
+
+        # 2.批量编码未命中的文本并回填结果
+        if misses:
+            miss_texts = list(misses.keys())
+            encoded = self._encoding.encode_ordinary_batch(miss_texts)
+            counted = {text: len(tokens) for text, tokens in zip(miss_texts, encoded)}
+            for text, indexes in misses.items():
+                for index in indexes:
+                    token_counts[index] = counted[text]
+            self._set_cache(counted)
+
+        return token_counts
+
+    def token_offsets(self, text: str) -> list[int]:
+        """对文本执行一次编码，返回每个token在文本中的起始字符位置"""
+        _, offsets = self._encoding.decode_with_offsets(self._encoding.encode_ordinary(text))
+        return offsets
+
+    def _set_cache(self, token_counts: dict[str, int]) -> None:
+        """写入缓存，超长文本不缓存，超出容量时淘汰最久未使用的记录"""
+        with _lock:
+            for text, token_count in token_counts.items():
+                if len(text) > self.max_text_length:
+                    continue
+                self._cache[text] = token_count
+                self._cache.move_to_end(text)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
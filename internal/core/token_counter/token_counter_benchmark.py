@@ -0,0 +1,76 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 17:30
+#Author  :Emcikem
+@File    :token_counter_benchmark.py
+"""
+import random
+import time
+
+import tiktoken
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from internal.core.text_splitter import TokenOffsetTextSplitter
+from internal.core.token_counter import TokenCounter
+from internal.entity.dataset_entity import DEFAULT_PROCESS_RULE
+
+
+def build_text(size: int) -> str:
+    """构造约size字节的中英文混合文本，包含重复段落以模拟真实文档"""
+    random.seed(42)
+    sentences = [
+        "知识库文档会被分割成多个片段，每个片段单独计算向量并写入向量数据库。",
+        "The text splitter calls the length function for every candidate chunk.",
+        "关键词提取使用jieba完成，并写入关键词倒排表用于全文检索。",
+        "Overlapping chunks share most of their content with the previous chunk.",
+    ]
+    parts = []
+    length = 0
+    while length < size:
+        paragraph = "".join(random.choice(sentences) for _ in range(random.randint(3, 12)))
+        parts.append(paragraph)
+        length += len(paragraph.encode("utf-8")) + 2
+    return "\n\n".join(parts)
+
+
+def split(text: str, length_function=None) -> tuple[int, float]:
+    """length_function为空时使用基于token偏移量的分割器"""
+    segment = DEFAULT_PROCESS_RULE["rule"]["segment"]
+    if length_function is None:
+        text_splitter = TokenOffsetTextSplitter(
+            token_counter=TokenCounter(),
+            chunk_size=segment["chunk_size"],
+            chunk_overlap=segment["chunk_overlap"],
+            separators=segment["separators"],
+        )
+    else:
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=segment["chunk_size"],
+            chunk_overlap=segment["chunk_overlap"],
+            separators=segment["separators"],
+            is_separator_regex=True,
+            length_function=length_function,
+        )
+    start_at = time.perf_counter()
+    chunks = text_splitter.split_text(text)
+    return len(chunks), time.perf_counter() - start_at
+
+
+def calculate_token_count(query: str) -> int:
+    """原先的计数方式，每次调用都重新获取编码器"""
+    encoding = tiktoken.encoding_for_model("gpt-3.5")
+    return len(encoding.encode(query))
+
+
+if __name__ == "__main__":
+    text = build_text(10 * 1024 * 1024)
+
+    chunk_count, elapsed = split(text, calculate_token_count)
+    print(f"calculate_token_count: {chunk_count} chunks, {elapsed:.2f}s")
+
+    chunk_count, elapsed = split(text, TokenCounter().count)
+    print(f"TokenCounter.count: {chunk_count} chunks, {elapsed:.2f}s")
+
+    chunk_count, elapsed = split(text)
+    print(f"TokenOffsetTextSplitter: {chunk_count} chunks, {elapsed:.2f}s")
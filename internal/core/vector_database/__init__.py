@@ -0,0 +1,16 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 16:10
+#Author  :Emcikem
+@File    :__init__.py.py
+"""
+from .base_vector_database import BaseVectorDatabase
+from .faiss_vector_database import FaissVectorDatabase
+from .weaviate_vector_database import WeaviateVectorDatabase
+
+__all__ = [
+    "BaseVectorDatabase",
+    "FaissVectorDatabase",
+    "WeaviateVectorDatabase",
+]
@@ -0,0 +1,56 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 16:10
+#Author  :Emcikem
+@File    :base_vector_database.py
+"""
+from abc import ABC, abstractmethod
+from typing import Any
+
+from langchain_core.documents import Document as LCDocument
+
+
+class BaseVectorDatabase(ABC):
+    """向量数据库后端基类，所有记录均以node_id作为唯一标识，元数据涵盖dataset_id/document_id/segment_id等字段"""
+
+    @abstractmethod
+    def add_documents(self, lc_documents: list[LCDocument], vectors: list[list[float]], ids: list[str]) -> None:
+        """将已经计算好向量的LangChain文档批量写入向量数据库，node_id已存在时覆盖原记录"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_properties(self, dataset_id: str, node_ids: list[str], properties: dict[str, Any]) -> dict[str, str]:
+        """批量更新指定节点的元数据属性，例如document_enabled/segment_enabled，返回更新失败的node_id及错误信息"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_document(self, dataset_id: str, node_id: str, text: str, vector: list[float]) -> None:
+        """更新指定节点的文本内容及向量"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_by_node_ids(self, dataset_id: str, node_ids: list[str]) -> None:
+        """根据node_id列表删除记录"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_by_document_id(self, dataset_id: str, document_id: str) -> None:
+        """删除指定文档下的所有记录"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_by_dataset_id(self, dataset_id: str) -> None:
+        """删除指定知识库下的所有记录"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def similarity_search(
+            self,
+            dataset_ids: list[str],
+            vector: list[float],
+            k: int = 4,
+            score_threshold: float = 0,
+    ) -> list[tuple[LCDocument, float]]:
+        """在指定知识库中检索文档和片段均处于启用状态的记录，返回(文档, 相似度得分)列表，得分越高越相似"""
+        raise NotImplementedError
@@ -0,0 +1,431 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 16:20
+#Author  :Emcikem
+@File    :faiss_vector_database.py
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Generator, Optional
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document as LCDocument
+
+from .base_vector_database import BaseVectorDatabase
+
+# 不同存储路径对应的本地向量数据库实例，同一进程内共享同一份内存索引
+_instances: dict[str, "FaissVectorDatabase"] = {}
+_instances_lock = threading.Lock()
+
+
+class _DatasetIndex:
+    """单个知识库对应的HNSW索引，向量位置与node_id一一对应，删除/更新时原位置记为墓碑(None)，
+    pending记录上次落盘后的所有写操作，落盘时磁盘文件已被其他进程更新则在最新文件上重放这些操作"""
+
+    def __init__(self, index: Optional[faiss.Index] = None, node_ids: list = None, records: dict = None):
+        self.index = index
+        self.node_ids: list[Optional[str]] = node_ids if node_ids is not None else []
+        self.records: dict[str, dict[str, Any]] = records if records is not None else {}
+        self.lock = threading.RLock()
+        self.dirty = False
+        self.deleted = False
+        self.loaded_mtime = 0.0
+        self.pending: list[tuple] = []
+
+    @property
+    def tombstone_ratio(self) -> float:
+        """已失效向量占比"""
+        if len(self.node_ids) == 0:
+            return 0
+        return 1 - len(self.records) / len(self.node_ids)
+
+    def tombstone(self, node_id: str) -> None:
+        """将节点标记为失效，向量仍保留在索引中直到下一次压缩"""
+        record = self.records.pop(node_id, None)
+        if record is not None:
+            self.node_ids[record["position"]] = None
+            self.dirty = True
+
+
+class FaissVectorDatabase(BaseVectorDatabase):
+    """
+    本地FAISS向量数据库后端，每个知识库一个HNSW(内积)索引，向量写入前做L2归一化，得分即余弦相似度。
+    写操作只修改内存索引并记录到待落盘操作中，由后台线程周期性压缩墓碑并原子化落盘，进程退出时再落盘一次。
+    落盘时持有知识库的文件锁，如果磁盘文件已被其他进程(Celery/Gunicorn)更新，则先加载最新文件再重放本进程的写操作，
+    多个进程同时写入同一知识库时不会互相覆盖。该后端依赖fcntl文件锁，适合单机部署。
+    """
+
+    def __init__(
+            self,
+            path: str,
+            hnsw_m: int = 32,
+            ef_construction: int = 64,
+            ef_search: int = 64,
+            compact_threshold: float = 0.2,
+            flush_interval: float = 30,
+    ):
+        """构造函数，完成存储目录创建及后台落盘线程启动，请使用get_instance获取实例"""
+        self.path = path
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.compact_threshold = compact_threshold
+        self.flush_interval = flush_interval
+        self._indexes: dict[str, _DatasetIndex] = {}
+        self._indexes_lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+        threading.Thread(target=self._background_flush, daemon=True).start()
+        atexit.register(self.flush)
+
+    @classmethod
+    def get_instance(cls, path: str, **kwargs) -> "FaissVectorDatabase":
+        """根据存储路径获取进程内共享的实例"""
+        path = os.path.abspath(path)
+        with _instances_lock:
+            if path not in _instances:
+                _instances[path] = cls(path, **kwargs)
+            return _instances[path]
+
+    def add_documents(self, lc_documents: list[LCDocument], vectors: list[list[float]], ids: list[str]) -> None:
+        """按知识库分组写入向量，node_id已存在时先将旧向量标记为失效"""
+        groups: dict[str, list[int]] = {}
+        for idx, lc_document in enumerate(lc_documents):
+            groups.setdefault(str(lc_document.metadata["dataset_id"]), []).append(idx)
+
+        for dataset_id, idxs in groups.items():
+            dataset_index = self._get_index(dataset_id)
+            with dataset_index.lock:
+                self._add_to_index(
+                    dataset_index,
+                    [ids[idx] for idx in idxs],
+                    [vectors[idx] for idx in idxs],
+                    [lc_documents[idx].page_content for idx in idxs],
+                    [lc_documents[idx].metadata for idx in idxs],
+                )
+                dataset_index.pending.append((
+                    "add",
+                    [ids[idx] for idx in idxs],
+                    [vectors[idx] for idx in idxs],
+                    [lc_documents[idx].page_content for idx in idxs],
+                    [lc_documents[idx].metadata for idx in idxs],
+                ))
+
+    def update_properties(self, dataset_id: str, node_ids: list[str], properties: dict[str, Any]) -> dict[str, str]:
+        """元数据单独存储，更新属性无需改动索引"""
+        dataset_index = self._get_index(dataset_id)
+        errors = {}
+        with dataset_index.lock:
+            for node_id in node_ids:
+                record = dataset_index.records.get(str(node_id))
+                if record is None:
+                    errors[node_id] = "向量数据库记录不存在"
+                    continue
+                record["metadata"].update(properties)
+                dataset_index.dirty = True
+            dataset_index.pending.append(("update_properties", [str(node_id) for node_id in node_ids], properties))
+        return errors
+
+    def update_document(self, dataset_id: str, node_id: str, text: str, vector: list[float]) -> None:
+        """HNSW不支持原地更新，将旧向量标记为失效后追加新向量"""
+        node_id = str(node_id)
+        dataset_index = self._get_index(dataset_id)
+        with dataset_index.lock:
+            record = dataset_index.records.get(node_id)
+            if record is None:
+                raise Exception(f"向量数据库记录不存在: {node_id}")
+            self._add_to_index(dataset_index, [node_id], [vector], [text], [record["metadata"]])
+            dataset_index.pending.append(("update_document", node_id, text, vector))
+
+    def delete_by_node_ids(self, dataset_id: str, node_ids: list[str]) -> None:
+        dataset_index = self._get_index(dataset_id)
+        with dataset_index.lock:
+            for node_id in node_ids:
+                dataset_index.tombstone(str(node_id))
+            dataset_index.pending.append(("delete_by_node_ids", [str(node_id) for node_id in node_ids]))
+
+    def delete_by_document_id(self, dataset_id: str, document_id: str) -> None:
+        dataset_index = self._get_index(dataset_id)
+        with dataset_index.lock:
+            node_ids = [
+                node_id for node_id, record in dataset_index.records.items()
+                if record["metadata"].get("document_id") == str(document_id)
+            ]
+            for node_id in node_ids:
+                dataset_index.tombstone(node_id)
+            dataset_index.pending.append(("delete_by_document_id", str(document_id)))
+
+    def delete_by_dataset_id(self, dataset_id: str) -> None:
+        """持有索引锁及文件锁将索引标记为已删除，后台落盘会跳过该索引，随后写入删除标记并移除磁盘文件，
+        其他进程落盘前检测到删除标记时同样丢弃内存中的索引，避免已删除的知识库被重新写回"""
+        dataset_id = str(dataset_id)
+        with self._indexes_lock:
+            dataset_index = self._indexes.setdefault(dataset_id, _DatasetIndex())
+        with dataset_index.lock, self._file_lock(dataset_id):
+            self._mark_deleted(dataset_id, dataset_index)
+            dataset_path = os.path.join(self.path, dataset_id)
+            os.makedirs(dataset_path, exist_ok=True)
+            with open(os.path.join(dataset_path, "deleted"), "w", encoding="utf-8"):
+                pass
+            for filename in ("index.faiss", "meta.json"):
+                file_path = os.path.join(dataset_path, filename)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
+    def similarity_search(
+            self,
+            dataset_ids: list[str],
+            vector: list[float],
+            k: int = 4,
+            score_threshold: float = 0,
+    ) -> list[tuple[LCDocument, float]]:
+        """逐个知识库检索，过滤条件无法下推到HNSW，因此成倍扩大召回数量直到满足k条或遍历完索引"""
+        query = self._normalize([vector])
+        results = []
+        for dataset_id in dataset_ids:
+            dataset_index = self._get_index(str(dataset_id))
+            with dataset_index.lock:
+                results.extend(self._search_index(dataset_index, query, k, score_threshold))
+
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]
+
+    def flush(self) -> None:
+        """压缩墓碑占比过高的索引，并将有改动的索引落盘，已删除的索引直接跳过"""
+        with self._indexes_lock:
+            items = list(self._indexes.items())
+        for dataset_id, dataset_index in items:
+            with dataset_index.lock:
+                if dataset_index.deleted:
+                    continue
+                try:
+                    if dataset_index.dirty:
+                        self._persist_with_merge(dataset_id, dataset_index)
+                except Exception as e:
+                    print(f"本地向量数据库落盘失败, dataset_id: {dataset_id}, 错误信息: {str(e)}")
+
+    def _background_flush(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _get_index(self, dataset_id: str) -> _DatasetIndex:
+        """获取知识库索引，未加载或磁盘文件已被其他进程更新(且本地无未落盘改动)时从磁盘加载，
+        知识库已被删除时返回不会落盘的空索引"""
+        dataset_id = str(dataset_id)
+        dataset_path = os.path.join(self.path, dataset_id)
+        meta_path = os.path.join(dataset_path, "meta.json")
+        mtime = os.path.getmtime(meta_path) if os.path.exists(meta_path) else 0.0
+
+        with self._indexes_lock:
+            dataset_index = self._indexes.get(dataset_id)
+            if dataset_index is not None and dataset_index.deleted:
+                return dataset_index
+            if os.path.exists(os.path.join(dataset_path, "deleted")):
+                dataset_index = _DatasetIndex()
+                dataset_index.deleted = True
+                self._indexes[dataset_id] = dataset_index
+            elif dataset_index is None or (not dataset_index.dirty and mtime > dataset_index.loaded_mtime):
+                dataset_index = self._load(dataset_id) if mtime else _DatasetIndex()
+                dataset_index.loaded_mtime = mtime
+                self._indexes[dataset_id] = dataset_index
+            return dataset_index
+
+    def _mark_deleted(self, dataset_id: str, dataset_index: _DatasetIndex) -> None:
+        """将索引标记为已删除并清空内存数据，调用方需持有索引锁"""
+        dataset_index.deleted = True
+        dataset_index.dirty = False
+        dataset_index.pending = []
+        dataset_index.index = None
+        dataset_index.node_ids = []
+        dataset_index.records = {}
+        with self._indexes_lock:
+            self._indexes[dataset_id] = dataset_index
+
+    @contextmanager
+    def _file_lock(self, dataset_id: str) -> Generator[None, None, None]:
+        """知识库级别的跨进程排他文件锁"""
+        with open(os.path.join(self.path, f"{dataset_id}.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _persist_with_merge(self, dataset_id: str, dataset_index: _DatasetIndex) -> None:
+        """持有文件锁落盘，磁盘文件在本进程加载后被其他进程更新时，先加载最新文件并重放本进程的写操作再落盘，
+        知识库已被其他进程删除时丢弃内存中的索引，调用方需持有索引锁"""
+        with self._file_lock(dataset_id):
+            # 1.知识库已被删除，丢弃本进程未落盘的改动
+            dataset_path = os.path.join(self.path, dataset_id)
+            if os.path.exists(os.path.join(dataset_path, "deleted")):
+                self._mark_deleted(dataset_id, dataset_index)
+                return
+
+            # 2.磁盘文件已被其他进程更新时，在最新文件上重放本进程的写操作
+            meta_path = os.path.join(dataset_path, "meta.json")
+            mtime = os.path.getmtime(meta_path) if os.path.exists(meta_path) else 0.0
+            if mtime > dataset_index.loaded_mtime:
+                merged_index = self._load(dataset_id)
+                self._replay(merged_index, dataset_index.pending)
+                dataset_index.index = merged_index.index
+                dataset_index.node_ids = merged_index.node_ids
+                dataset_index.records = merged_index.records
+
+            # 3.压缩墓碑占比过高的索引并原子化落盘
+            if dataset_index.index is None:
+                dataset_index.dirty = False
+                dataset_index.pending = []
+                return
+            if dataset_index.tombstone_ratio > self.compact_threshold:
+                self._compact(dataset_index)
+            self._persist(dataset_id, dataset_index)
+            dataset_index.pending = []
+
+    def _replay(self, dataset_index: _DatasetIndex, pending: list[tuple]) -> None:
+        """在索引上按顺序重放写操作，调用方需持有索引锁"""
+        for operation, *args in pending:
+            if operation == "add":
+                self._add_to_index(dataset_index, *args)
+            elif operation == "update_document":
+                node_id, text, vector = args
+                record = dataset_index.records.get(node_id)
+                if record is not None:
+                    self._add_to_index(dataset_index, [node_id], [vector], [text], [record["metadata"]])
+            elif operation == "update_properties":
+                node_ids, properties = args
+                for node_id in node_ids:
+                    record = dataset_index.records.get(node_id)
+                    if record is not None:
+                        record["metadata"].update(properties)
+            elif operation == "delete_by_node_ids":
+                for node_id in args[0]:
+                    dataset_index.tombstone(node_id)
+            elif operation == "delete_by_document_id":
+                node_ids = [
+                    node_id for node_id, record in dataset_index.records.items()
+                    if record["metadata"].get("document_id") == args[0]
+                ]
+                for node_id in node_ids:
+                    dataset_index.tombstone(node_id)
+
+    def _create_index(self, dimension: int) -> faiss.Index:
+        index = faiss.IndexHNSWFlat(dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = self.ef_construction
+        return index
+
+    def _add_to_index(
+            self,
+            dataset_index: _DatasetIndex,
+            node_ids: list[str],
+            vectors: list[list[float]],
+            texts: list[str],
+            metadatas: list[dict],
+    ) -> None:
+        """调用方需持有索引锁，已删除的索引不再写入"""
+        if dataset_index.deleted:
+            return
+        data = self._normalize(vectors)
+        if dataset_index.index is None:
+            dataset_index.index = self._create_index(data.shape[1])
+
+        for node_id, text, metadata in zip(node_ids, texts, metadatas):
+            node_id = str(node_id)
+            dataset_index.tombstone(node_id)
+            dataset_index.records[node_id] = {
+                "position": len(dataset_index.node_ids),
+                "text": text,
+                "metadata": {key: value if isinstance(value, (bool, int, float)) else str(value)
+                             for key, value in metadata.items()},
+            }
+            dataset_index.node_ids.append(node_id)
+
+        dataset_index.index.add(data)
+        dataset_index.dirty = True
+
+    def _search_index(
+            self,
+            dataset_index: _DatasetIndex,
+            query: np.ndarray,
+            k: int,
+            score_threshold: float,
+    ) -> list[tuple[LCDocument, float]]:
+        """调用方需持有索引锁"""
+        if dataset_index.index is None or len(dataset_index.records) == 0:
+            return []
+
+        total = dataset_index.index.ntotal
+        fetch_k = min(k * 4, total)
+        while True:
+            params = faiss.SearchParametersHNSW(efSearch=max(self.ef_search, fetch_k))
+            scores, positions = dataset_index.index.search(query, fetch_k, params=params)
+
+            results = []
+            for score, position in zip(scores[0], positions[0]):
+                if position < 0 or score < score_threshold:
+                    continue
+                node_id = dataset_index.node_ids[position]
+                if node_id is None:
+                    continue
+                record = dataset_index.records[node_id]
+                metadata = record["metadata"]
+                if not metadata.get("document_enabled") or not metadata.get("segment_enabled"):
+                    continue
+                results.append((LCDocument(page_content=record["text"], metadata=dict(metadata)), float(score)))
+                if len(results) >= k:
+                    return results
+
+            if fetch_k >= total:
+                return results
+            fetch_k = min(fetch_k * 2, total)
+
+    def _compact(self, dataset_index: _DatasetIndex) -> None:
+        """剔除墓碑向量并重建索引，调用方需持有索引锁"""
+        live_positions = [position for position, node_id in enumerate(dataset_index.node_ids) if node_id is not None]
+        vectors = dataset_index.index.reconstruct_n(0, dataset_index.index.ntotal)[live_positions]
+
+        index = self._create_index(dataset_index.index.d)
+        if len(live_positions) > 0:
+            index.add(vectors)
+
+        dataset_index.node_ids = [dataset_index.node_ids[position] for position in live_positions]
+        for position, node_id in enumerate(dataset_index.node_ids):
+            dataset_index.records[node_id]["position"] = position
+        dataset_index.index = index
+        dataset_index.dirty = True
+
+    def _persist(self, dataset_id: str, dataset_index: _DatasetIndex) -> None:
+        """先写临时文件再原子替换，避免读取到写了一半的索引，调用方需持有索引锁"""
+        dataset_path = os.path.join(self.path, dataset_id)
+        os.makedirs(dataset_path, exist_ok=True)
+        index_path = os.path.join(dataset_path, "index.faiss")
+        meta_path = os.path.join(dataset_path, "meta.json")
+
+        faiss.write_index(dataset_index.index, index_path + ".tmp")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"node_ids": dataset_index.node_ids, "records": dataset_index.records}, f, ensure_ascii=False)
+
+        os.replace(index_path + ".tmp", index_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        dataset_index.dirty = False
+        dataset_index.loaded_mtime = os.path.getmtime(meta_path)
+
+    def _load(self, dataset_id: str) -> _DatasetIndex:
+        dataset_path = os.path.join(self.path, dataset_id)
+        index = faiss.read_index(os.path.join(dataset_path, "index.faiss"))
+        with open(os.path.join(dataset_path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return _DatasetIndex(index=index, node_ids=meta["node_ids"], records=meta["records"])
+
+    @classmethod
+    def _normalize(cls, vectors: list[list[float]]) -> np.ndarray:
+        data = np.array(vectors, dtype=np.float32)
+        faiss.normalize_L2(data)
+        return data
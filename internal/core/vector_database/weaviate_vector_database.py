@@ -0,0 +1,147 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 16:12
+#Author  :Emcikem
+@File    :weaviate_vector_database.py
+"""
+import os
+import threading
+from typing import Any, Optional
+
+import weaviate
+from langchain_core.documents import Document as LCDocument
+from langchain_core.embeddings import Embeddings
+from langchain_weaviate import WeaviateVectorStore
+from weaviate import WeaviateClient
+from weaviate.auth import AuthApiKey
+from weaviate.classes.query import Filter, MetadataQuery
+from weaviate.collections import Collection
+from weaviate.collections.classes.data import DataObject
+
+from .base_vector_database import BaseVectorDatabase
+
+# 向量数据库的集合名字
+COLLECTION_NAME = "Dataset"
+
+
+class WeaviateVectorDatabase(BaseVectorDatabase):
+    """Weaviate向量数据库后端，客户端在首次使用时才创建连接，多个线程并发首次使用时只创建一个连接"""
+    _client: Optional[WeaviateClient]
+    _vector_store: Optional[WeaviateVectorStore]
+    _lock: threading.Lock
+
+    def __init__(self, embeddings: Embeddings):
+        """构造函数，记录嵌入模型，延迟创建weaviate客户端"""
+        self._embeddings = embeddings
+        self._client = None
+        self._vector_store = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> WeaviateClient:
+        """获取weaviate客户端，首次调用时连接weaviate向量数据库"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = weaviate.connect_to_weaviate_cloud(
+                        cluster_url=os.getenv("WEAVIATE_URL"),
+                        auth_credentials=AuthApiKey(os.getenv("WEAVIATE_API_KEY")),
+                    )
+        return self._client
+
+    @property
+    def vector_store(self) -> WeaviateVectorStore:
+        """获取LangChain向量数据库实例"""
+        if self._vector_store is None:
+            # 先在锁外获取客户端，客户端的创建使用同一把锁
+            client = self.client
+            with self._lock:
+                if self._vector_store is None:
+                    self._vector_store = WeaviateVectorStore(
+                        client=client,
+                        index_name=COLLECTION_NAME,
+                        text_key="text",
+                        embedding=self._embeddings,
+                    )
+        return self._vector_store
+
+    @property
+    def collection(self) -> Collection:
+        return self.client.collections.get(COLLECTION_NAME)
+
+    def add_documents(self, lc_documents: list[LCDocument], vectors: list[list[float]], ids: list[str]) -> None:
+        """将已经计算好向量的LangChain文档批量写入weaviate"""
+        # 1.构建weaviate数据对象，属性结构与WeaviateVectorStore保持一致(text+元数据)
+        objects = [
+            DataObject(
+                properties={"text": lc_document.page_content, **lc_document.metadata},
+                uuid=id,
+                vector=vector,
+            )
+            for lc_document, vector, id in zip(lc_documents, vectors, ids)
+        ]
+
+        # 2.批量写入并检测错误信息
+        result = self.collection.data.insert_many(objects)
+        if result.has_errors:
+            raise Exception(f"向量数据库批量写入失败: {result.errors}")
+
+    def update_properties(self, dataset_id: str, node_ids: list[str], properties: dict[str, Any]) -> dict[str, str]:
+        """weaviate不支持按条件批量更新属性，复用同一个collection逐个更新并收集失败的节点"""
+        collection = self.collection
+        errors = {}
+        for node_id in node_ids:
+            try:
+                collection.data.update(uuid=node_id, properties=properties)
+            except Exception as e:
+                errors[node_id] = str(e)
+        return errors
+
+    def update_document(self, dataset_id: str, node_id: str, text: str, vector: list[float]) -> None:
+        """更新节点的文本内容及向量"""
+        self.collection.data.update(uuid=node_id, properties={"text": text}, vector=vector)
+
+    def delete_by_node_ids(self, dataset_id: str, node_ids: list[str]) -> None:
+        """根据node_id列表批量删除记录"""
+        if len(node_ids) == 0:
+            return
+        self.collection.data.delete_many(where=Filter.by_id().contains_any(node_ids))
+
+    def delete_by_document_id(self, dataset_id: str, document_id: str) -> None:
+        """删除文档下的所有记录"""
+        self.collection.data.delete_many(where=Filter.by_property("document_id").equal(document_id))
+
+    def delete_by_dataset_id(self, dataset_id: str) -> None:
+        """删除知识库下的所有记录"""
+        self.collection.data.delete_many(where=Filter.by_property("dataset_id").equal(dataset_id))
+
+    def similarity_search(
+            self,
+            dataset_ids: list[str],
+            vector: list[float],
+            k: int = 4,
+            score_threshold: float = 0,
+    ) -> list[tuple[LCDocument, float]]:
+        """使用near_vector执行检索，得分为1-余弦距离"""
+        response = self.collection.query.near_vector(
+            near_vector=vector,
+            limit=k,
+            filters=Filter.all_of([
+                Filter.by_property("dataset_id").contains_any(dataset_ids),
+                Filter.by_property("document_enabled").equal(True),
+                Filter.by_property("segment_enabled").equal(True),
+            ]),
+            return_metadata=MetadataQuery(distance=True),
+        )
+
+        results = []
+        for obj in response.objects:
+            score = 1 - obj.metadata.distance
+            if score < score_threshold:
+                continue
+            properties = dict(obj.properties)
+            text = properties.pop("text", "")
+            results.append((LCDocument(page_content=text, metadata=properties), score))
+
+        return results
@@ -0,0 +1,96 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 23:40
+#Author  :Emcikem
+@File    :workflow_config_benchmark.py
+"""
+import time
+import uuid
+from typing import Any
+
+from internal.core.workflow.entities.node_entity import NodeType
+from internal.core.workflow.entities.variable_entity import VariableValueType
+from internal.core.workflow.entities.workflow_entity import WorkflowConfig
+
+
+def ref_variable(name: str, ref_node_id: str, ref_var_name: str) -> dict[str, Any]:
+    """构造引用类型的变量"""
+    return {
+        "name": name,
+        "value": {
+            "type": VariableValueType.REF,
+            "content": {"ref_node_id": ref_node_id, "ref_var_name": ref_var_name},
+        },
+    }
+
+
+def build_graph(node_count: int) -> tuple[list[dict], list[dict]]:
+    """构造包含node_count个节点的工作流图，中间为模板转换节点组成的链路，并附带跨一层的边，
+    每个中间节点同时引用开始节点的输入及上一个节点的输出"""
+    start_id = str(uuid.uuid4())
+    end_id = str(uuid.uuid4())
+    middle_ids = [str(uuid.uuid4()) for _ in range(node_count - 2)]
+
+    # 1.构造节点列表
+    nodes = [{
+        "id": start_id,
+        "node_type": NodeType.START,
+        "title": "开始",
+        "inputs": [{"name": "query", "value": {"type": VariableValueType.GENERATED}}],
+    }]
+    for index, node_id in enumerate(middle_ids):
+        inputs = [ref_variable("query", start_id, "query")]
+        if index > 0:
+            inputs.append(ref_variable("previous", middle_ids[index - 1], "output"))
+        nodes.append({
+            "id": node_id,
+            "node_type": NodeType.TEMPLATE_TRANSFORM,
+            "title": f"模板转换{index}",
+            "template": "{{query}}",
+            "inputs": inputs,
+        })
+    nodes.append({
+        "id": end_id,
+        "node_type": NodeType.END,
+        "title": "结束",
+        "outputs": [ref_variable("output", middle_ids[-1], "output")],
+    })
+
+    # 2.构造边列表，链路边保证连通，跨一层的边增加图的宽度
+    node_ids = [start_id, *middle_ids, end_id]
+    node_types = [node["node_type"] for node in nodes]
+    pairs = [(index, index + 1) for index in range(len(node_ids) - 1)]
+    pairs += [(index, index + 2) for index in range(1, len(node_ids) - 3)]
+    edges = [
+        {
+            "id": str(uuid.uuid4()),
+            "source": node_ids[source],
+            "source_type": node_types[source],
+            "target": node_ids[target],
+            "target_type": node_types[target],
+        }
+        for source, target in pairs
+    ]
+
+    return nodes, edges
+
+
+def measure(node_count: int) -> float:
+    """返回校验一个包含node_count个节点的工作流配置的耗时(秒)"""
+    nodes, edges = build_graph(node_count)
+    start_at = time.perf_counter()
+    WorkflowConfig(
+        account_id=uuid.uuid4(),
+        name="benchmark",
+        description="工作流配置校验基准测试",
+        nodes=nodes,
+        edges=edges,
+    )
+    return time.perf_counter() - start_at
+
+
+if __name__ == "__main__":
+    for node_count in (100, 1000, 5000):
+        elapsed = measure(node_count)
+        print(f"{node_count} nodes: {elapsed:.3f}s")
@@ -94,6 +94,7 @@ class WorkflowConfig(BaseModel):
 
         # 6.循环遍历所有节点
         node_data_dict: dict[UUID, BaseNodeData] = {}
+        node_titles: set[str] = set()
         start_nodes = 0
         end_nodes = 0
         for node in nodes:
@@ -121,14 +122,17 @@ class WorkflowConfig(BaseModel):
                 end_nodes += 1
 
             # 11.判断nodes节点数据id是否唯一
-            if any(item.title.strip() == node_data.title.strip() for item in node_data_dict.values()):
+            node_title = node_data.title.strip()
+            if node_title in node_titles:
                 raise ValidateErrorException("工作流节点title必须唯一，请核实后重试")
 
             # 12.将数据添加到node_data_dict中
             node_data_dict[node_data.id] = node_data
+            node_titles.add(node_title)
 
         # 13.循环遍历edges数据
         edge_data_dict: dict[UUID, BaseEdgeData] = {}
+        edge_pairs: set[tuple[UUID, UUID]] = set()
         for edge in edges:
             # 14.判断边数据类型
             if not isinstance(edge, dict):
@@ -151,14 +155,13 @@ class WorkflowConfig(BaseModel):
                 raise ValidateErrorException("工作流边起点/终点对应的节点不存在或类型错误，请核实后重试")
 
             # 18.校验边Edges里的边是否唯一(source+target必须唯一)
-            if any(
-                    (item.source == edge_data.source and item.target == edge_data.target)
-                    for item in edge_data_dict.values()
-            ):
+            edge_pair = (edge_data.source, edge_data.target)
+            if edge_pair in edge_pairs:
                 raise ValidateErrorException("工作流边数据不能重复添加")
 
             # 19.基础数据校验通过，将数据添加到edge_data_dict中
             edge_data_dict[edge_data.id] = edge_data
+            edge_pairs.add(edge_pair)
 
         # 20.构建邻接表、逆邻接表、入度以及出度
         adj_list = cls._build_adj_list(edge_data_dict.values())
@@ -183,12 +186,13 @@ class WorkflowConfig(BaseModel):
         if not cls._is_connected(adj_list, start_node_data.id):
             raise ValidateErrorException("工作流中存在不可达节点，图不联调，请核实后重试")
 
-        # 24.校验edges中是否存在环路（即循环边结构）
-        if cls._is_cycle(node_data_dict.values(), adj_list, in_degree):
+        # 24.使用拓扑排序校验edges中是否存在环路（即循环边结构），无环时拓扑序列涵盖所有节点
+        topological_order = cls._topological_sort(node_data_dict.values(), adj_list, in_degree)
+        if len(topological_order) != len(node_data_dict):
             raise ValidateErrorException("工作流中存在环路，请核实后重试")
 
-        # 25.校验nodes+edges中的数据引用是否正确，即inputs/outputs对应的数据
-        cls._validate_inputs_ref(node_data_dict, reverse_adj_list)
+        # 25.按拓扑序列一次性计算所有节点的前置节点集合，并校验nodes+edges中的数据引用是否正确，即inputs/outputs对应的数据
+        cls._validate_inputs_ref(node_data_dict, reverse_adj_list, topological_order)
 
         # 26.更新values值
         values["nodes"] = list(node_data_dict.values())
@@ -218,24 +222,26 @@ class WorkflowConfig(BaseModel):
         return len(visited) == len(adj_list)
 
     @classmethod
-    def _is_cycle(
+    def _topological_sort(
             cls,
             nodes: list[BaseNodeData],
             adj_list: defaultdict[Any, list],
             in_degree: defaultdict[Any, int],
-    ) -> bool:
-        """根据传递的节点列表、邻接表、入度数据，使用拓扑排序(Kahn算法)检测图中是否存在环，如果存在则返回True，不存在则返回False"""
-        # 1.存储所有入度为0的节点id，即开始节点
+    ) -> list[UUID]:
+        """根据传递的节点列表、邻接表、入度数据，使用拓扑排序(Kahn算法)返回节点id的拓扑序列，
+        如果图中存在环，则环上及其后续的节点均无法访问，返回的序列长度小于总节点数"""
+        # 1.拷贝入度数据，避免修改调用方的入度，并存储所有入度为0的节点id，即开始节点
+        in_degree = in_degree.copy()
         zero_in_degree_nodes = deque([node.id for node in nodes if in_degree[node.id] == 0])
 
-        # 2.记录已访问的节点数
-        visited_count = 0
+        # 2.记录拓扑序列
+        topological_order = []
 
         # 3.循环遍历入度为0的节点信息
         while zero_in_degree_nodes:
-            # 4.从队列左侧取出一个入度为0的节点，并记录访问+1
+            # 4.从队列左侧取出一个入度为0的节点，并添加到拓扑序列中
             node_id = zero_in_degree_nodes.popleft()
-            visited_count += 1
+            topological_order.append(node_id)
 
             # 5.循环遍历取到的节点的所有子节点
             for neighbor in adj_list[node_id]:
@@ -243,25 +249,43 @@ class WorkflowConfig(BaseModel):
                 in_degree[neighbor] -= 1
 
                 # 7.Kahn算法的核心是，如果存在环，那么至少有一个非结束节点的入度大于等于2，并且该入度无法消减到0
-                #   这就会导致该节点后续的所有子节点在该算法下都无法浏览，那么访问次数肯定小于总节点数
+                #   这就会导致该节点后续的所有子节点在该算法下都无法浏览，那么拓扑序列长度肯定小于总节点数
                 if in_degree[neighbor] == 0:
                     zero_in_degree_nodes.append(neighbor)
 
-        # 8.判断访问次数和总结点数是否相等，如果不等/小于则说明存在环
-        return visited_count != len(nodes)
+        return topological_order
+
+    @classmethod
+    def _build_predecessors(
+            cls,
+            reverse_adj_list: defaultdict[Any, list],
+            topological_order: list[UUID],
+    ) -> tuple[dict[UUID, int], dict[UUID, int]]:
+        """按拓扑序列一次性计算所有节点的前置节点集合，前置节点集合使用整数位图表示(第i位对应拓扑序列中的第i个节点)，
+        每个节点的集合由其直接父节点的集合合并得到，返回(节点id->位序号, 节点id->前置节点位图)"""
+        node_indexes = {node_id: index for index, node_id in enumerate(topological_order)}
+        predecessors: dict[UUID, int] = {}
+        for node_id in topological_order:
+            node_predecessors = 0
+            for parent_id in reverse_adj_list[node_id]:
+                node_predecessors |= predecessors[parent_id] | (1 << node_indexes[parent_id])
+            predecessors[node_id] = node_predecessors
+        return node_indexes, predecessors
 
     @classmethod
     def _validate_inputs_ref(
             cls,
             node_data_dict: dict[UUID, BaseNodeData],
             reverse_adj_list: defaultdict[Any, list],
+            topological_order: list[UUID],
     ) -> None:
         """校验输入数据引用是否正确，如果出错则直接抛出异常"""
-        # 1.循环遍历所有节点数据逐个处理
-        for node_data in node_data_dict.values():
-            # 2.提取该节点的所有前置节点
-            predecessors = cls._get_predecessors(reverse_adj_list, node_data.id)
+        # 1.一次性计算所有节点的前置节点集合，并缓存被引用节点的变量名集合
+        node_indexes, predecessors = cls._build_predecessors(reverse_adj_list, topological_order)
+        ref_variable_names: dict[UUID, set[str]] = {}
 
+        # 2.循环遍历所有节点数据逐个处理
+        for node_data in node_data_dict.values():
             # 3.如果节点数据类型不是START则校验输入的数据引用（因为开始节点不需要校验）
             if node_data.node_type != NodeType.START:
                 # 4.根据及诶点类型从inputs或者outputs中提取需要校验的数据
@@ -274,27 +298,26 @@ class WorkflowConfig(BaseModel):
                 for variable in variables:
                     # 6.如果变量类型为引用，则需要校验
                     if variable.value.type == VariableValueType.REF:
-                        # 7.判断前置节点是否为空，或者引用id不在前置节点内，则直接抛出错误
+                        # 7.判断引用id是否在前置节点内，不在则直接抛出错误
+                        ref_node_id = variable.value.content.ref_node_id
                         if (
-                            len(predecessors) <= 0
-                            or variable.value.content.ref_node_id not in predecessors
+                            ref_node_id not in node_indexes
+                            or not (predecessors[node_data.id] >> node_indexes[ref_node_id]) & 1
                         ):
                             raise ValidateErrorException(f"工作流节点[{node_data.title}]引用数据出错，请核实后重试")
 
-                        # 8.提取数据引用的前置节点数据
-                        ref_node_data = node_data_dict.get(variable.value.content.ref_node_id)
-
-                        # 9.获取引用变量列表，如果是开始节点则从inputs中获取数据，否则从outputs中获取数据
-                        ref_variables = (
-                            ref_node_data.inputs if ref_node_data.node_type == NodeType.START
-                            else ref_node_data.outputs
-                        )
-
-                        # 10.判断引用变量列表中是否存在该引用名字
-                        if not any(
-                                ref_variable.name == variable.value.content.ref_var_name
-                                for ref_variable in ref_variables
-                        ):
+                        # 8.获取引用节点的变量名集合，如果是开始节点则从inputs中获取数据，否则从outputs中获取数据
+                        if ref_node_id not in ref_variable_names:
+                            ref_node_data = node_data_dict[ref_node_id]
+                            ref_variable_names[ref_node_id] = {
+                                ref_variable.name for ref_variable in (
+                                    ref_node_data.inputs if ref_node_data.node_type == NodeType.START
+                                    else ref_node_data.outputs
+                                )
+                            }
+
+                        # 9.判断引用变量列表中是否存在该引用名字
+                        if variable.value.content.ref_var_name not in ref_variable_names[ref_node_id]:
                             raise ValidateErrorException(
                                 f"工作流节点[{node_data.title}]引用了不存在的节点变量，请核实后重试")
 
@@ -329,25 +352,6 @@ class WorkflowConfig(BaseModel):
 
         return in_degree, out_degree
 
-    @classmethod
-    def _get_predecessors(cls, reverse_adj_list: defaultdict[Any, list], target_node_id: UUID) -> list[UUID]:
-        """根据传递的逆邻接表+目标节点id，获取该节点的所有前置节点"""
-        visited = set()
-        predecessors = []
-
-        def dfs(node_id):
-            """使用广度搜索有限算法遍历所有的前置节点"""
-            if node_id not in visited:
-                visited.add(node_id)
-                if node_id != target_node_id:
-                    predecessors.append(node_id)
-                for neighbor in reverse_adj_list[node_id]:
-                    dfs(neighbor)
-
-        dfs(target_node_id)
-
-        return predecessors
-
 class WorkflowState(TypedDict):
     """工作流图程序状态字典"""
     inputs: Annotated[dict[str, Any], _process_dict] # 工作流的最初始输入，也就是工具输入
@@ -5,7 +5,12 @@
 #Author  :Emcikem
 @File    :workflow.py
 """
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
 from typing import Any, Optional, Iterator
+from uuid import UUID
 
 from flask import current_app
 from langchain_core.runnables import RunnableConfig
@@ -33,24 +38,109 @@ NodeClasses = {
     NodeType.HTTP_REQUEST: HttpRequestNode,
 }
 
+# 进程内共享的编译后工作流缓存，键为工作流图配置及引用资源版本号的哈希，值为(工作流配置, 输入参数结构体, 编译后的图程序)，按最近使用顺序淘汰
+_compiled_workflows: OrderedDict[str, tuple[WorkflowConfig, type[BaseModel], CompiledStateGraph]] = OrderedDict()
+_compiled_workflows_lock = Lock()
+
+
 class Workflow(BaseTool):
     """工作流LangChain工具类"""
     _workflow_config: WorkflowConfig = PrivateAttr(None)
     _workflow: CompiledStateGraph = PrivateAttr(None)
 
-    def __init__(self, workflow_config: WorkflowConfig, **kwargs: Any):
-        """构造函数，完成工作流函数的初始化"""
+    def __init__(
+            self,
+            workflow_config: WorkflowConfig,
+            args_schema: type[BaseModel] = None,
+            workflow: CompiledStateGraph = None,
+            **kwargs: Any,
+    ):
+        """构造函数，完成工作流函数的初始化，传递了已编译的图程序时直接复用"""
         # 1.调用父类构造函数完成基础数据初始化
         super().__init__(
             name=workflow_config.name,
             description=workflow_config.description,
-            args_schema=self._build_args_schema(workflow_config),
+            args_schema=args_schema or self._build_args_schema(workflow_config),
             **kwargs
         )
 
         # 2.完善工作流配置与工作流图结构层序的初始化
         self._workflow_config = workflow_config
-        self._workflow = self._build_workflow()
+        self._workflow = workflow or self._build_workflow()
+
+    @classmethod
+    def from_graph(
+            cls,
+            account_id: UUID,
+            name: str,
+            description: str,
+            graph: dict[str, Any],
+            reference_versions: Optional[dict[str, int]] = None,
+    ) -> "Workflow":
+        """根据工作流图配置创建工作流工具，相同的图配置只校验及编译一次，编译后的图程序只依赖运行时状态，可在多次运行间复用，
+        reference_versions为图配置引用资源(get_reference_ids)的版本号，版本号变化时重新编译，为None时(无法获取版本号)不使用缓存"""
+        # 1.无法获取引用资源版本号时直接校验并编译
+        if reference_versions is None:
+            return cls(workflow_config=WorkflowConfig(
+                account_id=account_id,
+                name=name,
+                description=description,
+                nodes=graph.get("nodes", []),
+                edges=graph.get("edges", []),
+            ))
+
+        # 2.计算工作流图配置及引用资源版本号的哈希作为缓存键
+        cache_key = hashlib.sha256(json.dumps({
+            "account_id": str(account_id),
+            "name": name,
+            "description": description,
+            "nodes": graph.get("nodes", []),
+            "edges": graph.get("edges", []),
+            "reference_versions": reference_versions,
+        }, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+        # 3.查询缓存，命中时更新最近使用顺序并直接创建工具
+        with _compiled_workflows_lock:
+            compiled_workflow = _compiled_workflows.get(cache_key)
+            if compiled_workflow is not None:
+                _compiled_workflows.move_to_end(cache_key)
+        if compiled_workflow is not None:
+            workflow_config, args_schema, workflow = compiled_workflow
+            return cls(workflow_config=workflow_config, args_schema=args_schema, workflow=workflow)
+
+        # 4.缓存未命中时校验配置并编译图程序，该过程较慢，不持有锁
+        workflow_tool = cls(workflow_config=WorkflowConfig(
+            account_id=account_id,
+            name=name,
+            description=description,
+            nodes=graph.get("nodes", []),
+            edges=graph.get("edges", []),
+        ))
+
+        # 5.写入缓存，并淘汰超出容量的最久未使用的图程序
+        max_size = int(current_app.config.get("WORKFLOW_CACHE_SIZE", 64))
+        with _compiled_workflows_lock:
+            _compiled_workflows[cache_key] = (
+                workflow_tool._workflow_config,
+                workflow_tool.args_schema,
+                workflow_tool._workflow,
+            )
+            _compiled_workflows.move_to_end(cache_key)
+            while len(_compiled_workflows) > max_size:
+                _compiled_workflows.popitem(last=False)
+
+        return workflow_tool
+
+    @classmethod
+    def get_reference_ids(cls, graph: dict[str, Any]) -> list[str]:
+        """提取工作流图配置中引用的资源id列表，涵盖工具节点的API工具提供者id及知识库检索节点的知识库id"""
+        reference_ids = set()
+        for node in graph.get("nodes", []):
+            if node.get("node_type") == NodeType.TOOL and node.get("type") == "api_tool":
+                reference_ids.add(str(node.get("provider_id")))
+            elif node.get("node_type") == NodeType.DATASET_RETRIEVAL:
+                reference_ids.update(str(dataset_id) for dataset_id in node.get("dataset_ids", []))
+        return sorted(reference_ids)
 
     @classmethod
     def _build_args_schema(cls, workflow_config: WorkflowConfig) -> type[BaseModel]:
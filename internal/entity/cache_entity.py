@@ -15,4 +15,64 @@ LOCK_DOCUMENT_UPDATE_ENABLED = "lock:document:update:enabled_{document_id}"
 LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE = "lock:keyword_table:update:keyword_table_{dataset_id}"
 
 # 更新片段启用状态缓存锁
-LOCK_SEGMENT_UPDATE_ENABLED = "lock:segment:update:enabled_{document_id}"
\ No newline at end of file
+LOCK_SEGMENT_UPDATE_ENABLED = "lock:segment:update:enabled_{document_id}"
+
+# 文本嵌入向量缓存，vectors为哈希表(字段为文本哈希)，lru为记录最近访问时间的有序集合，hits/misses为命中计数器
+EMBEDDING_CACHE_VECTORS = "embedding_cache:{model_name}:vectors"
+EMBEDDING_CACHE_LRU = "embedding_cache:{model_name}:lru"
+EMBEDDING_CACHE_HITS = "embedding_cache:{model_name}:hits"
+EMBEDDING_CACHE_MISSES = "embedding_cache:{model_name}:misses"
+
+# 知识库版本号，知识库下的文档/片段发生变更时递增
+CACHE_DATASET_VERSION = "dataset:version:{dataset_id}"
+
+# 知识库检索结果缓存，键由知识库id及版本号、检索策略、k、score、query计算得出
+CACHE_RETRIEVAL_RESULT = "retrieval:result:{cache_hash}"
+
+# 知识库检索结果缓存的过期时间，单位为秒，默认为300
+RETRIEVAL_RESULT_CACHE_EXPIRE_TIME = 300
+
+# 文档构建进度，哈希表记录文档状态、片段总数、已完成片段数等计数器
+DOCUMENT_PROGRESS = "document:progress:{document_id}"
+
+# 文档构建进度事件频道，同一批次的文档共用一个频道
+DOCUMENT_PROGRESS_CHANNEL = "document:progress:channel:{batch}"
+
+# 文档构建进度的过期时间，单位为秒，默认为3600
+DOCUMENT_PROGRESS_EXPIRE_TIME = 3600
+
+# 知识库检索记录队列，检索时写入查询记录及命中片段，由定时任务批量落库
+RETRIEVAL_RECORD_QUEUE = "retrieval:record:queue"
+
+# 知识库检索记录死信队列，同一条检索记录落库失败次数达到上限后移入该队列，避免异常记录一直阻塞检索记录队列
+RETRIEVAL_RECORD_DEAD_LETTER_QUEUE = "retrieval:record:dead_letter"
+
+# 知识库检索记录落库的最大尝试次数
+RETRIEVAL_RECORD_MAX_ATTEMPTS = 3
+
+# 应用每日统计去重集合，记录当日已统计过的账号及会话，用于增量维护去重账号数与去重会话数
+APP_STATISTIC_ACCOUNTS = "app_statistic:{app_id}:{statistic_date}:accounts"
+APP_STATISTIC_CONVERSATIONS = "app_statistic:{app_id}:{statistic_date}:conversations"
+
+# 应用每日统计去重集合的过期时间，单位为秒，默认为2天，覆盖跨越午夜才完成的消息
+APP_STATISTIC_EXPIRE_TIME = 2 * 24 * 60 * 60
+
+# 应用每日去重账号及会话的HyperLogLog，多天的HyperLogLog可以合并计算统计区间内的去重数，统计分析无需扫描消息表
+APP_STATISTIC_ACCOUNTS_HLL = "app_statistic:{app_id}:{statistic_date}:accounts_hll"
+APP_STATISTIC_CONVERSATIONS_HLL = "app_statistic:{app_id}:{statistic_date}:conversations_hll"
+
+# 应用每日HyperLogLog的过期时间，单位为秒，需覆盖最长366天的统计区间及等长的对比区间
+APP_STATISTIC_HLL_EXPIRE_TIME = 740 * 24 * 60 * 60
+
+# 应用引用资源版本号，API工具提供者、工作流、知识库发生变更时只递增该资源的版本号，用于淘汰引用了该资源的已编译工作流
+CACHE_APP_REFERENCE_VERSION = "app:reference_version:{resource_id}"
+
+# 应用配置版本号，应用配置或应用引用的资源(API工具、工作流、知识库)发生变更时只递增对应应用的版本号
+CACHE_APP_CONFIG_VERSION = "app_config:version:{app_id}"
+
+# 应用配置快照，存储校验后可直接使用的应用配置，snapshot_id为draft_{app_id}或published_{app_config_id}，
+# version为构建快照前读取的应用配置版本号，版本号递增后旧快照不再被读取，由过期时间自然淘汰
+CACHE_APP_CONFIG_SNAPSHOT = "app_config:snapshot:{snapshot_id}:{version}"
+
+# 应用配置快照的过期时间，单位为秒，默认为1天
+APP_CONFIG_SNAPSHOT_EXPIRE_TIME = 24 * 60 * 60
@@ -14,6 +14,11 @@ class ProcessType(str, Enum):
     AUTOMATIC = "automatic"
     CUSTOM = "custom"
 
+class TextSplitterType(str, Enum):
+    """文本分割器类型枚举，recursive为LangChain递归字符分割器，token为基于token偏移量的线性分割器"""
+    RECURSIVE = "recursive"
+    TOKEN = "token"
+
 # 默认的处理规则
 DEFAULT_PROCESS_RULE = {
     "mode": "custom",
@@ -55,6 +60,10 @@ class SegmentStatus(str, Enum):
     COMPLETED = "completed"
     ERROR = "error"
 
+# BM25打分参数，k1控制词频饱和度，b控制片段长度归一化程度
+BM25_K1 = 1.5
+BM25_B = 0.75
+
 class RetrievalStrategy(str, Enum):
     """检索策略类型枚举"""
     FULL_TEXT = "fulltext"
@@ -64,4 +73,9 @@ class RetrievalStrategy(str, Enum):
 class RetrievalSource(str, Enum):
     """检索来源"""
     HIT_TESTING = "hit_testing"
-    APP = "app"
\ No newline at end of file
+    APP = "app"
+
+class VectorDatabaseType(str, Enum):
+    """向量数据库后端类型枚举"""
+    WEAVIATE = "weaviate"
+    FAISS = "faiss"
@@ -7,11 +7,13 @@
 """
 from uuid import UUID
 
+from flask import request
 from flask_login import current_user
 from injector import inject
 from dataclasses import dataclass
+from internal.schema.analysis_schema import GetAppAnalysisReq
 from internal.service import AnalysisService
-from pkg.response import success_json
+from pkg.response import success_json, validate_error_json
 
 
 @inject
@@ -21,6 +23,17 @@ class AnalysisHandler:
     analysis_service: AnalysisService
 
     def get_app_analysis(self, app_id: UUID):
-        """根据传递的应用id获取应用的统计信息"""
-        app_analysis = self.analysis_service.get_app_analysis(app_id, current_user)
+        """根据传递的应用id及可选的日期范围获取应用的统计信息"""
+        # 1.提取请求数据并校验
+        req = GetAppAnalysisReq(request.args)
+        if not req.validate():
+            return validate_error_json(req.errors)
+
+        # 2.调用服务获取应用的统计信息
+        app_analysis = self.analysis_service.get_app_analysis(
+            app_id,
+            current_user,
+            req.start_date.data,
+            req.end_date.data,
+        )
         return success_json(app_analysis)
\ No newline at end of file
@@ -8,13 +8,13 @@
 from uuid import UUID
 
 from flask import request
-from flask_login import current_user
+from flask_login import current_user, login_required
 from injector import inject
 from dataclasses import dataclass
 
 from internal.schema.conversation_schema import GetConversationMessagesWithPageReq, GetConversationMessagesWithPageResp, \
     UpdateConversationNameReq, UpdateConversationIsPinnedReq
-from internal.service import ConversationService
+from internal.service import ConversationService, AccountService
 from pkg.paginator import PageModel
 from pkg.response import validate_error_json, success_json, success_message
 
@@ -24,6 +24,7 @@ from pkg.response import validate_error_json, success_json, success_message
 class ConversationHandler:
     """会话处理器"""
     conversation_service: ConversationService
+    account_service: AccountService
 
     def get_conversation_messages_with_page(self, conversation_id: UUID):
         """根据传递的回话id获取该会话的消息列表分页数据"""
@@ -86,4 +87,10 @@ class ConversationHandler:
         # 2.调用服务更新会话置顶状态
         self.conversation_service.update_conversation(conversation_id, current_user, is_pinned=req.is_pinned.data)
 
-        return success_message("修改会话置顶状态成功")
\ No newline at end of file
+        return success_message("修改会话置顶状态成功")
+
+    @login_required
+    def get_background_stats(self):
+        """获取当前进程会话后台任务执行器的统计信息，用于观察等待队列深度及合并、丢弃情况，只有运维账号可以查看"""
+        self.account_service.validate_operator(current_user)
+        return success_json(self.conversation_service.get_background_stats())
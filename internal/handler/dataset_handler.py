@@ -7,7 +7,7 @@
 """
 from uuid import UUID
 
-from flask_login import current_user
+from flask_login import current_user, login_required
 from injector import inject
 from dataclasses import dataclass
 
@@ -23,7 +23,7 @@ from internal.schema.dataset_schema import (
 )
 from pkg.paginator import PageModel
 from pkg.response import validate_error_json, success_json, success_message
-from internal.service import DatasetService, EmbeddingsService, JiebaService, VectorDatabaseService
+from internal.service import DatasetService, EmbeddingsService, JiebaService, VectorDatabaseService, AccountService
 from flask import request
 from internal.core.file_extractor import FileExtractor
 from pkg.sqlalchemy import SQLAlchemy
@@ -38,6 +38,7 @@ class DatasetHandler:
     file_extractor: FileExtractor
     embeddings_service: EmbeddingsService
     vector_database_service: VectorDatabaseService
+    account_service: AccountService
     db: SQLAlchemy
 
     def hit(self, dataset_id: UUID):
@@ -52,6 +53,12 @@ class DatasetHandler:
 
         return success_json(hit_result)
 
+    @login_required
+    def get_embeddings_cache_stats(self):
+        """获取向量缓存的命中数、未命中数及缓存条数，只有运维账号可以查看"""
+        self.account_service.validate_operator(current_user)
+        return success_json(self.embeddings_service.get_cache_stats())
+
     def get_dataset_queries(self, dataset_id: UUID):
         """根据传递的知识库id获取最近的10条记录"""
         dataset_queries = self.dataset_service.get_dataset_queries(dataset_id, current_user)
@@ -16,7 +16,7 @@ from internal.schema.dataset_schema import UpdateDocumentEnabledReq
 from internal.schema.document_schema import CreateDocumentsReq, CreateDocumentsResp, GetDocumentResp, \
     UpdateDocumentNameReq, GetDocumentsWithPageReq, GetDocumentsWithPageResp
 from pkg.paginator import PageModel
-from pkg.response import validate_error_json, success_json, success_message
+from pkg.response import validate_error_json, success_json, success_message, compact_generate_response
 from internal.service import DocumentService
 
 @inject
@@ -98,4 +98,10 @@ class DocumentHandler:
         """根据传递的知识库id+批处理标识或取文档的状态"""
         documents_status = self.document_service.get_documents_status(dataset_id, batch, current_user)
 
-        return success_json(documents_status)
\ No newline at end of file
+        return success_json(documents_status)
+
+    def stream_documents_status(self, dataset_id: UUID, batch: str):
+        """根据传递的知识库id+批处理标识，以流式事件输出文档的构建进度"""
+        response = self.document_service.stream_documents_status(dataset_id, batch, current_user)
+
+        return compact_generate_response(response)
\ No newline at end of file
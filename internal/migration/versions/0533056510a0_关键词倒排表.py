@@ -0,0 +1,101 @@
+"""关键词倒排表
+
+Revision ID: 0533056510a0
+Revises: 035f890620ba
+Create Date: 2026-10-18 10:12:41.318205
+
+"""
+import json
+import uuid
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0533056510a0'
+down_revision = '035f890620ba'
+branch_labels = None
+depends_on = None
+
+# 每批写入的倒排记录数
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    # 1.创建关键词倒排表
+    keyword_posting = op.create_table('keyword_posting',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('dataset_id', sa.String(length=36), nullable=False),
+    sa.Column('keyword', sa.String(length=255), nullable=False),
+    sa.Column('segment_id', sa.String(length=36), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name='pk_keyword_posting_id')
+    )
+    with op.batch_alter_table('keyword_posting', schema=None) as batch_op:
+        batch_op.create_index('idx_keyword_posting_dataset_id_keyword', ['dataset_id', 'keyword'], unique=False)
+        batch_op.create_index('idx_keyword_posting_segment_id', ['segment_id'], unique=False)
+
+    # 2.将原有关键词表中的JSON数据逐个知识库转换成倒排记录
+    connection = op.get_bind()
+    now = datetime.now()
+    rows = connection.execute(sa.text('SELECT dataset_id, keyword_table FROM keyword_table')).fetchall()
+    for dataset_id, keyword_table in rows:
+        if isinstance(keyword_table, (str, bytes)):
+            keyword_table = json.loads(keyword_table)
+
+        postings = [
+            {
+                'id': str(uuid.uuid4()),
+                'dataset_id': dataset_id,
+                'keyword': keyword,
+                'segment_id': segment_id,
+                'created_at': now,
+            }
+            for keyword, segment_ids in (keyword_table or {}).items()
+            for segment_id in set(segment_ids)
+        ]
+        for i in range(0, len(postings), BATCH_SIZE):
+            op.bulk_insert(keyword_posting, postings[i: i + BATCH_SIZE])
+
+    # 3.删除原有的关键词表
+    op.drop_table('keyword_table')
+
+
+def downgrade():
+    # 1.重新创建关键词表
+    keyword_table = op.create_table('keyword_table',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('dataset_id', sa.String(length=36), nullable=False),
+    sa.Column('keyword_table', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name='pk_keyword_table_id')
+    )
+
+    # 2.将倒排记录重新聚合为每个知识库一条JSON记录
+    connection = op.get_bind()
+    now = datetime.now()
+    keyword_tables = {}
+    rows = connection.execute(sa.text('SELECT dataset_id, keyword, segment_id FROM keyword_posting')).fetchall()
+    for dataset_id, keyword, segment_id in rows:
+        keyword_tables.setdefault(dataset_id, {}).setdefault(keyword, []).append(segment_id)
+
+    op.bulk_insert(keyword_table, [
+        {
+            'id': str(uuid.uuid4()),
+            'dataset_id': dataset_id,
+            'keyword_table': table,
+            'updated_at': now,
+            'created_at': now,
+        }
+        for dataset_id, table in keyword_tables.items()
+    ])
+
+    # 3.删除关键词倒排表
+    with op.batch_alter_table('keyword_posting', schema=None) as batch_op:
+        batch_op.drop_index('idx_keyword_posting_segment_id')
+        batch_op.drop_index('idx_keyword_posting_dataset_id_keyword')
+
+    op.drop_table('keyword_posting')
@@ -0,0 +1,50 @@
+"""应用每日统计
+
+Revision ID: 1c84b695043c
+Revises: 8d7a3415b77b
+Create Date: 2026-10-18 21:10:05.614382
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c84b695043c'
+down_revision = '8d7a3415b77b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 1.创建应用每日统计表，历史数据通过flask backfill-app-statistics命令回填
+    op.create_table('app_daily_statistic',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('app_id', sa.String(length=36), nullable=False),
+    sa.Column('statistic_date', sa.Date(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.Column('active_account_count', sa.Integer(), nullable=False),
+    sa.Column('conversation_count', sa.Integer(), nullable=False),
+    sa.Column('total_token_count', sa.Integer(), nullable=False),
+    sa.Column('latency', sa.Float(), nullable=False),
+    sa.Column('total_price', sa.Numeric(precision=20, scale=7), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name='pk_app_daily_statistic_id')
+    )
+    with op.batch_alter_table('app_daily_statistic', schema=None) as batch_op:
+        batch_op.create_index('idx_app_daily_statistic_app_id_statistic_date', ['app_id', 'statistic_date'], unique=True)
+
+    # 2.消息表新增应用+创建时间索引，加速按日期回填应用每日统计
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.create_index('idx_message_app_id_created_at', ['app_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_index('idx_message_app_id_created_at')
+
+    with op.batch_alter_table('app_daily_statistic', schema=None) as batch_op:
+        batch_op.drop_index('idx_app_daily_statistic_app_id_statistic_date')
+
+    op.drop_table('app_daily_statistic')
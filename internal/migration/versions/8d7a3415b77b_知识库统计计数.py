@@ -0,0 +1,60 @@
+"""知识库统计计数
+
+Revision ID: 8d7a3415b77b
+Revises: b6539b603445
+Create Date: 2026-10-18 20:16:42.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d7a3415b77b'
+down_revision = 'b6539b603445'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 1.知识库表新增文档数、命中次数、字符总数、关联应用数字段
+    with op.batch_alter_table('dataset', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('document_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('hit_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('character_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('related_app_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # 2.文档表新增片段数、命中次数字段
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('segment_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('hit_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # 3.根据片段记录回填文档的片段数与命中次数
+    op.execute(
+        'UPDATE document SET '
+        'segment_count = (SELECT COUNT(segment.id) FROM segment WHERE segment.document_id = document.id), '
+        'hit_count = (SELECT COALESCE(SUM(segment.hit_count), 0) FROM segment WHERE segment.document_id = document.id)'
+    )
+
+    # 4.根据文档及应用关联记录回填知识库的计数
+    op.execute(
+        'UPDATE dataset SET '
+        'document_count = (SELECT COUNT(document.id) FROM document WHERE document.dataset_id = dataset.id), '
+        'hit_count = (SELECT COALESCE(SUM(document.hit_count), 0) FROM document WHERE document.dataset_id = dataset.id), '
+        'character_count = '
+        '(SELECT COALESCE(SUM(document.character_count), 0) FROM document WHERE document.dataset_id = dataset.id), '
+        'related_app_count = '
+        '(SELECT COUNT(app_dataset_join.id) FROM app_dataset_join WHERE app_dataset_join.dataset_id = dataset.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_column('hit_count')
+        batch_op.drop_column('segment_count')
+
+    with op.batch_alter_table('dataset', schema=None) as batch_op:
+        batch_op.drop_column('related_app_count')
+        batch_op.drop_column('character_count')
+        batch_op.drop_column('hit_count')
+        batch_op.drop_column('document_count')
@@ -0,0 +1,76 @@
+"""关键词BM25统计
+
+Revision ID: b6539b603445
+Revises: 0533056510a0
+Create Date: 2026-10-18 11:03:27.540918
+
+"""
+import uuid
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6539b603445'
+down_revision = '0533056510a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 1.倒排记录新增词频与片段长度字段
+    with op.batch_alter_table('keyword_posting', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('term_frequency', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.add_column(sa.Column('segment_length', sa.Integer(), nullable=False, server_default='0'))
+
+    # 2.创建知识库关键词统计表
+    keyword_statistic = op.create_table('keyword_statistic',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('dataset_id', sa.String(length=36), nullable=False),
+    sa.Column('segment_count', sa.Integer(), nullable=False),
+    sa.Column('total_length', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name='pk_keyword_statistic_id')
+    )
+    with op.batch_alter_table('keyword_statistic', schema=None) as batch_op:
+        batch_op.create_index('idx_keyword_statistic_dataset_id', ['dataset_id'], unique=True)
+
+    # 3.使用片段字符数回填倒排记录的片段长度，历史记录的词频统一按1处理
+    op.execute(
+        'UPDATE keyword_posting SET segment_length = '
+        '(SELECT segment.character_count FROM segment WHERE segment.id = keyword_posting.segment_id)'
+        ' WHERE EXISTS (SELECT 1 FROM segment WHERE segment.id = keyword_posting.segment_id)'
+    )
+
+    # 4.根据倒排记录回填每个知识库的片段数与片段总长度
+    connection = op.get_bind()
+    now = datetime.now()
+    rows = connection.execute(sa.text(
+        'SELECT dataset_id, COUNT(*), COALESCE(SUM(segment_length), 0) FROM ('
+        'SELECT DISTINCT dataset_id, segment_id, segment_length FROM keyword_posting'
+        ') AS segment_lengths GROUP BY dataset_id'
+    )).fetchall()
+    op.bulk_insert(keyword_statistic, [
+        {
+            'id': str(uuid.uuid4()),
+            'dataset_id': dataset_id,
+            'segment_count': int(segment_count),
+            'total_length': int(total_length),
+            'updated_at': now,
+            'created_at': now,
+        }
+        for dataset_id, segment_count, total_length in rows
+    ])
+
+
+def downgrade():
+    with op.batch_alter_table('keyword_statistic', schema=None) as batch_op:
+        batch_op.drop_index('idx_keyword_statistic_dataset_id')
+
+    op.drop_table('keyword_statistic')
+    with op.batch_alter_table('keyword_posting', schema=None) as batch_op:
+        batch_op.drop_column('segment_length')
+        batch_op.drop_column('term_frequency')
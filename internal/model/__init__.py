@@ -8,18 +8,18 @@
 from .account import Account, AccountOAuth
 from .api_key import ApiKey
 from .api_tool import ApiTool, ApiToolProvider
-from .app import App, AppDatasetJoin, AppConfig, AppConfigVersion
+from .app import App, AppDatasetJoin, AppConfig, AppConfigVersion, AppDailyStatistic
 from .conversation import Conversation, Message, MessageAgentThought
-from .dataset import Dataset, Document, Segment, KeywordTable, DatasetQuery, ProcessRule
+from .dataset import Dataset, Document, Segment, KeywordPosting, KeywordStatistic, DatasetQuery, ProcessRule
 from .end_user import EndUser
 from .upload_file import UploadFile
 from .workflow import Workflow, WorkflowResult
 
 __all__ = [
-    "App", "AppDatasetJoin", "AppConfig", "AppConfigVersion",
+    "App", "AppDatasetJoin", "AppConfig", "AppConfigVersion", "AppDailyStatistic",
     "ApiTool", "ApiToolProvider",
     "UploadFile",
-    "Dataset", "Document", "Segment", "KeywordTable", "DatasetQuery", "ProcessRule",
+    "Dataset", "Document", "Segment", "KeywordPosting", "KeywordStatistic", "DatasetQuery", "ProcessRule",
     "Conversation", "Message", "MessageAgentThought",
     "Account", "AccountOAuth",
     "ApiKey", "EndUser",
@@ -13,7 +13,7 @@ from sqlalchemy import (
     Text,
     DateTime,
     PrimaryKeyConstraint,
-    Index, JSON, Integer,
+    Index, JSON, Integer, Date, Float, Numeric,
 )
 
 from internal.entity.app_entity import AppConfigType, DEFAULT_APP_CONFIG, AppStatus
@@ -196,4 +196,24 @@ class AppDatasetJoin(db.Model):
     app_id = Column(String(36), nullable=False)
     dataset_id = Column(String(36), nullable=False)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
-    created_at = Column(DateTime, default=datetime.now, nullable=False)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+
+
+class AppDailyStatistic(db.Model):
+    """应用每日统计模型，按应用+日期汇总已回答消息的各项指标，统计分析直接读取该表，无需扫描消息表"""
+    __tablename__ = "app_daily_statistic"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", name="pk_app_daily_statistic_id"),
+        Index("idx_app_daily_statistic_app_id_statistic_date", "app_id", "statistic_date", unique=True),
+    )
+    id = Column(String(36), default=uuid.uuid4, nullable=False)
+    app_id = Column(String(36), nullable=False)
+    statistic_date = Column(Date, nullable=False)
+    message_count = Column(Integer, nullable=False, default=0)  # 消息数
+    active_account_count = Column(Integer, nullable=False, default=0)  # 当日去重的提问账号数
+    conversation_count = Column(Integer, nullable=False, default=0)  # 当日去重的会话数
+    total_token_count = Column(Integer, nullable=False, default=0)  # token总数
+    latency = Column(Float, nullable=False, default=0.0)  # 总耗时
+    total_price = Column(Numeric(20, 7), nullable=False, default=0)  # 总花费
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
@@ -54,6 +54,7 @@ class Message(db.Model):
     __tablename__ = "message"
     __table_args__ = (
         PrimaryKeyConstraint("id", name="pk_message_id"),
+        Index("idx_message_app_id_created_at", "app_id", "created_at"),
     )
 
     id = Column(String(36), nullable=False, default=uuid.uuid4)
@@ -13,12 +13,11 @@ from sqlalchemy import (
     Text,
     DateTime,
     PrimaryKeyConstraint,
+    Index,
     JSON, Integer, Boolean,
-    func
 )
 from internal.extension.database_extension import db
 from .upload_file import UploadFile
-from .app import AppDatasetJoin
 
 class Dataset(db.Model):
     """知识库"""
@@ -32,45 +31,13 @@ class Dataset(db.Model):
     name = Column(String(255), nullable=False, default="")
     icon = Column(String(255), nullable=False, default="")
     description = Column(Text, nullable=False, default="")
+    document_count = Column(Integer, nullable=False, default=0)  # 文档数
+    hit_count = Column(Integer, nullable=False, default=0)  # 所有片段的命中次数之和
+    character_count = Column(Integer, nullable=False, default=0)  # 所有文档的字符总数
+    related_app_count = Column(Integer, nullable=False, default=0)  # 关联的应用数
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
     created_at = Column(DateTime, default=datetime.now, nullable=False)
 
-    @property
-    def document_count(self) -> int:
-        """只读属性，获取知识库下的文档数"""
-        return (
-            db.session.query(func.count(Document.id))
-            .filter(Document.dataset_id == self.id)
-            .scalar()
-        )
-
-    @property
-    def hit_count(self) -> int:
-        """只读属性，获取该知识库的命中次数"""
-        return (
-            db.session.query(func.coalesce(func.sum(Segment.hit_count), 0))
-            .filter(Segment.dataset_id == self.id)
-            .scalar()
-        )
-
-    @property
-    def character_count(self) -> int:
-        """只读属性，获取该知识库下的字符总数"""
-        return (
-            db.session.query(func.coalesce(func.sum(Document.character_count), 0))
-            .filter(Document.dataset_id == self.id)
-            .scalar()
-        )
-
-    @property
-    def related_app_count(self) -> int:
-        """只读属性，获取该知识库关联的应用数"""
-        return (
-            db.session.query(func.count(AppDatasetJoin.id))
-            .filter(AppDatasetJoin.dataset_id == self.id)
-            .scalar()
-        )
-
 class Document(db.Model):
     """文档表模型"""
     __tablename__ = "document"
@@ -87,6 +54,8 @@ class Document(db.Model):
     position = Column(String(255), nullable=False, default="")
     character_count = Column(Integer, nullable=False, default=0)
     token_count = Column(Integer, nullable=False, default=0)
+    segment_count = Column(Integer, nullable=False, default=0)  # 片段数
+    hit_count = Column(Integer, nullable=False, default=0)  # 所有片段的命中次数之和
     processing_started_at = Column(DateTime, nullable=True)
     parsing_completed_at = Column(DateTime, nullable=True)
     splitting_completed_at = Column(DateTime, nullable=True)
@@ -112,18 +81,6 @@ class Document(db.Model):
             ProcessRule.id == self.process_rule_id,
         ).one_or_none()
 
-    @property
-    def segment_count(self) -> int:
-        return db.session.query(func.count(Segment.id)).filter(
-            Segment.document_id == self.id,
-        ).scalar()
-
-    @property
-    def hit_count(self) -> int:
-        return db.session.query(func.coalesce(func.sum(Segment.hit_count), 0)).filter(
-            Segment.document_id == self.id,
-        ).scalar()
-
 class Segment(db.Model):
     """片段表模型"""
     __tablename__ = "segment"
@@ -157,15 +114,33 @@ class Segment(db.Model):
     def document(self) -> "Document":
         return db.session.get(Document, self.document_id)
 
-class KeywordTable(db.Model):
-    """"关键词表模型"""
-    __tablename__ = "keyword_table"
+class KeywordPosting(db.Model):
+    """关键词倒排表模型，每条记录代表知识库中某个关键词命中的一个片段"""
+    __tablename__ = "keyword_posting"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", name="pk_keyword_posting_id"),
+        Index("idx_keyword_posting_dataset_id_keyword", "dataset_id", "keyword"),
+        Index("idx_keyword_posting_segment_id", "segment_id"),
+    )
+    id = Column(String(36), nullable=False, default=uuid.uuid4)
+    dataset_id = Column(String(36), nullable=False)
+    keyword = Column(String(255), nullable=False, default="")
+    segment_id = Column(String(36), nullable=False)
+    term_frequency = Column(Integer, nullable=False, default=1)  # 关键词在片段中出现的次数
+    segment_length = Column(Integer, nullable=False, default=0)  # 片段长度，用于BM25长度归一化
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+
+class KeywordStatistic(db.Model):
+    """知识库关键词统计模型，记录BM25打分所需的片段数与片段总长度"""
+    __tablename__ = "keyword_statistic"
     __table_args__ = (
-        PrimaryKeyConstraint("id", name="pk_keyword_table_id"),
+        PrimaryKeyConstraint("id", name="pk_keyword_statistic_id"),
+        Index("idx_keyword_statistic_dataset_id", "dataset_id", unique=True),
     )
     id = Column(String(36), nullable=False, default=uuid.uuid4)
     dataset_id = Column(String(36), nullable=False)
-    keyword_table = Column(JSON, nullable=False, default={})
+    segment_count = Column(Integer, nullable=False, default=0)
+    total_length = Column(Integer, nullable=False, default=0)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
     created_at = Column(DateTime, default=datetime.now, nullable=False)
 
@@ -194,6 +194,10 @@ class Router:
         bp.add_url_rule("/datasets/<uuid:dataset_id>", view_func=self.dataset_handler.get_dataset)
         bp.add_url_rule("/datasets/<uuid:dataset_id>", methods=["POST"], view_func=self.dataset_handler.update_dataset)
         bp.add_url_rule("/datasets/<uuid:dataset_id>/queries", view_func=self.dataset_handler.get_dataset_queries)
+        bp.add_url_rule(
+            "/datasets/embeddings/cache-stats",
+            view_func=self.dataset_handler.get_embeddings_cache_stats,
+        )
         bp.add_url_rule(
             "/datasets/<uuid:dataset_id>/delete",
             methods=["POST"],
@@ -231,6 +235,10 @@ class Router:
             "/datasets/<uuid:dataset_id>/documents/batch/<string:batch>",
             view_func=self.document_handler.get_documents_status
         )
+        bp.add_url_rule(
+            "/datasets/<uuid:dataset_id>/documents/batch/<string:batch>/stream",
+            view_func=self.document_handler.stream_documents_status
+        )
         bp.add_url_rule(
             "/datasets/<uuid:dataset_id>/documents/<uuid:document_id>/segments",
             view_func=self.segment_handler.get_segments_with_page
@@ -454,6 +462,10 @@ class Router:
             methods=["POST"],
             view_func=self.conversation_handler.update_conversation_is_pinned,
         )
+        bp.add_url_rule(
+            "/conversations/background-stats",
+            view_func=self.conversation_handler.get_background_stats,
+        )
 
 
         # 7. 在应用上去注册蓝图
@@ -0,0 +1,34 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 20:55
+#Author  :Emcikem
+@File    :analysis_schema.py
+"""
+from flask_wtf import FlaskForm
+from wtforms import DateField
+from wtforms.validators import Optional, ValidationError
+
+
+class GetAppAnalysisReq(FlaskForm):
+    """获取应用统计分析请求，start_date与end_date均为闭区间的日期(YYYY-MM-DD)，不传递时统计今天之前的7天"""
+    start_date = DateField("start_date", format="%Y-%m-%d", validators=[
+        Optional(),
+    ])
+    end_date = DateField("end_date", format="%Y-%m-%d", validators=[
+        Optional(),
+    ])
+
+    def validate_end_date(self, field: DateField) -> None:
+        """校验统计日期范围，开始日期与结束日期需要同时传递，且范围不能超过366天"""
+        # 1.开始日期与结束日期需要同时传递或同时不传递
+        if (self.start_date.data is None) != (field.data is None):
+            raise ValidationError("开始日期与结束日期需要同时传递")
+        if field.data is None:
+            return
+
+        # 2.校验日期范围
+        if field.data < self.start_date.data:
+            raise ValidationError("结束日期不能早于开始日期")
+        if (field.data - self.start_date.data).days >= 366:
+            raise ValidationError("统计日期范围不能超过366天")
@@ -17,7 +17,7 @@ from wtforms.validators import (
     Length,
     Optional
 )
-from internal.entity.dataset_entity import ProcessType, DEFAULT_PROCESS_RULE
+from internal.entity.dataset_entity import ProcessType, TextSplitterType, DEFAULT_PROCESS_RULE
 from pkg.paginator import PaginatorReq
 from .schema import ListField, DictField
 
@@ -123,13 +123,19 @@ class CreateDocumentsReq(FlaskForm):
             if not (0 <= field.data["segment"]["chunk_overlap"] <= field.data["segment"]["chunk_size"] * 0.5):
                 raise ValidationError(f"块重叠大小在0-{int(field.data['segment']['chunk_size'] * 0.5)}")
 
-            # 14.更新并提出多余数据
+            # 14.校验分割器类型splitter，可选，默认为recursive
+            splitter = field.data["segment"].get("splitter", TextSplitterType.RECURSIVE.value)
+            if splitter not in [splitter_type.value for splitter_type in TextSplitterType]:
+                raise ValidationError("分割器类型格式错误")
+
+            # 15.更新并提出多余数据
             field.data = {
                 "pre_process_rules": field.data["pre_process_rules"],
                 "segment": {
                     "separators": field.data["segment"]["separators"],
                     "chunk_size": field.data["segment"]["chunk_size"],
                     "chunk_overlap": field.data["segment"]["chunk_overlap"],
+                    "splitter": splitter,
                 }
             }
 
@@ -13,6 +13,7 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 
 from config import Config
+from internal.command import backfill_app_statistics
 from internal.exception import CustomException
 from internal.router import Router
 from pkg.response import Response, json, HttpCode
@@ -67,6 +68,9 @@ class Http(Flask):
         # 7.注册应用路由
         router.register_router(self)
 
+        # 8.注册命令行命令
+        self.cli.add_command(backfill_app_statistics)
+
     def _register_error_handler(self, error: Exception):
         # 1.异常信息是不是我们的自定义异常，如果是可以提取message和code等信息
         if isinstance(error, CustomException):
@@ -11,14 +11,20 @@ from .analysis_service import AnalysisService
 from .api_key_service import ApiKeyService
 from .api_tool_service import ApiToolService
 from .app_config_service import AppConfigService
+from .app_reference_version_service import AppReferenceVersionService
+from .app_runtime_service import AppRuntimeService
 from .app_service import AppService
+from .app_statistic_service import AppStatisticService
 from .assistant_agent_service import AssistantAgentService
 from .base_service import BaseService
 from .builtin_app_service import BuiltinAppService
 from .builtin_tool_service import BuiltinToolService
 from .conversation_service import ConversationService
 from .cos_service import CosService
+from .dataset_counter_service import DatasetCounterService
 from .dataset_service import DatasetService
+from .dataset_version_service import DatasetVersionService
+from .document_progress_service import DocumentProgressService
 from .document_service import DocumentService
 from .embeddings_service import EmbeddingsService
 from .faiss_service import FaissService
@@ -30,6 +36,7 @@ from .language_model_service import LanguageModelService
 from .oauth_service import OAuthService
 from .openapi_service import OpenAPIService
 from .process_rule_service import ProcessRuleService
+from .retrieval_record_service import RetrievalRecordService
 from .retrieval_service import RetrievalService
 from .segment_service import SegmentService
 from .upload_file_service import UploadFileService
@@ -47,13 +54,17 @@ __all__ = [
     "CosService",
     "UploadFileService",
     "DatasetService",
+    "DatasetCounterService",
+    "DatasetVersionService",
     "EmbeddingsService",
     "JiebaService",
+    "DocumentProgressService",
     "DocumentService",
     "IndexingService",
     "ProcessRuleService",
     "KeywordTableService",
     "SegmentService",
+    "RetrievalRecordService",
     "RetrievalService",
     "ConversationService",
     "JwtService",
@@ -62,6 +73,8 @@ __all__ = [
     "AIService",
     "ApiKeyService",
     "AppConfigService",
+    "AppReferenceVersionService",
+    "AppRuntimeService",
     "OpenAPIService",
     "BuiltinAppService",
     "WorkflowService",
@@ -69,5 +82,6 @@ __all__ = [
     "AssistantAgentService",
     "FaissService",
     "AnalysisService",
+    "AppStatisticService",
     "WebAppService",
 ]
\ No newline at end of file
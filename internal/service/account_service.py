@@ -12,10 +12,10 @@ from datetime import datetime, timedelta
 from typing import Any
 from uuid import UUID
 
-from flask import request
+from flask import request, current_app
 from injector import inject
 
-from internal.exception import FailException
+from internal.exception import FailException, ForbiddenException
 from internal.model import Account, AccountOAuth
 from pkg.password import hash_password, compare_password
 from pkg.sqlalchemy import SQLAlchemy
@@ -44,6 +44,11 @@ class AccountService(BaseService):
             AccountOAuth.openid == openid
         ).one_or_none()
 
+    def validate_operator(self, account: Account) -> None:
+        """校验传递的账号是否为运维账号(配置在OPERATOR_ACCOUNT_EMAILS中)，不是则抛出错误"""
+        if account.email not in current_app.config.get("OPERATOR_ACCOUNT_EMAILS", []):
+            raise ForbiddenException("当前账号无权限查看运行统计信息")
+
     def get_account_by_email(self, email: str) -> Account:
         """根据传递的邮箱查询账号信息"""
         return self.db.session.query(Account).filter(
@@ -27,6 +27,7 @@ from internal.schema.api_tool_schema import (
 )
 from pkg.paginator import Paginator
 from pkg.sqlalchemy import SQLAlchemy
+from .app_reference_version_service import AppReferenceVersionService
 from .base_service import BaseService
 
 @inject
@@ -35,6 +36,7 @@ class ApiToolService(BaseService):
     """自定义API插件服务"""
     db: SQLAlchemy
     api_provider_manager: ApiProviderManager
+    app_reference_version_service: AppReferenceVersionService
 
     def update_api_tool_provider(
             self,
@@ -91,6 +93,12 @@ class ApiToolService(BaseService):
                     parameters=method_item.get("parameters", []),
                 )
 
+        # 8.递增工具提供者的引用资源版本号及引用了该工具提供者的应用配置版本号，淘汰对应的应用运行时及配置快照
+        self.app_reference_version_service.bump_version(
+            provider_id,
+            self.app_reference_version_service.get_api_tool_provider_app_ids(provider_id),
+        )
+
     def get_api_tool_providers_with_page(
             self,
             req: GetApiToolProvidersWithPageReq,
@@ -195,7 +203,11 @@ class ApiToolService(BaseService):
             # 4.删除服务提供商
             self.db.session.delete(api_tool_provider)
 
-        pass
+        # 5.递增工具提供者的引用资源版本号及引用了该工具提供者的应用配置版本号，淘汰对应的应用运行时及配置快照
+        self.app_reference_version_service.bump_version(
+            provider_id,
+            self.app_reference_version_service.get_api_tool_provider_app_ids(provider_id),
+        )
 
     @classmethod
     def parse_openapi_schema(cls, openapi_schema_str: str) -> OpenAPISchema:
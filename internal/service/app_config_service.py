@@ -5,12 +5,14 @@
 #Author  :Emcikem
 @File    :app_config_service.py
 """
+import json
 from dataclasses import dataclass
-from typing import Any, Union
+from typing import Any, Callable, Optional, Union
 from uuid import UUID
 
 from injector import inject
 from langchain_core.tools import BaseTool
+from redis import Redis
 
 from internal.core.language_model import LanguageModelManager
 from internal.core.language_model.entities.model_entity import ModelParameterType
@@ -18,12 +20,13 @@ from internal.core.tools.api_tools.entities import ToolEntity
 from internal.core.tools.api_tools.providers import ApiProviderManager
 from internal.core.tools.builtin_tools.providers import BuiltinProviderManager
 from internal.core.workflow import Workflow as WorkflowTool
-from internal.core.workflow.entities.workflow_entity import WorkflowConfig
 from internal.entity.app_entity import DEFAULT_APP_CONFIG
+from internal.entity.cache_entity import CACHE_APP_CONFIG_SNAPSHOT, APP_CONFIG_SNAPSHOT_EXPIRE_TIME
 from internal.entity.workflow_entity import WorkflowStatus
 from internal.lib.helper import datetime_to_timestamp, get_value_type
 from internal.model import App, ApiTool, Dataset, AppConfig, AppConfigVersion, AppDatasetJoin, Workflow
 from pkg.sqlalchemy import SQLAlchemy
+from .app_reference_version_service import AppReferenceVersionService
 from .base_service import BaseService
 
 @inject
@@ -34,9 +37,74 @@ class AppConfigService(BaseService):
     api_provider_manager: ApiProviderManager
     builtin_provider_manager: BuiltinProviderManager
     language_model_manager: LanguageModelManager
+    redis_client: Redis
+    app_reference_version_service: AppReferenceVersionService
+
+    def get_draft_app_config(self, app: App, use_cache: bool = True) -> dict[str, Any]:
+        """根据传递的应用获取该应用的草稿配置，优先读取配置快照，快照不存在或use_cache为False时校验并重建快照"""
+        return self._get_or_build_snapshot(
+            app.id,
+            f"draft_{app.id}",
+            lambda: self._build_draft_app_config(app),
+            use_cache,
+        )
+
+    def get_app_config(self, app: App, use_cache: bool = True) -> dict[str, Any]:
+        """根据传递的应用获取该应用的运行配置，发布的运行配置记录不会修改，快照以运行配置id区分"""
+        return self._get_or_build_snapshot(
+            app.id,
+            f"published_{app.app_config_id}",
+            lambda: self._build_app_config(app),
+            use_cache,
+        )
 
-    def get_draft_app_config(self, app: App) -> dict[str, Any]:
-        """根据传递的应用获取该应用的草稿配置"""
+    def expire_app_config_snapshots(self, app_id: UUID) -> None:
+        """递增应用配置版本号，使该应用已有的草稿及运行配置快照失效，应用配置更新并提交后调用"""
+        self.app_reference_version_service.bump_app_version(app_id)
+
+    def _get_or_build_snapshot(
+            self,
+            app_id: UUID,
+            snapshot_id: str,
+            build: Callable[[], dict[str, Any]],
+            use_cache: bool = True,
+    ) -> dict[str, Any]:
+        """根据快照id及应用配置版本号读取应用配置快照，不存在时调用build校验并构建应用配置后写入快照，
+        版本号在构建前读取，构建期间配置发生变更时快照会写入旧版本号对应的键，不会覆盖新配置"""
+        # 1.读取应用配置版本号，缓存异常时跳过快照直接构建
+        version = self.app_reference_version_service.get_app_version(app_id)
+        if version is None:
+            return build()
+
+        # 2.读取快照
+        cache_key = CACHE_APP_CONFIG_SNAPSHOT.format(snapshot_id=snapshot_id, version=version)
+        if use_cache:
+            snapshot = self._get_snapshot(cache_key)
+            if snapshot is not None:
+                return snapshot
+
+        # 3.校验并构建应用配置
+        app_config = build()
+
+        # 4.写入快照
+        try:
+            self.redis_client.setex(cache_key, APP_CONFIG_SNAPSHOT_EXPIRE_TIME, json.dumps(app_config))
+        except Exception as e:
+            print(f"写入应用配置快照失败, snapshot_id: {snapshot_id}, 错误信息: {str(e)}")
+
+        return app_config
+
+    def _get_snapshot(self, cache_key: str) -> Optional[dict[str, Any]]:
+        """读取应用配置快照，不存在或读取失败时返回None"""
+        try:
+            snapshot = self.redis_client.get(cache_key)
+        except Exception as e:
+            print(f"读取应用配置快照失败, cache_key: {cache_key}, 错误信息: {str(e)}")
+            return None
+        return json.loads(snapshot) if snapshot is not None else None
+
+    def _build_draft_app_config(self, app: App) -> dict[str, Any]:
+        """校验应用的草稿配置，剔除已删除的工具、知识库、工作流并回写，返回可直接使用的配置字典"""
         # 1.提取应用的草稿配置
         draft_app_config = app.draft_app_config
 
@@ -74,8 +142,8 @@ class AppConfigService(BaseService):
             draft_app_config,
         )
 
-    def get_app_config(self, app: App) -> dict[str, Any]:
-        """根据传递的应用获取该应用的运行配置"""
+    def _build_app_config(self, app: App) -> dict[str, Any]:
+        """校验应用的运行配置，剔除已删除的工具、知识库、工作流并回写，返回可直接使用的配置字典"""
         # 1.提取应用的草稿配置
         app_config = app.app_config
 
@@ -164,14 +232,16 @@ class AppConfigService(BaseService):
         workflows = []
         for workflow_record in workflow_records:
             try:
-                # 3.创建工作流工具
-                workflow_tool = WorkflowTool(workflow_config=WorkflowConfig(
+                # 3.创建工作流工具，图配置及其引用资源的版本号未变化时复用编译后的图程序
+                workflow_tool = WorkflowTool.from_graph(
                     account_id=workflow_record.account_id,
                     name=f"wf_{workflow_record.tool_call_name}",
                     description=workflow_record.description,
-                    nodes=workflow_record.graph.get("nodes", []),
-                    edges=workflow_record.graph.get("edges", []),
-                ))
+                    graph=workflow_record.graph,
+                    reference_versions=self.app_reference_version_service.get_versions(
+                        WorkflowTool.get_reference_ids(workflow_record.graph),
+                    ),
+                )
                 workflows.append(workflow_tool)
             except Exception:
                 continue
@@ -0,0 +1,100 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 22:50
+#Author  :Emcikem
+@File    :app_reference_version_service.py
+"""
+import json
+from dataclasses import dataclass
+from typing import Optional, Union
+from uuid import UUID
+
+from injector import inject
+from redis import Redis
+from sqlalchemy import func
+
+from internal.entity.app_entity import AppConfigType
+from internal.entity.cache_entity import CACHE_APP_REFERENCE_VERSION, CACHE_APP_CONFIG_VERSION
+from internal.model import AppConfig, AppConfigVersion, AppDatasetJoin
+from pkg.sqlalchemy import SQLAlchemy
+
+
+@inject
+@dataclass
+class AppReferenceVersionService:
+    """应用引用资源版本号服务，API工具、工作流、知识库更新/发布/删除时递增该资源的版本号，用于淘汰引用了该资源的已编译工作流，
+    同时只递增引用了该资源的应用的配置版本号，应用配置快照及应用运行时以配置版本号区分，版本号变化后旧缓存不再被读取并自然淘汰"""
+    db: SQLAlchemy
+    redis_client: Redis
+
+    def bump_version(self, resource_id: UUID, app_ids: list[str] = None) -> None:
+        """递增引用资源的版本号及传递应用的配置版本号，缓存异常时只记录日志，不影响主流程"""
+        try:
+            pipeline = self.redis_client.pipeline()
+            pipeline.incr(CACHE_APP_REFERENCE_VERSION.format(resource_id=resource_id))
+            for app_id in set(str(app_id) for app_id in app_ids or []):
+                pipeline.incr(CACHE_APP_CONFIG_VERSION.format(app_id=app_id))
+            pipeline.execute()
+        except Exception as e:
+            print(f"更新应用引用资源版本号失败，错误信息:{str(e)}")
+
+    def bump_app_version(self, app_id: UUID) -> None:
+        """递增单个应用的配置版本号，应用草稿/发布配置变更时调用，缓存异常时只记录日志"""
+        try:
+            self.redis_client.incr(CACHE_APP_CONFIG_VERSION.format(app_id=app_id))
+        except Exception as e:
+            print(f"更新应用配置版本号失败, app_id: {app_id}, 错误信息:{str(e)}")
+
+    def get_versions(self, resource_ids: list[str]) -> Optional[dict[str, int]]:
+        """批量获取引用资源的版本号，不存在时版本号为0，缓存异常时返回None，调用方需跳过缓存"""
+        resource_ids = sorted(set(str(resource_id) for resource_id in resource_ids))
+        if len(resource_ids) == 0:
+            return {}
+        try:
+            versions = self.redis_client.mget([
+                CACHE_APP_REFERENCE_VERSION.format(resource_id=resource_id) for resource_id in resource_ids
+            ])
+        except Exception as e:
+            print(f"获取应用引用资源版本号失败，错误信息:{str(e)}")
+            return None
+        return {resource_id: int(version or 0) for resource_id, version in zip(resource_ids, versions)}
+
+    def get_app_version(self, app_id: UUID) -> Optional[int]:
+        """获取应用的配置版本号，不存在时版本号为0，缓存异常时返回None，调用方需跳过快照"""
+        try:
+            return int(self.redis_client.get(CACHE_APP_CONFIG_VERSION.format(app_id=app_id)) or 0)
+        except Exception as e:
+            print(f"获取应用配置版本号失败, app_id: {app_id}, 错误信息:{str(e)}")
+            return None
+
+    def get_dataset_app_ids(self, dataset_id: UUID) -> list[str]:
+        """获取运行配置(关联表)或草稿配置中引用了该知识库的应用id列表"""
+        published_app_ids = self.db.session.query(AppDatasetJoin.app_id).filter(
+            AppDatasetJoin.dataset_id == str(dataset_id),
+        ).all()
+        draft_app_ids = self.db.session.query(AppConfigVersion.app_id).filter(
+            AppConfigVersion.config_type == AppConfigType.DRAFT,
+            func.json_contains(AppConfigVersion.datasets, json.dumps(str(dataset_id))) == 1,
+        ).all()
+        return list({str(app_id) for app_id, in [*published_app_ids, *draft_app_ids]})
+
+    def get_workflow_app_ids(self, workflow_id: UUID) -> list[str]:
+        """获取运行配置或草稿配置中引用了该工作流的应用id列表"""
+        return self._get_app_ids_by_json_contains("workflows", str(workflow_id))
+
+    def get_api_tool_provider_app_ids(self, provider_id: UUID) -> list[str]:
+        """获取运行配置或草稿配置中引用了该API工具提供者下任意工具的应用id列表"""
+        return self._get_app_ids_by_json_contains("tools", {"type": "api_tool", "provider_id": str(provider_id)})
+
+    def _get_app_ids_by_json_contains(self, field: str, candidate: Union[dict, str]) -> list[str]:
+        """使用JSON_CONTAINS查询运行配置及草稿配置的JSON列表字段中包含candidate的应用id列表"""
+        candidate = json.dumps(candidate)
+        published_app_ids = self.db.session.query(AppConfig.app_id).filter(
+            func.json_contains(getattr(AppConfig, field), candidate) == 1,
+        ).all()
+        draft_app_ids = self.db.session.query(AppConfigVersion.app_id).filter(
+            AppConfigVersion.config_type == AppConfigType.DRAFT,
+            func.json_contains(getattr(AppConfigVersion, field), candidate) == 1,
+        ).all()
+        return list({str(app_id) for app_id, in [*published_app_ids, *draft_app_ids]})
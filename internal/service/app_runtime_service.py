@@ -0,0 +1,132 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 22:50
+#Author  :Emcikem
+@File    :app_runtime_service.py
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any
+from uuid import UUID
+
+from flask import current_app
+from injector import inject
+
+from internal.core.agent.agents import BaseAgent, FunctionCallAgent, ReACTAgent
+from internal.core.agent.entities.agent_entity import AgentConfig
+from internal.core.language_model.entities.model_entity import BaseLanguageModel, ModelFeature
+from internal.entity.dataset_entity import RetrievalSource
+from .app_config_service import AppConfigService
+from .app_reference_version_service import AppReferenceVersionService
+from .language_model_service import LanguageModelService
+from .retrieval_service import RetrievalService
+
+# 进程内共享的应用运行时缓存，按最近使用顺序淘汰
+_runtimes: OrderedDict[tuple, "AppRuntime"] = OrderedDict()
+_runtimes_lock = Lock()
+
+
+@dataclass(frozen=True)
+class AppRuntime:
+    """应用运行时，涵盖根据应用配置构建好的大语言模型及智能体，构建完成后不再修改，可以在多个请求间复用"""
+    llm: BaseLanguageModel
+    agent: BaseAgent
+
+
+@inject
+@dataclass
+class AppRuntimeService:
+    """应用运行时服务，按应用id、应用配置内容及应用配置版本号缓存构建好的智能体，
+    用户、调用来源、任务id、会话、历史消息、长期记忆等单次请求的数据在调用智能体时传递"""
+    app_config_service: AppConfigService
+    retrieval_service: RetrievalService
+    language_model_service: LanguageModelService
+    app_reference_version_service: AppReferenceVersionService
+
+    def get_runtime(
+            self,
+            app_id: UUID,
+            app_config: dict[str, Any],
+    ) -> AppRuntime:
+        """根据传递的应用配置获取应用运行时，缓存不存在时构建并写入缓存，无法获取应用配置版本号时直接构建"""
+        # 1.读取应用配置版本号，应用引用的资源变化时只递增该应用的版本号，缓存异常时跳过缓存
+        app_version = self.app_reference_version_service.get_app_version(app_id)
+        if app_version is None:
+            return self._build_runtime(app_config)
+
+        # 2.计算缓存键，应用配置内容变化(发布、更新草稿)或应用配置版本号变化时缓存键随之变化
+        config_hash = hashlib.sha256(
+            json.dumps(app_config, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+        cache_key = (str(app_id), config_hash, app_version)
+
+        # 3.查询缓存，命中时更新最近使用顺序
+        with _runtimes_lock:
+            runtime = _runtimes.get(cache_key)
+            if runtime is not None:
+                _runtimes.move_to_end(cache_key)
+                return runtime
+
+        # 4.缓存未命中时构建运行时，构建过程较慢，不持有锁
+        runtime = self._build_runtime(app_config)
+
+        # 5.写入缓存，并淘汰超出容量的最久未使用的运行时
+        max_size = int(current_app.config.get("APP_RUNTIME_CACHE_SIZE", 128))
+        with _runtimes_lock:
+            runtime = _runtimes.setdefault(cache_key, runtime)
+            _runtimes.move_to_end(cache_key)
+            while len(_runtimes) > max_size:
+                _runtimes.popitem(last=False)
+
+        return runtime
+
+    @classmethod
+    def invalidate(cls, app_id: UUID) -> None:
+        """释放当前进程中指定应用的运行时缓存，其他进程的缓存由缓存键的变化淘汰"""
+        with _runtimes_lock:
+            for cache_key in [cache_key for cache_key in _runtimes if cache_key[0] == str(app_id)]:
+                del _runtimes[cache_key]
+
+    def _build_runtime(self, app_config: dict[str, Any]) -> AppRuntime:
+        """根据应用配置构建大语言模型、工具列表及智能体，知识库检索工具在调用时根据传递的用户执行检索"""
+        # 1.从语言模型管理器中加载大语言模型
+        llm = self.language_model_service.load_language_model(app_config.get("model_config", {}))
+
+        # 2.将配置中的tools转换成LangChain工具
+        tools = self.app_config_service.get_langchain_tools_by_tools_config(app_config["tools"])
+
+        # 3.检测是否关联了知识库，关联则构建LangChain知识库检索工具
+        if app_config["datasets"]:
+            dataset_retrieval = self.retrieval_service.create_langchain_tool_from_search(
+                flask_app=current_app._get_current_object(),
+                dataset_ids=[dataset["id"] for dataset in app_config["datasets"]],
+                retrieval_source=RetrievalSource.APP,
+                **app_config["retrieval_config"],
+            )
+            tools.append(dataset_retrieval)
+
+        # 4.检索是否关联工作流，如果关联工作流则将工作流构建成工具添加到tools中
+        if app_config["workflows"]:
+            workflow_tools = self.app_config_service.get_langchain_tools_by_workflow_ids(
+                [workflow["id"] for workflow in app_config["workflows"]]
+            )
+            tools.extend(workflow_tools)
+
+        # 5.根据LLM是否支持tool_call决定使用不同的Agent
+        agent_class = FunctionCallAgent if ModelFeature.TOOL_CALL in llm.features else ReACTAgent
+        agent = agent_class(
+            llm=llm,
+            name=app_config["model_config"]["model"],
+            agent_config=AgentConfig(
+                preset_prompt=app_config["preset_prompt"],
+                enable_long_term_memory=app_config["long_term_memory"]["enable"],
+                tools=tools,
+                review_config=app_config["review_config"],
+            ),
+        )
+
+        return AppRuntime(llm=llm, agent=agent)
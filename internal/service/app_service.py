@@ -6,14 +6,13 @@
 @File    :app_service.py
 """
 import io
-import json
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, Generator
 from uuid import UUID
 
 import requests
-from flask import current_app
 from injector import inject
 from langchain_community.utilities.dalle_image_generator import DallEAPIWrapper
 from langchain_core.messages import HumanMessage
@@ -26,11 +25,9 @@ from sqlalchemy import func, desc
 from sqlalchemy.orm import joinedload
 from werkzeug.datastructures import FileStorage
 
-from internal.core.agent.agents import FunctionCallAgent, AgentQueueManager, ReACTAgent
-from internal.core.agent.entities.agent_entity import AgentConfig
-from internal.core.agent.entities.queue_entity import QueueEvent
+from internal.core.agent.agents import AgentQueueManager, AgentStreamAggregator
 from internal.core.language_model import LanguageModelManager
-from internal.core.language_model.entities.model_entity import ModelParameterType, ModelFeature
+from internal.core.language_model.entities.model_entity import ModelParameterType
 from internal.core.memory import TokenBufferMemory
 from internal.core.tools.api_tools.providers import ApiProviderManager
 from internal.core.tools.builtin_tools.providers import BuiltinProviderManager
@@ -38,7 +35,6 @@ from internal.entity.ai_entity import OPTIMIZE_PROMPT_TEMPLATE
 from internal.entity.app_entity import AppStatus, AppConfigType, DEFAULT_APP_CONFIG
 from internal.entity.app_entity import GENERATE_ICON_PROMPT_TEMPLATE
 from internal.entity.conversation_entity import InvokeFrom, MessageStatus
-from internal.entity.dataset_entity import RetrievalSource
 from internal.entity.workflow_entity import WorkflowStatus
 from internal.exception import NotFoundException, ForbiddenException, ValidateErrorException, FailException
 from internal.lib.helper import remove_fields, get_value_type, generate_random_string
@@ -63,11 +59,11 @@ from internal.schema.app_schema import (
 from pkg.paginator import Paginator
 from pkg.sqlalchemy import SQLAlchemy
 from .app_config_service import AppConfigService
+from .app_runtime_service import AppRuntimeService
 from .base_service import BaseService
 from .conversation_service import ConversationService
 from .cos_service import CosService
-from .language_model_service import LanguageModelService
-from .retrieval_service import RetrievalService
+from .dataset_counter_service import DatasetCounterService
 
 @inject
 @dataclass
@@ -77,9 +73,9 @@ class AppService(BaseService):
     redis_client: Redis
     cos_service: CosService
     conversation_service: ConversationService
-    retrieval_service: RetrievalService
     app_config_service: AppConfigService
-    language_model_service: LanguageModelService
+    app_runtime_service: AppRuntimeService
+    dataset_counter_service: DatasetCounterService
     api_provider_manager: ApiProviderManager
     builtin_provider_manager: BuiltinProviderManager
     language_model_manager: LanguageModelManager
@@ -297,13 +293,17 @@ class AppService(BaseService):
             **draft_app_config,
         )
 
+        # 4.递增应用配置版本号使配置快照失效，并释放当前进程中该应用的运行时缓存
+        self.app_config_service.expire_app_config_snapshots(app_id)
+        self.app_runtime_service.invalidate(app_id)
+
         return draft_app_config_record
 
     def publish_draft_app_config(self, app_id: UUID, account: Account) -> App:
         """根据传递的应用id+账号，发布/更新指定的应用草稿配置为运行时配置"""
-        # 1.获取应用的信息以及草稿信息
+        # 1.获取应用的信息，并在发布时重新校验草稿配置(同时刷新草稿配置快照)
         app = self.get_app(app_id, account)
-        draft_app_config = self.get_draft_app_config(app_id, account)
+        draft_app_config = self.app_config_service.get_draft_app_config(app, use_cache=False)
 
         # 2.创建应用运行配置（在这里暂时不删除历史的运行配置）
         app_config = self.create(
@@ -339,15 +339,21 @@ class AppService(BaseService):
             status=AppStatus.PUBLISHED,
         )
 
-        # 4.先删除原有的知识库关联记录
+        # 4.在同一个事务中删除原有的知识库关联记录并新增新的知识库关联记录
         with self.db.auto_commit():
-            self.db.session.query(AppDatasetJoin).filter(
-                AppDatasetJoin.app_id == app_id,
-            ).delete()
-
-        # 5.新增新的知识库管理记录
-        for dataset in draft_app_config["datasets"]:
-            self.create(AppDatasetJoin, app_id=app_id, dataset_id=dataset["id"])
+            old_dataset_ids = self._delete_app_dataset_joins(app_id)
+            new_dataset_ids = [str(dataset["id"]) for dataset in draft_app_config["datasets"]]
+            self.db.session.add_all([
+                AppDatasetJoin(app_id=app_id, dataset_id=dataset_id) for dataset_id in new_dataset_ids
+            ])
+
+            # 5.同步更新前后关联知识库的关联应用数
+            related_app_counts = defaultdict(int)
+            for dataset_id in old_dataset_ids:
+                related_app_counts[dataset_id] -= 1
+            for dataset_id in new_dataset_ids:
+                related_app_counts[dataset_id] += 1
+            self.dataset_counter_service.bulk_incr_counter(Dataset, "related_app_count", related_app_counts)
 
         # 6.获取应用草稿记录，并移除id、version、config_type、updated_at、created_at字段
         draft_app_config_copy = app.draft_app_config.__dict__.copy()
@@ -370,6 +376,10 @@ class AppService(BaseService):
             **draft_app_config_copy,
         )
 
+        # 9.预先构建运行配置快照，并释放当前进程中该应用的运行时缓存
+        self.app_config_service.get_app_config(app, use_cache=False)
+        self.app_runtime_service.invalidate(app_id)
+
         return app
 
     def cancel_publish_app_config(self, app_id: UUID, account: Account) -> App:
@@ -384,11 +394,15 @@ class AppService(BaseService):
         # 3.修改账号的发布状态，并清空关联配置id
         self.update(app, status=AppStatus.DRAFT, app_config_id=None)
 
-        # 4.删除应用管理的知识库信息
+        # 4.删除应用管理的知识库信息，并扣减对应知识库的关联应用数
         with self.db.auto_commit():
-            self.db.session.query(AppDatasetJoin).filter(
-                AppDatasetJoin.app_id == app_id,
-            ).delete()
+            dataset_ids = self._delete_app_dataset_joins(app_id)
+            self.dataset_counter_service.bulk_incr_counter(
+                Dataset, "related_app_count", {dataset_id: -1 for dataset_id in dataset_ids},
+            )
+
+        # 5.释放当前进程中该应用的运行时缓存
+        self.app_runtime_service.invalidate(app_id)
 
         return app
 
@@ -449,6 +463,10 @@ class AppService(BaseService):
             **draft_app_config_dict,
         )
 
+        # 6.递增应用配置版本号使配置快照失效，并释放当前进程中该应用的运行时缓存
+        self.app_config_service.expire_app_config_snapshots(app_id)
+        self.app_runtime_service.invalidate(app_id)
+
         return draft_app_config_record
 
     def get_debug_conversation_summary(self, app_id: UUID, account: Account) -> str:
@@ -516,8 +534,12 @@ class AppService(BaseService):
             status=MessageStatus.NORMAL,
         )
 
-        # 5.从语言模型管理器中加载大语言模型
-        llm = self.language_model_service.load_language_model(draft_app_config.get("model_config", {}))
+        # 5.获取应用运行时，涵盖根据应用配置构建好的大语言模型及智能体
+        runtime = self.app_runtime_service.get_runtime(
+            app_id=UUID(app.id),
+            app_config=draft_app_config,
+        )
+        llm = runtime.llm
 
         # 6.实例化tokenBufferMemory用于提取短期记忆
         token_buffer_memory = TokenBufferMemory(
@@ -529,101 +551,30 @@ class AppService(BaseService):
             message_limit=draft_app_config["dialog_round"]
         )
 
-        # 7.将草稿配置中的tools转换成LangChain工具
-        tools = self.app_config_service.get_langchain_tools_by_tools_config(draft_app_config["tools"])
-
-        # 8.检测是否关联了知识库
-        if draft_app_config["datasets"]:
-            # 9.构建LangChain知识库检索工具
-            dataset_retrieval = self.retrieval_service.create_langchain_tool_from_search(
-                flask_app=current_app._get_current_object(),
-                dataset_ids=[dataset["id"] for dataset in draft_app_config["datasets"]],
-                account_id=UUID(account.id),
-                retrieval_source=RetrievalSource.APP,
-                **draft_app_config["retrieval_config"],
-            )
-            tools.append(dataset_retrieval)
-
-        # 10.检索是否关联工作流，如果关联工作流则将工作流关联成根据添加到tools中
-        if draft_app_config["workflows"]:
-            workflow_tools = self.app_config_service.get_langchain_tools_by_workflows_ids(
-                [workflow["id"] for workflow in draft_app_config["workflows"]]
-            )
-            tools.extend(workflow_tools)
-
-        # 10.工具LLM是否支持tool_call决定使用不同Agent
-        agent_class = FunctionCallAgent if ModelFeature.TOOL_CALL in llm.features else ReACTAgent
-        agent = agent_class(
-            llm=llm,
-            name=draft_app_config["model_config"]["model"],
-            agent_config=AgentConfig(
+        # 7.使用聚合器聚合智能体事件并输出SSE数据帧
+        aggregator = AgentStreamAggregator()
+        yield from aggregator.aggregate(
+            runtime.agent.stream(
+                {
+                    "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
+                    "history": history,
+                    "long_term_memory": debug_conversation.summary,
+                },
                 user_id=UUID(account.id),
                 invoke_from=InvokeFrom.DEBUGGER,
-                preset_prompt=draft_app_config["preset_prompt"],
-                enable_long_term_memory=draft_app_config["long_term_memory"]["enable"],
-                tools=tools,
-                review_config=draft_app_config["review_config"],
             ),
+            conversation_id=str(debug_conversation.id),
+            message_id=str(message.id),
         )
 
-        agent_thoughts = {}
-        for agent_thought in agent.stream({
-            "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
-            "history": history,
-            "long_term_memory": debug_conversation.summary,
-        }):
-            # 11.提取thought以及answer
-            event_id = str(agent_thought.id)
-
-            # 12.将数据填充到agent_thought，便于存储到数据库服务中
-            if agent_thought.event != QueueEvent.PING:
-                # 13.除了agent_message数据为叠加，其他均为覆盖
-                if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                    if event_id not in agent_thoughts:
-                        # 14.初始化智能体消息事件
-                        agent_thoughts[event_id] = agent_thought
-                    else:
-                        # 15.叠加智能体消息
-                        agent_thoughts[event_id] = agent_thoughts[event_id].model_copy(update={
-                            "thought": agent_thoughts[event_id].thought + agent_thought.thought,
-                            # 消息相关
-                            "message": agent_thought.message,
-                            "message_token_count": agent_thought.message_token_count,
-                            "message_unit_price": agent_thought.message_unit_price,
-                            "message_price_unit": agent_thought.message_price_unit,
-                            # 答案相关数据
-                            "answer": agent_thoughts[event_id].answer + agent_thought.answer,
-                            "answer_token_count": agent_thought.answer_token_count,
-                            "answer_unit_price": agent_thought.answer_unit_price,
-                            "answer_price_unit": agent_thought.answer_price_unit,
-                            # Agent推理统计相关
-                            "total_token_count": agent_thought.total_token_count,
-                            "total_price": agent_thought.total_price,
-                            "latency": agent_thought.latency,
-                        })
-                else:
-                    # 16.处理其他类型事件的消息
-                    agent_thoughts[event_id] = agent_thought
-            data = {
-                **agent_thought.model_dump(include={
-                    "event", "thought", "observation", "tool", "tool_input", "answer",
-                    "total_token_count", "total_price", "latency",
-                }),
-                "id": event_id,
-                "conversation_id": str(debug_conversation.id),
-                "message_id": str(message.id),
-                "task_id": str(agent_thought.task_id),
-            }
-            yield f"event: {agent_thought.event}\ndata:{json.dumps(data)}\n\n"
-
-        # 22.将消息以及推理过程添加到数据库
-        self.conversation_service.save_agent_thoughts(
+        # 8.将消息以及推理过程添加到数据库
+        self.conversation_service.dispatch_save_agent_thoughts(
             account_id=UUID(account.id),
             app_id=UUID(app.id),
             app_config=draft_app_config,
             conversation_id=UUID(debug_conversation.id),
             message_id=message.id,
-            agent_thoughts=[agent_thought for agent_thought in agent_thoughts.values()],
+            agent_thoughts=aggregator.agent_thoughts,
         )
 
     def stop_debug_chat(self, app_id: UUID, task_id: UUID, account: Account) -> None:
@@ -695,6 +646,19 @@ class AppService(BaseService):
 
         return token
 
+    def _delete_app_dataset_joins(self, app_id: UUID) -> list[str]:
+        """删除应用关联的知识库记录，返回被删除记录对应的知识库id列表，需在事务中调用"""
+        dataset_ids = [
+            str(dataset_id) for dataset_id, in self.db.session.query(AppDatasetJoin.dataset_id).filter(
+                AppDatasetJoin.app_id == app_id,
+            ).all()
+        ]
+        self.db.session.query(AppDatasetJoin).filter(
+            AppDatasetJoin.app_id == app_id,
+        ).delete()
+
+        return dataset_ids
+
     def _validate_draft_app_config(self, draft_app_config: dict[str, Any], account: Account) -> dict[str, Any]:
         """校验传递的应用草稿配置信息，返回校验后的数据"""
         # 1.校验上传的草稿配置中对应的字段，至少拥有一个跨域更新的配置
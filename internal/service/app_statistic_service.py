@@ -0,0 +1,234 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 20:40
+#Author  :Emcikem
+@File    :app_statistic_service.py
+"""
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Optional
+from uuid import UUID
+
+from injector import inject
+from redis import Redis
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from internal.entity.cache_entity import (
+    APP_STATISTIC_ACCOUNTS,
+    APP_STATISTIC_ACCOUNTS_HLL,
+    APP_STATISTIC_CONVERSATIONS,
+    APP_STATISTIC_CONVERSATIONS_HLL,
+    APP_STATISTIC_EXPIRE_TIME,
+    APP_STATISTIC_HLL_EXPIRE_TIME,
+)
+from internal.model import AppDailyStatistic, Message
+from pkg.sqlalchemy import SQLAlchemy
+
+
+@inject
+@dataclass
+class AppStatisticService:
+    """应用统计服务，消息回答完成时增量累加应用当日的统计数据及去重HyperLogLog，并提供按消息表重建历史统计数据的回填功能"""
+    db: SQLAlchemy
+    redis_client: Redis
+
+    def record_message(self, message: Message) -> None:
+        """将一条已回答完成的消息累加到其创建日期对应的应用每日统计中"""
+        # 1.答案为空的消息不参与统计
+        if not message.answer:
+            return
+
+        # 2.使用Redis集合判断账号及会话是否为当日首次出现，首次出现才累加去重计数，同时写入当日的去重HyperLogLog
+        statistic_date = message.created_at.date()
+        accounts_key = APP_STATISTIC_ACCOUNTS.format(app_id=message.app_id, statistic_date=statistic_date)
+        conversations_key = APP_STATISTIC_CONVERSATIONS.format(app_id=message.app_id, statistic_date=statistic_date)
+        pipeline = self.redis_client.pipeline()
+        pipeline.sadd(accounts_key, str(message.created_by))
+        pipeline.sadd(conversations_key, str(message.conversation_id))
+        pipeline.expire(accounts_key, APP_STATISTIC_EXPIRE_TIME)
+        pipeline.expire(conversations_key, APP_STATISTIC_EXPIRE_TIME)
+        self._add_distinct_hll(pipeline, message.app_id, statistic_date, message.created_by, message.conversation_id)
+        new_account, new_conversation = pipeline.execute()[:2]
+
+        # 3.增量更新应用当日的统计记录
+        self._incr_statistic(message.app_id, statistic_date, {
+            "message_count": 1,
+            "active_account_count": int(new_account),
+            "conversation_count": int(new_conversation),
+            "total_token_count": message.total_token_count,
+            "latency": message.latency,
+            "total_price": message.total_price,
+        })
+
+    def get_daily_statistics(self, app_id: UUID, start_date: date, end_date: date) -> dict[date, AppDailyStatistic]:
+        """获取应用在[start_date, end_date)日期范围内的每日统计记录，以日期为键"""
+        statistics = self.db.session.query(AppDailyStatistic).filter(
+            AppDailyStatistic.app_id == str(app_id),
+            AppDailyStatistic.statistic_date >= start_date,
+            AppDailyStatistic.statistic_date < end_date,
+        ).all()
+        return {statistic.statistic_date: statistic for statistic in statistics}
+
+    def count_distinct(self, app_id: UUID, start_date: date, end_date: date) -> tuple[int, int]:
+        """合并[start_date, end_date)日期范围内每天的HyperLogLog，返回区间内去重的账号数与会话数(误差约0.81%)"""
+        statistic_dates = [start_date + timedelta(days=day) for day in range((end_date - start_date).days)]
+        if not statistic_dates:
+            return 0, 0
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.pfcount(*[
+            APP_STATISTIC_ACCOUNTS_HLL.format(app_id=app_id, statistic_date=statistic_date)
+            for statistic_date in statistic_dates
+        ])
+        pipeline.pfcount(*[
+            APP_STATISTIC_CONVERSATIONS_HLL.format(app_id=app_id, statistic_date=statistic_date)
+            for statistic_date in statistic_dates
+        ])
+        active_accounts, conversation_count = pipeline.execute()
+        return active_accounts, conversation_count
+
+    def backfill(self, start_date: date, end_date: date, app_id: Optional[UUID] = None) -> int:
+        """根据消息表重建[start_date, end_date)日期范围内的应用每日统计，每天单独提交事务，返回写入的记录数"""
+        total = 0
+        statistic_date = start_date
+        while statistic_date < end_date:
+            total += self._backfill_date(statistic_date, app_id)
+            statistic_date += timedelta(days=1)
+        return total
+
+    def _backfill_date(self, statistic_date: date, app_id: Optional[UUID] = None) -> int:
+        """使用一条分组聚合语句重建指定日期的应用统计，替换该日期已有的统计记录"""
+        # 1.构建当天已回答消息的筛选条件
+        start_at = datetime.combine(statistic_date, datetime.min.time())
+        filters = [
+            Message.created_at >= start_at,
+            Message.created_at < start_at + timedelta(days=1),
+            Message.answer != "",
+        ]
+        statistic_filters = [AppDailyStatistic.statistic_date == statistic_date]
+        if app_id is not None:
+            filters.append(Message.app_id == str(app_id))
+            statistic_filters.append(AppDailyStatistic.app_id == str(app_id))
+
+        # 2.按应用分组聚合当天的各项指标
+        rows = self.db.session.query(
+            Message.app_id,
+            func.count(Message.id),
+            func.count(func.distinct(Message.created_by)),
+            func.count(func.distinct(Message.conversation_id)),
+            func.coalesce(func.sum(Message.total_token_count), 0),
+            func.coalesce(func.sum(Message.latency), 0),
+            func.coalesce(func.sum(Message.total_price), 0),
+        ).filter(*filters).group_by(Message.app_id).all()
+
+        # 3.在同一个事务中删除当天的旧统计并批量写入新统计
+        now = datetime.now()
+        with self.db.auto_commit():
+            self.db.session.query(AppDailyStatistic).filter(*statistic_filters).delete(synchronize_session=False)
+            self.db.session.add_all([
+                AppDailyStatistic(
+                    id=str(uuid.uuid4()),
+                    app_id=row_app_id,
+                    statistic_date=statistic_date,
+                    message_count=message_count,
+                    active_account_count=active_account_count,
+                    conversation_count=conversation_count,
+                    total_token_count=total_token_count,
+                    latency=latency,
+                    total_price=total_price,
+                    updated_at=now,
+                    created_at=now,
+                )
+                for (
+                    row_app_id, message_count, active_account_count, conversation_count,
+                    total_token_count, latency, total_price,
+                ) in rows
+            ])
+
+        # 4.同步重建当天的去重HyperLogLog，去重集合仍在有效期内时一并重建，保证后续增量累加的去重计数不会重复
+        app_ids = {row[0] for row in rows}
+        if app_id is not None:
+            app_ids.add(str(app_id))
+        self._rebuild_distinct_data(
+            statistic_date, filters, app_ids, statistic_date >= date.today() - timedelta(days=1),
+        )
+
+        return len(rows)
+
+    def _rebuild_distinct_data(
+            self,
+            statistic_date: date,
+            filters: list,
+            app_ids: set[str],
+            rebuild_sets: bool,
+    ) -> None:
+        """根据消息表重建指定日期的去重HyperLogLog，rebuild_sets为True时同时重建账号及会话去重集合"""
+        # 1.清除当天已有的去重数据，在同一个事务中重新写入
+        pipeline = self.redis_client.pipeline()
+        for row_app_id in app_ids:
+            pipeline.delete(
+                APP_STATISTIC_ACCOUNTS_HLL.format(app_id=row_app_id, statistic_date=statistic_date),
+                APP_STATISTIC_CONVERSATIONS_HLL.format(app_id=row_app_id, statistic_date=statistic_date),
+            )
+            if rebuild_sets:
+                pipeline.delete(
+                    APP_STATISTIC_ACCOUNTS.format(app_id=row_app_id, statistic_date=statistic_date),
+                    APP_STATISTIC_CONVERSATIONS.format(app_id=row_app_id, statistic_date=statistic_date),
+                )
+
+        # 2.逐条写入当天已回答消息的账号及会话
+        for row_app_id, created_by, conversation_id in self.db.session.query(
+                Message.app_id, Message.created_by, Message.conversation_id,
+        ).filter(*filters).distinct().all():
+            self._add_distinct_hll(pipeline, row_app_id, statistic_date, created_by, conversation_id)
+            if rebuild_sets:
+                accounts_key = APP_STATISTIC_ACCOUNTS.format(app_id=row_app_id, statistic_date=statistic_date)
+                conversations_key = APP_STATISTIC_CONVERSATIONS.format(
+                    app_id=row_app_id, statistic_date=statistic_date,
+                )
+                pipeline.sadd(accounts_key, str(created_by))
+                pipeline.sadd(conversations_key, str(conversation_id))
+                pipeline.expire(accounts_key, APP_STATISTIC_EXPIRE_TIME)
+                pipeline.expire(conversations_key, APP_STATISTIC_EXPIRE_TIME)
+        pipeline.execute()
+
+    @classmethod
+    def _add_distinct_hll(
+            cls,
+            pipeline: Any,
+            app_id: str,
+            statistic_date: date,
+            created_by: str,
+            conversation_id: str,
+    ) -> None:
+        """将账号及会话写入应用当日的去重HyperLogLog"""
+        accounts_key = APP_STATISTIC_ACCOUNTS_HLL.format(app_id=app_id, statistic_date=statistic_date)
+        conversations_key = APP_STATISTIC_CONVERSATIONS_HLL.format(app_id=app_id, statistic_date=statistic_date)
+        pipeline.pfadd(accounts_key, str(created_by))
+        pipeline.pfadd(conversations_key, str(conversation_id))
+        pipeline.expire(accounts_key, APP_STATISTIC_HLL_EXPIRE_TIME)
+        pipeline.expire(conversations_key, APP_STATISTIC_HLL_EXPIRE_TIME)
+
+    def _incr_statistic(self, app_id: str, statistic_date: date, deltas: dict) -> None:
+        """累加应用指定日期的统计记录，记录不存在时新增，并发新增冲突时重新执行累加，再次冲突时抛出异常"""
+        for attempt in range(2):
+            try:
+                with self.db.auto_commit():
+                    updated = self.db.session.query(AppDailyStatistic).filter(
+                        AppDailyStatistic.app_id == str(app_id),
+                        AppDailyStatistic.statistic_date == statistic_date,
+                    ).update({
+                        field: getattr(AppDailyStatistic, field) + delta for field, delta in deltas.items()
+                    }, synchronize_session=False)
+                    if updated == 0:
+                        self.db.session.add(AppDailyStatistic(
+                            app_id=str(app_id),
+                            statistic_date=statistic_date,
+                            **deltas,
+                        ))
+                return
+            except IntegrityError:
+                if attempt >= 1:
+                    raise
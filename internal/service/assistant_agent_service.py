@@ -5,7 +5,6 @@
 #Author  :Emcikem
 @File    :assistant_agent_service.py
 """
-import json
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Generator
@@ -18,9 +17,8 @@ from pydantic import BaseModel, Field
 from sqlalchemy import desc
 from sqlalchemy.orm import joinedload
 
-from internal.core.agent.agents import AgentQueueManager, FunctionCallAgent
+from internal.core.agent.agents import AgentQueueManager, FunctionCallAgent, AgentStreamAggregator
 from internal.core.agent.entities.agent_entity import AgentConfig
-from internal.core.agent.entities.queue_entity import QueueEvent
 from internal.core.language_model.entities.model_entity import ModelFeature
 from internal.core.memory import TokenBufferMemory
 from internal.entity.conversation_entity import InvokeFrom, MessageStatus
@@ -92,71 +90,36 @@ class AssistantAgentService(BaseService):
             llm=llm,
             name="assistant_deep_seek",
             agent_config=AgentConfig(
-                user_id=UUID(account.id),
-                invoke_from=InvokeFrom.ASSISTANT_AGENT,
                 enable_long_term_memory=True,
                 tools=tools,
             ),
         )
 
-        agent_thoughts = {}
-        for agent_thought in agent.stream({
-            "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
-            "history": history,
-            "long_term_memory": conversation.summary,
-        }):
-            # 8.提取thought以及answer
-            event_id = str(agent_thought.id)
-
-            # 9.将数据填充到agent_thought，便于存储到数据库服务中
-            if agent_thought.event != QueueEvent.PING:
-                # 10.除了agent_message数据为叠加，其他均为覆盖
-                if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                    if event_id not in agent_thoughts:
-                        # 11.初始化智能体消息事件
-                        agent_thoughts[event_id] = agent_thought
-                    else:
-                        # 12.叠加智能体消息
-                        agent_thoughts[event_id] = agent_thoughts[event_id].model_copy(update={
-                            "thought": agent_thoughts[event_id].thought + agent_thought.thought,
-                            # 消息相关数据
-                            "message": agent_thought.message,
-                            "message_token_count": agent_thought.message_token_count,
-                            "message_unit_price": agent_thought.message_unit_price,
-                            "message_price_unit": agent_thought.message_price_unit,
-                            # 答案相关数据
-                            "answer": agent_thoughts[event_id].answer + agent_thought.answer,
-                            "answer_token_count": agent_thought.answer,
-                            "answer_unit_price": agent_thought.answer_unit_price,
-                            "answer_price_unit": agent_thought.answer_price_unit,
-                            # Agent推理统计相关
-                            "total_token_count": agent_thought.total_token_count,
-                            "total_price": agent_thought.total_price,
-                            "latency": agent_thought.latency,
-                        })
-                else:
-                    # 13.处理其他类型事件的消息
-                    agent_thoughts[event_id] = agent_thought
-            data = {
-                **agent_thought.model_dump(include={
-                    "event", "thought", "observation", "tool", "tool_input", "answer", "latency",
-                    "total_token_count",
-                }),
-                "id": event_id,
-                "conversation_id": str(conversation.id),
-                "message_id": str(message.id),
-                "task_id": str(agent_thought.task_id),
-            }
-            yield f"event: {agent_thought.event}\ndata:{json.dumps(data)}\n\n"
-
-        # 22.将消息以及推理过程添加到数据库
-        self.conversation_service.save_agent_thoughts(
+        # 8.使用聚合器聚合智能体事件并输出SSE数据帧
+        aggregator = AgentStreamAggregator()
+        yield from aggregator.aggregate(
+            agent.stream(
+                {
+                    "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
+                    "history": history,
+                    "long_term_memory": conversation.summary,
+                },
+                user_id=UUID(account.id),
+                invoke_from=InvokeFrom.ASSISTANT_AGENT,
+            ),
+            {"event", "thought", "observation", "tool", "tool_input", "answer", "latency", "total_token_count"},
+            conversation_id=str(conversation.id),
+            message_id=str(message.id),
+        )
+
+        # 9.将消息以及推理过程添加到数据库
+        self.conversation_service.dispatch_save_agent_thoughts(
             account_id=UUID(account.id),
             app_id=assistant_agent_id,
             app_config={"long_term_memory": {"enable": True}},
             conversation_id=UUID(conversation.id),
             message_id=message.id,
-            agent_thoughts=[agent_thought for agent_thought in agent_thoughts.values()],
+            agent_thoughts=aggregator.agent_thoughts,
         )
 
     @classmethod
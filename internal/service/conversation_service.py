@@ -5,9 +5,11 @@
 #Author  :Emcikem
 @File    :conversation_service.py
 """
+import uuid
 from dataclasses import dataclass
 from datetime import datetime
-from threading import Thread
+from functools import lru_cache
+from threading import Lock
 from typing import Any
 from uuid import UUID
 
@@ -16,7 +18,7 @@ from injector import inject
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
-from sqlalchemy import desc
+from sqlalchemy import desc, insert
 from sqlalchemy.orm import joinedload
 
 from internal.core.agent.entities.queue_entity import AgentThought, QueueEvent
@@ -30,24 +32,57 @@ from internal.entity.conversation_entity import (
 from internal.exception import NotFoundException
 from internal.model import Conversation, Message, MessageAgentThought, Account
 from internal.schema.conversation_schema import GetConversationMessagesWithPageReq
+from internal.task.conversation_task import save_agent_thoughts
+from pkg.executor import CoalescingExecutor
 from pkg.paginator import Paginator
 from pkg.sqlalchemy import SQLAlchemy
+from .app_statistic_service import AppStatisticService
 from .base_service import BaseService
 
+# 会话后台任务(摘要、会话名称生成)共享的执行器，首次使用时按配置创建
+_background_executor: CoalescingExecutor = None
+_background_executor_lock = Lock()
+
+
+def _get_background_executor() -> CoalescingExecutor:
+    """获取进程内共享的会话后台任务执行器"""
+    global _background_executor
+    with _background_executor_lock:
+        if _background_executor is None:
+            _background_executor = CoalescingExecutor(
+                max_workers=int(current_app.config.get("CONVERSATION_BACKGROUND_WORKERS", 4)),
+                max_pending=int(current_app.config.get("CONVERSATION_BACKGROUND_MAX_PENDING", 1000)),
+                thread_name_prefix="conversation_background",
+            )
+        return _background_executor
+
+
+@lru_cache(maxsize=None)
+def _get_chat_model(temperature: float) -> ChatOpenAI:
+    """根据温度获取进程内共享的大语言模型实例，避免每次生成摘要、会话名称时重复构建"""
+    return ChatOpenAI(model="deepseek-chat", temperature=temperature)
+
+
+def _merge_summary_rounds(old_kwargs: dict[str, Any], new_kwargs: dict[str, Any]) -> dict[str, Any]:
+    """合并同一个会话等待中的摘要任务，将新的对话轮次追加到待总结的轮次中"""
+    return {**new_kwargs, "rounds": old_kwargs["rounds"] + new_kwargs["rounds"]}
+
+
 @inject
 @dataclass
 class ConversationService(BaseService):
     """会话服务"""
     db: SQLAlchemy
+    app_statistic_service: AppStatisticService
 
     @classmethod
-    def summary(cls, human_message: str, ai_message: str, old_summary: str = "") -> str:
-        """根据传递的人类消息、AI消息还有原始的摘要消息总结生成一段新的摘要"""
+    def summary(cls, rounds: list[tuple[str, str]], old_summary: str = "") -> str:
+        """根据传递的多轮人类消息、AI消息还有原始的摘要消息总结生成一段新的摘要"""
         # 1.创建prompt
         prompt = ChatPromptTemplate.from_template(SUMMARIZER_TEMPLATE)
 
-        # 2.构建大语言模型实例，并且将大语言模型的温度降低，降低幻觉的概率
-        llm = ChatOpenAI(model="deepseek-chat", temperature=0.5)
+        # 2.获取大语言模型实例，并且将大语言模型的温度降低，降低幻觉的概率
+        llm = _get_chat_model(0.5)
 
         # 3.构建链应用
         summary_chain = prompt | llm | StrOutputParser()
@@ -55,7 +90,7 @@ class ConversationService(BaseService):
         # 4.调用链并获取新摘要消息
         new_summary = summary_chain.invoke({
             "summary": old_summary,
-            "new_lines": f"Human: {human_message}\nAI: {ai_message}",
+            "new_lines": "\n".join(f"Human: {human_message}\nAI: {ai_message}" for human_message, ai_message in rounds),
         })
 
         return new_summary
@@ -69,8 +104,8 @@ class ConversationService(BaseService):
             ("human", "{query}")
         ])
 
-        # 2.构建大语言模型实例，并且将大语言模型的温度降低，降低幻觉的概率
-        llm = ChatOpenAI(model="deepseek-chat", temperature=0)
+        # 2.获取大语言模型实例，并且将大语言模型的温度降低，降低幻觉的概率
+        llm = _get_chat_model(0)
         structured_llm = llm.with_structured_output(ConversationInfo)
 
         # 3.构建链应用
@@ -104,8 +139,8 @@ class ConversationService(BaseService):
             ("human", "{histories}")
         ])
 
-        # 2.构建大语言模型实例，并且将大语言模型的温度降低，降低幻觉的概率
-        llm = ChatOpenAI(model="deepseek-chat", temperature=0)
+        # 2.获取大语言模型实例，并且将大语言模型的温度降低，降低幻觉的概率
+        llm = _get_chat_model(0)
 
         # 3.格式化
         parser = JsonOutputParser(pydantic_object=SuggestedQuestions)
@@ -138,16 +173,20 @@ class ConversationService(BaseService):
             message_id: UUID,
             agent_thoughts: list[AgentThought]
     ):
-        """存储智能体推理步骤消息"""
-        # 1.定义变量存储推理位置及总耗时
+        """存储智能体推理步骤消息，推理步骤批量插入并与消息的更新在同一个事务中提交"""
+        # 1.定义变量存储推理位置、总耗时、待插入的推理步骤、消息待更新字段及最终答案
         position = 0
         latency = 0
+        now = datetime.now()
+        agent_thought_rows = []
+        message_fields = {}
+        answer = None
 
         # 2.在子线程中重新查询conversation以及message，确保对象会被子线程的会话管理到
         conversation = self.get(Conversation, conversation_id)
         message = self.get(Message, message_id)
 
-        # 3.循环遍历所有的智能体推理过程执行存储操作
+        # 3.循环遍历所有的智能体推理过程，在内存中整理待插入的推理步骤及消息待更新的字段
         for agent_thought in agent_thoughts:
             # 4.存储长期记忆召回、推理、消息、动作、知识库检索等步骤
             if agent_thought.event in [
@@ -161,43 +200,44 @@ class ConversationService(BaseService):
                 position += 1
                 latency += agent_thought.latency
 
-                # 6.创建智能体消息推理步骤
-                self.create(
-                    MessageAgentThought,
-                    app_id=app_id,
-                    conversation_id=conversation.id,
-                    message_id=message.id,
-                    invoke_from=InvokeFrom.DEBUGGER,
-                    created_by=account_id,
-                    position=position,
-                    event=agent_thought.event,
-                    thought=agent_thought.thought,
-                    observation=agent_thought.observation,
-                    tool=agent_thought.tool,
-                    tool_input=agent_thought.tool_input,
+                # 6.构建智能体消息推理步骤记录
+                agent_thought_rows.append({
+                    "id": str(uuid.uuid4()),
+                    "app_id": str(app_id),
+                    "conversation_id": conversation.id,
+                    "message_id": message.id,
+                    "invoke_from": InvokeFrom.DEBUGGER,
+                    "created_by": str(account_id),
+                    "position": position,
+                    "event": agent_thought.event,
+                    "thought": agent_thought.thought,
+                    "observation": agent_thought.observation,
+                    "tool": agent_thought.tool,
+                    "tool_input": agent_thought.tool_input,
                     # 消息相关数据
-                    message=agent_thought.message,
-                    message_token_count=agent_thought.message_token_count,
-                    message_unit_price=agent_thought.message_unit_price,
-                    message_price_unit=agent_thought.message_price_unit,
+                    "message": agent_thought.message,
+                    "message_token_count": agent_thought.message_token_count,
+                    "message_unit_price": agent_thought.message_unit_price,
+                    "message_price_unit": agent_thought.message_price_unit,
                     # 答案相关字段
-                    answer=agent_thought.answer,
+                    "answer": agent_thought.answer,
                     # todo:
-                    answer_token_count=0,
-                    # answer_token_count=agent_thought.answer_token_count,
-                    answer_unit_price=agent_thought.answer_unit_price,
-                    answer_price_unit=agent_thought.answer_price_unit,
+                    "answer_token_count": 0,
+                    # "answer_token_count": agent_thought.answer_token_count,
+                    "answer_unit_price": agent_thought.answer_unit_price,
+                    "answer_price_unit": agent_thought.answer_price_unit,
                     # Agent推理统计相关
-                    total_token_count=agent_thought.total_token_count,
-                    total_price=agent_thought.total_price,
-                    latency=agent_thought.latency,
-                )
-
-            # 7.检测事件是否为Agent_message
+                    "total_token_count": agent_thought.total_token_count,
+                    "total_price": agent_thought.total_price,
+                    "latency": agent_thought.latency,
+                    "updated_at": now,
+                    "created_at": now,
+                })
+
+            # 7.检测事件是否为Agent_message，是则记录消息需要更新的信息
             if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                # 8.更新消息信息
-                self.update(
-                    message,
+                answer = agent_thought.answer
+                message_fields.update(
                     # 消息相关字段
                     # todo:短期记忆时，如果是base64的消息，会在这里把消息弄坏的，所以要特殊处理，只有和llm对话时，数据才是base64，其他时候都是url链接
                     message=agent_thought.message,
@@ -217,53 +257,102 @@ class ConversationService(BaseService):
                     latency=latency,
                 )
 
-                # 9.检测是否开启长期记忆
-                if app_config["long_term_memory"]["enable"]:
-                    Thread(
-                        target=self._generate_summary_and_update,
-                        kwargs={
-                            "flask_app": current_app._get_current_object(),
-                            "conversation_id": conversation.id,
-                            "query": message.query,
-                            "answer": agent_thought.answer,
-                        },
-                    ).start()
-
-                # 10.处理生成新会话名称
-                if conversation.is_new:
-                    Thread(
-                        target=self._generate_conversation_name_and_update,
-                        kwargs={
-                            "flask_app": current_app._get_current_object(),
-                            "conversation_id": conversation.id,
-                            "query": message.query,
-                        }
-                    ).start()
-
-            # 11.判断是否为停止或者错误，如果是则需要更新消息状态
+            # 8.判断是否为停止或者错误，如果是则需要更新消息状态
             if agent_thought.event in [QueueEvent.TIMEOUT, QueueEvent.STOP, QueueEvent.ERROR]:
-                self.update(
-                    message,
-                    status=agent_thought.event,
-                    error=agent_thought.observation,
-                )
+                message_fields.update(status=agent_thought.event, error=agent_thought.observation)
                 break
 
+        # 9.在同一个事务中批量插入推理步骤并更新消息
+        with self.db.auto_commit():
+            if agent_thought_rows:
+                self.db.session.execute(insert(MessageAgentThought), agent_thought_rows)
+            for field, value in message_fields.items():
+                setattr(message, field, value)
+
+        # 10.不存在agent_message事件时，无需统计及生成摘要、会话名称
+        if answer is None:
+            return
+
+        # 11.将消息累加到应用的每日统计中，统计失败不影响消息的存储
+        try:
+            self.app_statistic_service.record_message(message)
+        except Exception as e:
+            print(f"应用每日统计累加失败, message_id: {message.id}, 错误信息: {str(e)}")
+
+        # 12.检测是否开启长期记忆，同一个会话防抖期间的摘要任务会合并成一次总结
+        executor = _get_background_executor()
+        if app_config["long_term_memory"]["enable"]:
+            executor.submit(
+                ("summary", conversation.id),
+                self._generate_summary_and_update,
+                delay=float(current_app.config.get("CONVERSATION_SUMMARY_DEBOUNCE", 3)),
+                merge=_merge_summary_rounds,
+                flask_app=current_app._get_current_object(),
+                conversation_id=conversation.id,
+                rounds=[(message.query, answer)],
+            )
+
+        # 13.处理生成新会话名称，同一个会话只保留一个等待中的任务
+        if conversation.is_new:
+            executor.submit(
+                ("name", conversation.id),
+                self._generate_conversation_name_and_update,
+                flask_app=current_app._get_current_object(),
+                conversation_id=conversation.id,
+                query=message.query,
+            )
+
+    @classmethod
+    def get_background_stats(cls) -> dict[str, int]:
+        """获取当前进程会话后台任务执行器的统计信息，涵盖等待队列深度及合并、丢弃计数"""
+        return _get_background_executor().stats()
+
+    def dispatch_save_agent_thoughts(
+            self,
+            account_id: UUID,
+            app_id: UUID,
+            app_config: dict[str, Any],
+            conversation_id: UUID,
+            message_id: UUID,
+            agent_thoughts: list[AgentThought]
+    ) -> None:
+        """流式响应结束后存储智能体推理步骤，开启AGENT_THOUGHT_ASYNC_SAVE时交由Celery异步存储，尽快释放HTTP工作进程"""
+        # 1.未开启异步存储时直接在当前请求中存储
+        if not current_app.config.get("AGENT_THOUGHT_ASYNC_SAVE", False):
+            self.save_agent_thoughts(
+                account_id=account_id,
+                app_id=app_id,
+                app_config=app_config,
+                conversation_id=conversation_id,
+                message_id=message_id,
+                agent_thoughts=agent_thoughts,
+            )
+            return
+
+        # 2.将推理步骤序列化后投递到Celery，应用配置只传递存储过程使用到的长期记忆配置
+        save_agent_thoughts.delay(
+            account_id=str(account_id),
+            app_id=str(app_id),
+            app_config={"long_term_memory": app_config["long_term_memory"]},
+            conversation_id=str(conversation_id),
+            message_id=str(message_id),
+            agent_thoughts=[agent_thought.model_dump(mode="json") for agent_thought in agent_thoughts],
+        )
+
     def _generate_summary_and_update(
             self,
             flask_app: Flask,
             conversation_id: UUID,
-            query: str,
-            answer: str,
+            rounds: list[tuple[str, str]],
     ):
+        """根据会话中新增的多轮对话生成新摘要并更新"""
         with flask_app.app_context():
             # 1.根据id获取会话
             conversation = self.get(Conversation, conversation_id)
 
             # 2.计算会话新摘要信息
             new_summary = self.summary(
-                query,
-                answer,
+                rounds,
                 conversation.summary
             )
 
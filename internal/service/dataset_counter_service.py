@@ -0,0 +1,117 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 20:10
+#Author  :Emcikem
+@File    :dataset_counter_service.py
+"""
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+
+from injector import inject
+from sqlalchemy import bindparam, func, select, update
+
+from internal.model import Dataset, Document, Segment, AppDatasetJoin
+from pkg.sqlalchemy import SQLAlchemy
+
+
+@inject
+@dataclass
+class DatasetCounterService:
+    """知识库计数服务，维护知识库及文档表中冗余存储的统计字段，列表页直接读取字段无需逐条聚合，
+    各写入路径通过增量语句同步计数，定时任务负责按实际数据校准，修正异常中断等情况产生的偏差"""
+    db: SQLAlchemy
+
+    def incr_dataset_counters(self, dataset_id: UUID, **deltas: int) -> None:
+        """增量更新知识库的计数字段，涵盖document_count、hit_count、character_count、related_app_count，需在事务中调用"""
+        self._incr_counters(Dataset, dataset_id, deltas)
+
+    def incr_document_counters(self, document_id: UUID, **deltas: int) -> None:
+        """增量更新文档的计数字段，涵盖segment_count、hit_count，需在事务中调用"""
+        self._incr_counters(Document, document_id, deltas)
+
+    def bulk_incr_counter(self, model: Any, column: str, deltas: dict[str, int]) -> None:
+        """使用一条批量更新语句为多条记录的同一个计数字段累加不同的增量，需在事务中调用"""
+        params = [{"record_id": str(record_id), "delta": delta} for record_id, delta in deltas.items() if delta]
+        if not params:
+            return
+
+        table = model.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("record_id"))
+            .values({column: table.c[column] + bindparam("delta")})
+        )
+        self.db.session.connection().execute(stmt, params)
+
+    def reconcile(self, batch_size: int = 500) -> int:
+        """按实际数据重新计算所有知识库及其文档的计数字段，每批知识库单独提交事务，返回校准的知识库数"""
+        total = 0
+        last_id = ""
+        while True:
+            # 1.按主键分批获取知识库id，避免长时间锁表
+            dataset_ids = [
+                dataset_id for dataset_id, in self.db.session.query(Dataset.id).filter(
+                    Dataset.id > last_id,
+                ).order_by(Dataset.id.asc()).limit(batch_size).all()
+            ]
+            if not dataset_ids:
+                return total
+
+            # 2.在同一个事务中先校准文档计数，再校准知识库计数
+            with self.db.auto_commit():
+                self._reconcile_documents(dataset_ids)
+                self._reconcile_datasets(dataset_ids)
+
+            total += len(dataset_ids)
+            last_id = dataset_ids[-1]
+            if len(dataset_ids) < batch_size:
+                return total
+
+    def _incr_counters(self, model: Any, record_id: UUID, deltas: dict[str, int]) -> None:
+        """为单条记录的多个计数字段累加增量，增量均为0时跳过"""
+        values = {column: getattr(model, column) + delta for column, delta in deltas.items() if delta}
+        if not values:
+            return
+
+        self.db.session.query(model).filter(
+            model.id == str(record_id),
+        ).update(values, synchronize_session=False)
+
+    def _reconcile_documents(self, dataset_ids: list[str]) -> None:
+        """使用关联子查询重新计算指定知识库下文档的片段数与命中次数"""
+        document_table = Document.__table__
+        segment_table = Segment.__table__
+        self.db.session.connection().execute(
+            update(document_table).where(document_table.c.dataset_id.in_(dataset_ids)).values(
+                segment_count=select(func.count(segment_table.c.id)).where(
+                    segment_table.c.document_id == document_table.c.id,
+                ).scalar_subquery(),
+                hit_count=select(func.coalesce(func.sum(segment_table.c.hit_count), 0)).where(
+                    segment_table.c.document_id == document_table.c.id,
+                ).scalar_subquery(),
+            )
+        )
+
+    def _reconcile_datasets(self, dataset_ids: list[str]) -> None:
+        """使用关联子查询重新计算指定知识库的文档数、命中次数、字符总数与关联应用数"""
+        dataset_table = Dataset.__table__
+        document_table = Document.__table__
+        app_dataset_join_table = AppDatasetJoin.__table__
+        self.db.session.connection().execute(
+            update(dataset_table).where(dataset_table.c.id.in_(dataset_ids)).values(
+                document_count=select(func.count(document_table.c.id)).where(
+                    document_table.c.dataset_id == dataset_table.c.id,
+                ).scalar_subquery(),
+                hit_count=select(func.coalesce(func.sum(document_table.c.hit_count), 0)).where(
+                    document_table.c.dataset_id == dataset_table.c.id,
+                ).scalar_subquery(),
+                character_count=select(func.coalesce(func.sum(document_table.c.character_count), 0)).where(
+                    document_table.c.dataset_id == dataset_table.c.id,
+                ).scalar_subquery(),
+                related_app_count=select(func.count(app_dataset_join_table.c.id)).where(
+                    app_dataset_join_table.c.dataset_id == dataset_table.c.id,
+                ).scalar_subquery(),
+            )
+        )
@@ -24,6 +24,7 @@ from internal.schema.dataset_schema import (
 from internal.task.dataset_task import delete_dataset
 from pkg.paginator import Paginator
 from pkg.sqlalchemy import SQLAlchemy
+from .app_reference_version_service import AppReferenceVersionService
 from .base_service import BaseService
 from .retrieval_service import RetrievalService
 
@@ -34,6 +35,7 @@ class DatasetService(BaseService):
     """知识库服务"""
     db: SQLAlchemy
     retrival_service: RetrievalService
+    app_reference_version_service: AppReferenceVersionService
 
     def create_dataset(self, req: CreateDatasetReq, account: Account) -> Dataset:
         """根据传递的请求信息创建知识库"""
@@ -108,6 +110,12 @@ class DatasetService(BaseService):
             description=req.description.data,
         )
 
+        # 5.递增知识库的引用资源版本号及引用了该知识库的应用配置版本号，知识库信息变化会影响应用配置
+        self.app_reference_version_service.bump_version(
+            dataset.id,
+            self.app_reference_version_service.get_dataset_app_ids(dataset.id),
+        )
+
         return dataset
 
     def get_datasets_with_page(self, req: GetDatasetsWithPageReq, account: Account) -> tuple[list[Dataset], Paginator]:
@@ -193,20 +201,26 @@ class DatasetService(BaseService):
         if dataset is None or dataset.account_id != account.id:
             raise NotFoundException("该知识库不存在")
 
+        # 2.在删除关联记录前查询引用了该知识库的应用
+        app_ids = self.app_reference_version_service.get_dataset_app_ids(dataset.id)
+
         try:
-            # 2.删除知识库基础记录以及知识库和应用关联的记录
+            # 3.删除知识库基础记录以及知识库和应用关联的记录
             self.delete(dataset)
             with self.db.auto_commit():
                 self.db.session.query(AppDatasetJoin).filter(
                     AppDatasetJoin.dataset_id == dataset.id,
                 ).delete()
 
-            # 3.调用异步任务执行后续的操作
+            # 4.调用异步任务执行后续的操作
             # todo: 异步
             # delete_dataset.delay(dataset_id)
             delete_dataset(dataset)
         except Exception as e:
             raise FailException("删除知识库失败，请稍后重试")
 
+        # 5.递增知识库的引用资源版本号及引用了该知识库的应用配置版本号，淘汰对应的应用运行时及配置快照
+        self.app_reference_version_service.bump_version(dataset_id, app_ids)
+
 
 
@@ -0,0 +1,44 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 14:20
+#Author  :Emcikem
+@File    :dataset_version_service.py
+"""
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from injector import inject
+from redis import Redis
+
+from internal.entity.cache_entity import CACHE_DATASET_VERSION
+
+
+@inject
+@dataclass
+class DatasetVersionService:
+    """知识库版本号服务，知识库下的文档/片段新增、启用、禁用、删除时递增版本号，用于淘汰检索缓存"""
+    redis_client: Redis
+
+    def bump_versions(self, dataset_ids: list[UUID]) -> None:
+        """递增传递的知识库版本号，缓存异常时只记录日志，不影响主流程"""
+        try:
+            pipeline = self.redis_client.pipeline()
+            for dataset_id in set(str(dataset_id) for dataset_id in dataset_ids):
+                pipeline.incr(CACHE_DATASET_VERSION.format(dataset_id=dataset_id))
+            pipeline.execute()
+        except Exception as e:
+            print(f"更新知识库版本号失败，错误信息:{str(e)}")
+
+    def get_versions(self, dataset_ids: list[UUID]) -> Optional[dict[str, int]]:
+        """批量获取传递的知识库版本号，不存在的知识库版本号为0，缓存异常时返回None，调用方需跳过缓存"""
+        dataset_ids = [str(dataset_id) for dataset_id in dataset_ids]
+        try:
+            versions = self.redis_client.mget([
+                CACHE_DATASET_VERSION.format(dataset_id=dataset_id) for dataset_id in dataset_ids
+            ])
+        except Exception as e:
+            print(f"获取知识库版本号失败，错误信息:{str(e)}")
+            return None
+        return {dataset_id: int(version or 0) for dataset_id, version in zip(dataset_ids, versions)}
@@ -0,0 +1,77 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 18:40
+#Author  :Emcikem
+@File    :document_progress_service.py
+"""
+import json
+import time
+from dataclasses import dataclass
+from typing import Generator
+
+from injector import inject
+from redis import Redis
+
+from internal.entity.cache_entity import (
+    DOCUMENT_PROGRESS,
+    DOCUMENT_PROGRESS_CHANNEL,
+    DOCUMENT_PROGRESS_EXPIRE_TIME,
+)
+from internal.entity.dataset_entity import DocumentStatus
+from internal.model import Document
+
+
+@inject
+@dataclass
+class DocumentProgressService:
+    """文档构建进度服务，索引构建的每个阶段将进度计数器写入Redis并推送到批次频道，供SSE接口实时输出"""
+    redis_client: Redis
+
+    def publish(self, document: Document, **counters: int) -> None:
+        """记录文档当前的状态及错误信息，counters可传递segment_count、completed_segment_count覆盖计数器"""
+        self._write(document, {
+            "status": document.status,
+            "error": document.error or "",
+            **counters,
+        })
+
+    def incr_completed_segment_count(self, document: Document, count: int) -> None:
+        """递增文档已完成构建的片段数"""
+        self._write(document, {}, count)
+
+    def listen(self, batch: str, timeout: int = 600) -> Generator[dict, None, None]:
+        """订阅批次频道并返回进度事件，订阅完成后先返回一次None，之后每秒未收到事件时返回None，调用方可借此发送心跳"""
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(DOCUMENT_PROGRESS_CHANNEL.format(batch=batch))
+        start_time = time.time()
+        try:
+            yield None
+            while time.time() - start_time < timeout:
+                message = pubsub.get_message(timeout=1)
+                yield json.loads(message["data"]) if message is not None else None
+        finally:
+            pubsub.close()
+
+    def _write(self, document: Document, fields: dict, completed_increment: int = 0) -> None:
+        """写入计数器并推送最新的进度快照，进度只用于展示，写入失败时不影响文档构建"""
+        try:
+            cache_key = DOCUMENT_PROGRESS.format(document_id=document.id)
+            pipeline = self.redis_client.pipeline()
+            if fields:
+                pipeline.hset(cache_key, mapping=fields)
+            if completed_increment:
+                pipeline.hincrby(cache_key, "completed_segment_count", completed_increment)
+            pipeline.expire(cache_key, DOCUMENT_PROGRESS_EXPIRE_TIME)
+            pipeline.hgetall(cache_key)
+            progress = {key.decode(): value.decode() for key, value in pipeline.execute()[-1].items()}
+
+            self.redis_client.publish(DOCUMENT_PROGRESS_CHANNEL.format(batch=document.batch), json.dumps({
+                "id": str(document.id),
+                "status": progress.get("status", DocumentStatus.WAITING),
+                "error": progress.get("error", ""),
+                "segment_count": int(progress.get("segment_count", 0)),
+                "completed_segment_count": int(progress.get("completed_segment_count", 0)),
+            }))
+        except Exception as e:
+            print(f"推送文档构建进度失败，文档id:{document.id}, 错误信息:{str(e)}")
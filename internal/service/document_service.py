@@ -5,16 +5,18 @@
 #Author  :Emcikem
 @File    :document_service.py
 """
+import json
 import logging
 import random
 import time
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Generator
 from uuid import UUID
 
 from injector import inject
 from redis import Redis
-from sqlalchemy import desc, asc, func
+from sqlalchemy import desc, asc, func, case
 
 from internal.entity.cache_entity import LOCK_DOCUMENT_UPDATE_ENABLED, LOCK_EXPIRE_TIME
 from internal.entity.dataset_entity import ProcessType, DocumentStatus, SegmentStatus
@@ -27,6 +29,8 @@ from internal.task.document_task import build_documents, update_document_enabled
 from pkg.paginator import Paginator
 from pkg.sqlalchemy import SQLAlchemy
 from .base_service import BaseService
+from .dataset_counter_service import DatasetCounterService
+from .document_progress_service import DocumentProgressService
 
 @inject
 @dataclass
@@ -34,6 +38,8 @@ class DocumentService(BaseService):
     """文档服务"""
     db: SQLAlchemy
     redis_client: Redis
+    document_progress_service: DocumentProgressService
+    dataset_counter_service: DatasetCounterService
 
     def create_documents(
             self,
@@ -74,21 +80,23 @@ class DocumentService(BaseService):
         # 4.获取当前知识库的最新文档位置
         position = self.get_latest_document_position(dataset_id)
 
-        # 5.循环遍历所有合法的上传文件列表并记录
+        # 5.循环遍历所有合法的上传文件列表并记录，同时在同一个事务中累加知识库的文档数
         documents = []
-        for upload_file in upload_files:
-            position += 1
-            document = self.create(
-                Document,
-                account_id=account.id,
-                dataset_id=str(dataset_id),
-                upload_file_id=upload_file.id,
-                process_rule_id=process_rule.id,
-                batch=batch,
-                name=upload_file.name,
-                position=position,
-            )
-            documents.append(document)
+        with self.db.auto_commit():
+            for upload_file in upload_files:
+                position += 1
+                document = Document(
+                    account_id=account.id,
+                    dataset_id=str(dataset_id),
+                    upload_file_id=upload_file.id,
+                    process_rule_id=process_rule.id,
+                    batch=batch,
+                    name=upload_file.name,
+                    position=position,
+                )
+                self.db.session.add(document)
+                documents.append(document)
+            self.dataset_counter_service.incr_dataset_counters(dataset_id, document_count=len(documents))
 
         # 6.调用异步任务，完成后续操作todo:修改成异步
         # build_documents.delay([document.id for document in documents])
@@ -104,33 +112,36 @@ class DocumentService(BaseService):
         if dataset is None or str(dataset.account_id) != account.id:
             raise ForbiddenException("当前用户无该数据库权限或知识库不存在")
 
-        # 2.查询当前知识库下该批次的文档列表
-        documents = self.db.session.query(Document).filter(
+        # 2.使用一条分组聚合语句查询该批次的文档、上传文件信息及片段统计
+        completed_segment_count = func.coalesce(
+            func.sum(case((Segment.status == SegmentStatus.COMPLETED, 1), else_=0)), 0,
+        )
+        rows = self.db.session.query(
+            Document,
+            UploadFile.size,
+            UploadFile.extension,
+            UploadFile.mime_type,
+            func.count(Segment.id),
+            completed_segment_count,
+        ).join(
+            UploadFile, UploadFile.id == Document.upload_file_id,
+        ).outerjoin(
+            Segment, Segment.document_id == Document.id,
+        ).filter(
             Document.dataset_id == str(dataset.id),
             Document.batch == batch,
-        ).order_by(asc("position")).all()
-        if documents is None or len(documents) == 0:
+        ).group_by(Document.id, UploadFile.id).order_by(asc(Document.position)).all()
+        if len(rows) == 0:
             raise NotFoundException("该处理批次未发现文档，请核实后重试")
 
-        # 3.循环遍历文档列表提取文档的状态信息
-        documents_status = []
-        for document in documents:
-            # 4.查询每个文档的总片段数和已构建完成的片段数
-            segment_count = self.db.session.query(func.count(Segment.id)).filter(
-                Segment.document_id == document.id,
-            ).scalar()
-            completed_segment_count = self.db.session.query(func.count(Segment.id)).filter(
-                Segment.document_id == document.id,
-                Segment.status == SegmentStatus.COMPLETED,
-            ).scalar()
-
-            upload_file = document.upload_file
-            documents_status.append({
+        # 3.循环遍历查询结果提取文档的状态信息
+        return [
+            {
                 "id": document.id,
                 "name": document.name,
-                "size": upload_file.size,
-                "extension": upload_file.extension,
-                "mime_type": upload_file.mime_type,
+                "size": size,
+                "extension": extension,
+                "mime_type": mime_type,
                 "position": document.position,
                 "segment_count": segment_count,
                 "completed_segment_count": completed_segment_count,
@@ -143,9 +154,50 @@ class DocumentService(BaseService):
                 "completed_at": datetime_to_timestamp(document.completed_at),
                 "stopped_at": datetime_to_timestamp(document.stopped_at),
                 "created_at": datetime_to_timestamp(document.created_at),
-            })
+            } for document, size, extension, mime_type, segment_count, completed_segment_count in rows
+        ]
 
-        return documents_status
+    def stream_documents_status(self, dataset_id: UUID, batch: str, account: Account) -> Generator:
+        """以流式事件输出批次文档的构建进度，首先输出一次完整状态，之后只转发索引构建推送的进度事件，
+        所有文档均构建完成或失败后结束输出"""
+        # 1.先订阅批次频道再查询完整状态，避免遗漏两者之间推送的进度事件
+        events = self.document_progress_service.listen(batch)
+        next(events)
+        try:
+            documents_status = self.get_documents_status(dataset_id, batch, account)
+        except Exception as e:
+            events.close()
+            raise e
+
+        def generate() -> Generator:
+            # 2.输出完整状态并记录未结束的文档
+            finished_statuses = [DocumentStatus.COMPLETED, DocumentStatus.ERROR]
+            pending_document_ids = {
+                str(document_status["id"]) for document_status in documents_status
+                if document_status["status"] not in finished_statuses
+            }
+            yield f"event: documents_status\ndata:{json.dumps(documents_status)}\n\n"
+
+            # 3.转发进度事件，每10秒发送一次心跳，所有文档结束后停止监听
+            last_ping_time = time.time()
+            try:
+                for event in events:
+                    if not pending_document_ids:
+                        break
+                    if event is None:
+                        if time.time() - last_ping_time >= 10:
+                            last_ping_time = time.time()
+                            yield "event: ping\ndata:{}\n\n"
+                        continue
+                    if event["id"] not in pending_document_ids:
+                        continue
+                    if event["status"] in finished_statuses:
+                        pending_document_ids.discard(event["id"])
+                    yield f"event: document_progress\ndata:{json.dumps(event)}\n\n"
+            finally:
+                events.close()
+
+        return generate()
 
     def get_documents(self, dataset_id: UUID, document_id: UUID, account: Account) -> Document:
         """根据传递的知识库id+文档id获取文档记录信息"""
@@ -229,8 +281,15 @@ class DocumentService(BaseService):
         if document.status not in [DocumentStatus.COMPLETED, DocumentStatus.ERROR]:
             raise FailException("当前文档处于不可删除状态，请稍后重试")
 
-        # 3.删除MySQL的文档基础信息
-        self.delete(document)
+        # 3.删除MySQL的文档基础信息，并在同一个事务中扣减知识库的文档数、字符总数及命中次数
+        with self.db.auto_commit():
+            self.db.session.delete(document)
+            self.dataset_counter_service.incr_dataset_counters(
+                dataset_id,
+                document_count=-1,
+                character_count=-document.character_count,
+                hit_count=-document.hit_count,
+            )
 
         # 4.调用异步任务执行后续操作，涵盖：关键词表更新、片段数据删除、weaviate记录删除等
         # todo: 异步
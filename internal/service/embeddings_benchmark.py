@@ -0,0 +1,54 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 23:55
+#Author  :Emcikem
+@File    :embeddings_benchmark.py
+"""
+import random
+import time
+
+from internal.service.embeddings_service import EmbeddingsService
+
+
+def build_segments(segment_count: int) -> list[str]:
+    """构造长度差异较大的中英文混合片段，模拟同一文档分割后长短不一的片段，片段带有序号保证内容互不相同"""
+    random.seed(42)
+    sentences = [
+        "知识库文档会被分割成多个片段，每个片段单独计算向量并写入向量数据库。",
+        "The embedding model encodes every segment into a dense vector.",
+        "关键词提取使用jieba完成，并写入关键词倒排表用于全文检索。",
+        "Short segments waste compute when they are padded to the longest one in a batch.",
+    ]
+    return [
+        f"片段{index}：" + "".join(random.choice(sentences) for _ in range(random.choice([1, 2, 4, 8, 16])))
+        for index in range(segment_count)
+    ]
+
+
+def embed_fixed_chunks(embeddings_service: EmbeddingsService, texts: list[str]) -> float:
+    """原先的方式，按传入顺序每10条调用一次向量计算，返回耗时(秒)"""
+    start_at = time.perf_counter()
+    for index in range(0, len(texts), 10):
+        embeddings_service.embeddings.embed_documents(texts[index:index + 10])
+    return time.perf_counter() - start_at
+
+
+def embed_token_budget(embeddings_service: EmbeddingsService, texts: list[str]) -> float:
+    """调用embed_batch按token长度排序并在token预算内动态打包批次的方式(不读写向量缓存)，返回耗时(秒)"""
+    start_at = time.perf_counter()
+    embeddings_service.embed_batch(texts, use_cache=False)
+    return time.perf_counter() - start_at
+
+
+if __name__ == "__main__":
+    # 向量缓存不参与基准测试，因此无需Redis客户端
+    embeddings_service = EmbeddingsService(redis_client=None)
+    texts = build_segments(1000)
+    embeddings_service.embeddings.embed_documents(texts[:10])
+
+    elapsed = embed_fixed_chunks(embeddings_service, texts)
+    print(f"fixed chunks of 10: {len(texts) / elapsed:.1f} segments/s, {elapsed:.2f}s")
+
+    elapsed = embed_token_budget(embeddings_service, texts)
+    print(f"token budget batches: {len(texts) / elapsed:.1f} segments/s, {elapsed:.2f}s")
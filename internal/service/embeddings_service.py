@@ -6,13 +6,25 @@
 @File    :embeddings_service.py
 """
 import os
+import time
 from dataclasses import dataclass
 
-import tiktoken
+import numpy as np
+import torch
 from injector import inject
 from langchain.embeddings import CacheBackedEmbeddings
 from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
+from redis import Redis
+
+from internal.core.token_counter import TokenCounter
+from internal.entity.cache_entity import (
+    EMBEDDING_CACHE_VECTORS,
+    EMBEDDING_CACHE_LRU,
+    EMBEDDING_CACHE_HITS,
+    EMBEDDING_CACHE_MISSES,
+)
+from internal.lib.helper import generate_text_hash
 
 @inject
 @dataclass
@@ -20,15 +32,40 @@ class EmbeddingsService:
     """文本嵌入模型服务"""
     _embeddings: Embeddings
     _cache_backed_embeddings: CacheBackedEmbeddings
+    _batch_token_budget: int
+    _max_batch_size: int
+    _model_name: str
+    _cache_max_size: int
+    _token_counter: TokenCounter
+    redis_client: Redis
 
-    def __init__(self):
+    def __init__(self, redis_client: Redis):
         """构造函数，初始化文本嵌入模型客户端、存储器、缓存客户端"""
+        # 1.记录缓存客户端及缓存容量，缓存按照(模型名字, 文本哈希)存储向量
+        self.redis_client = redis_client
+        self._model_name = "BAAI/bge-small-zh-v1.5"
+        self._cache_max_size = int(os.getenv("EMBEDDING_CACHE_MAX_SIZE", 100000))
+
+        # 2.读取批量嵌入配置，token预算用于限制单个批次的总token数(按批次内最长文本补齐计算)
+        self._batch_token_budget = int(os.getenv("EMBEDDING_BATCH_TOKEN_BUDGET", 16384))
+        self._max_batch_size = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", 128))
+        self._token_counter = TokenCounter()
+
+        # 3.配置torch推理使用的线程数，未配置时使用torch默认值
+        torch_threads = int(os.getenv("EMBEDDING_TORCH_THREADS", 0))
+        if torch_threads > 0:
+            torch.set_num_threads(torch_threads)
+
+        # 4.初始化本地文本嵌入模型，单次encode的批次大小与动态批次上限保持一致
         self._embeddings = HuggingFaceEmbeddings(
-            model_name="BAAI/bge-small-zh-v1.5",
+            model_name=self._model_name,
             cache_folder=os.path.join(os.getcwd(), "internal", "core", "embeddings"),
             model_kwargs={
                 "trust_remote_code": True,
-            }
+            },
+            encode_kwargs={
+                "batch_size": self._max_batch_size,
+            },
         )
         # todo:改成远程模型
 
@@ -39,12 +76,136 @@ class EmbeddingsService:
         #     namespace="embeddings",
         # )
 
+    def embed_batch(
+            self,
+            texts: list[str],
+            text_hashes: list[str] = None,
+            use_cache: bool = True,
+    ) -> list[list[float]]:
+        """批量计算文本向量，优先读取向量缓存，未命中的文本再批量计算并写入缓存，返回与texts顺序一致的向量列表，
+        use_cache为False时不读写向量缓存"""
+        # 1.计算文本哈希(与Segment.hash一致)，相同内容只需计算一次
+        if text_hashes is None:
+            text_hashes = [generate_text_hash(text) for text in texts]
+        unique_texts = dict(zip(text_hashes, texts))
+
+        # 2.读取缓存中已存在的向量
+        cached_vectors = self._get_cached_vectors(list(unique_texts.keys())) if use_cache else {}
+
+        # 3.批量计算未命中的文本向量并写入缓存
+        missed_hashes = [text_hash for text_hash in unique_texts if text_hash not in cached_vectors]
+        if missed_hashes:
+            missed_vectors = self._embed_batch_without_cache([unique_texts[text_hash] for text_hash in missed_hashes])
+            computed_vectors = dict(zip(missed_hashes, missed_vectors))
+            if use_cache:
+                self._set_cached_vectors(computed_vectors)
+            cached_vectors.update(computed_vectors)
+
+        return [cached_vectors[text_hash] for text_hash in text_hashes]
+
+    def embed_query(self, query: str) -> list[float]:
+        """计算检索query的向量，query会先进行空白字符归一化，相同的query直接命中向量缓存"""
+        normalized_query = " ".join(query.split())
+        return self.embed_batch([normalized_query])[0]
+
+    def get_cache_stats(self) -> dict[str, int]:
+        """获取向量缓存的统计信息，涵盖命中数、未命中数、缓存条数，缓存异常时各项统计返回0"""
+        try:
+            pipeline = self.redis_client.pipeline()
+            pipeline.mget([
+                EMBEDDING_CACHE_HITS.format(model_name=self._model_name),
+                EMBEDDING_CACHE_MISSES.format(model_name=self._model_name),
+            ])
+            pipeline.zcard(EMBEDDING_CACHE_LRU.format(model_name=self._model_name))
+            (hits, misses), size = pipeline.execute()
+        except Exception as e:
+            print(f"读取向量缓存统计信息失败，错误信息:{str(e)}")
+            hits, misses, size = 0, 0, 0
+        return {
+            "hits": int(hits or 0),
+            "misses": int(misses or 0),
+            "size": int(size or 0),
+        }
 
-    @classmethod
-    def calculate_token_count(cls, query: str) -> int:
-        """计算传入文本的token数"""
-        encoding = tiktoken.encoding_for_model("gpt-3.5")
-        return len(encoding.encode(query))
+    def _get_cached_vectors(self, text_hashes: list[str]) -> dict[str, list[float]]:
+        """根据文本哈希列表读取缓存的向量，同时刷新命中记录的访问时间并更新命中计数，缓存异常时视为未命中"""
+        if len(text_hashes) == 0:
+            return {}
+        try:
+            # 1.批量读取向量数据
+            values = self.redis_client.hmget(EMBEDDING_CACHE_VECTORS.format(model_name=self._model_name), text_hashes)
+            cached_vectors = {
+                text_hash: np.frombuffer(value, dtype=np.float32).tolist()
+                for text_hash, value in zip(text_hashes, values) if value is not None
+            }
+
+            # 2.刷新LRU访问时间并记录命中/未命中数
+            pipeline = self.redis_client.pipeline()
+            if cached_vectors:
+                pipeline.zadd(
+                    EMBEDDING_CACHE_LRU.format(model_name=self._model_name),
+                    {text_hash: time.time() for text_hash in cached_vectors},
+                )
+            pipeline.incrby(EMBEDDING_CACHE_HITS.format(model_name=self._model_name), len(cached_vectors))
+            pipeline.incrby(
+                EMBEDDING_CACHE_MISSES.format(model_name=self._model_name),
+                len(text_hashes) - len(cached_vectors),
+            )
+            pipeline.execute()
+
+            return cached_vectors
+        except Exception as e:
+            print(f"读取向量缓存失败，错误信息:{str(e)}")
+            return {}
+
+    def _set_cached_vectors(self, vectors: dict[str, list[float]]) -> None:
+        """将向量写入缓存，超出容量时按照最近最少使用的顺序淘汰"""
+        try:
+            # 1.写入向量数据并记录访问时间
+            vectors_key = EMBEDDING_CACHE_VECTORS.format(model_name=self._model_name)
+            lru_key = EMBEDDING_CACHE_LRU.format(model_name=self._model_name)
+            pipeline = self.redis_client.pipeline()
+            pipeline.hset(vectors_key, mapping={
+                text_hash: np.asarray(vector, dtype=np.float32).tobytes() for text_hash, vector in vectors.items()
+            })
+            pipeline.zadd(lru_key, {text_hash: time.time() for text_hash in vectors})
+            pipeline.zcard(lru_key)
+            size = pipeline.execute()[-1]
+
+            # 2.超出容量时淘汰最久未访问的向量
+            if size > self._cache_max_size:
+                evicted = self.redis_client.zpopmin(lru_key, size - self._cache_max_size)
+                if evicted:
+                    self.redis_client.hdel(vectors_key, *[text_hash for text_hash, _ in evicted])
+        except Exception as e:
+            print(f"写入向量缓存失败，错误信息:{str(e)}")
+
+    def _embed_batch_without_cache(self, texts: list[str]) -> list[list[float]]:
+        """批量计算文本向量，按token长度排序后在token预算内动态打包批次，返回与texts顺序一致的向量列表"""
+        # 1.计算每条文本的token数，并按照长度从短到长排序，减少同一批次内的补齐浪费
+        token_counts = self._token_counter.count_batch(texts)
+        order = sorted(range(len(texts)), key=lambda index: token_counts[index])
+
+        # 2.动态打包批次，批次的实际计算量约等于 批次内最长文本token数 * 批次大小
+        batches = []
+        batch = []
+        for index in order:
+            padded_tokens = max(token_counts[index], 1) * (len(batch) + 1)
+            if batch and (padded_tokens > self._batch_token_budget or len(batch) >= self._max_batch_size):
+                batches.append(batch)
+                batch = []
+            batch.append(index)
+        if batch:
+            batches.append(batch)
+
+        # 3.逐个批次执行向量计算，并还原为传入文本的顺序
+        vectors = [None] * len(texts)
+        for batch in batches:
+            batch_vectors = self._embeddings.embed_documents([texts[index] for index in batch])
+            for index, vector in zip(batch, batch_vectors):
+                vectors[index] = vector
+
+        return vectors
 
     @property
     def embeddings(self) -> Embeddings:
@@ -53,4 +214,3 @@ class EmbeddingsService:
     @property
     def cache_backed_embeddings(self) -> CacheBackedEmbeddings:
         return self._cache_backed_embeddings
-
@@ -5,28 +5,44 @@
 #Author  :Emcikem
 @File    :indexing_service.py
 """
+import multiprocessing
 import re
 import uuid
+from collections import defaultdict, deque
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+    FIRST_COMPLETED,
+)
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Callable
 from uuid import UUID
 
+from flask import current_app
 from injector import inject
 from langchain_core.documents import Document as LCDocument
 from redis import Redis
-from sqlalchemy import func
-from weaviate.collections.classes.filters import Filter
+from sqlalchemy import func, insert, update
 
 from internal.core.file_extractor import FileExtractor
+from internal.core.token_counter import TokenCounter
 from internal.entity.cache_entity import (
     LOCK_DOCUMENT_UPDATE_ENABLED
 )
 from internal.entity.dataset_entity import DocumentStatus, SegmentStatus
 from internal.exception import NotFoundException
 from internal.lib.helper import generate_text_hash
-from internal.model import Document, Segment, KeywordTable, DatasetQuery
+from internal.model import Document, Segment, KeywordPosting, KeywordStatistic, DatasetQuery
 from pkg.sqlalchemy import SQLAlchemy
 from .base_service import BaseService
+from .dataset_counter_service import DatasetCounterService
+from .dataset_version_service import DatasetVersionService
+from .document_progress_service import DocumentProgressService
 from .embeddings_service import EmbeddingsService
 from .jieba_service import JiebaService
 from .keyword_table_service import KeywordTableService
@@ -47,6 +63,10 @@ class IndexingService(BaseService):
     jieba_service: JiebaService
     keyword_table_service: KeywordTableService
     vector_database_service: VectorDatabaseService
+    dataset_version_service: DatasetVersionService
+    document_progress_service: DocumentProgressService
+    dataset_counter_service: DatasetCounterService
+    token_counter: TokenCounter
 
     def build_documents(self, document_ids: list[UUID]) -> None:
         """根据传递的文档id列表构建知识库，涵盖了加兹安、分割、索引构建、数据"""
@@ -55,34 +75,41 @@ class IndexingService(BaseService):
             Document.id.in_(document_ids)
         ).all()
 
-        # 2.执行循环遍历所有文档完成对每个文档的构建
+        # 2.读取当前worker的并发配置，多个文档且开启并发时使用流水线构建，否则逐个文档构建
+        parse_workers = int(current_app.config.get("INDEXING_PARSE_WORKERS", 1))
+        keyword_workers = int(current_app.config.get("INDEXING_KEYWORD_WORKERS", 1))
+        if len(documents) > 1 and max(parse_workers, keyword_workers) > 1:
+            self._build_documents_with_pipeline(documents, max(parse_workers, 1), max(keyword_workers, 1))
+            return
+
+        # 3.执行循环遍历所有文档完成对每个文档的构建
         for document in documents:
             try:
-                # 3.更新当前状态为解析中，并记录开始处理的时间
+                # 4.更新当前状态为解析中，并记录开始处理的时间
                 self.update(document, status=DocumentStatus.PARSING, processing_started_at=datetime.now())
+                self.document_progress_service.publish(document)
 
-                # 4.执行文档加载步骤，并更新文档状态与时间
+                # 5.执行文档加载步骤，并更新文档状态与时间
                 lc_documents = self._parsing(document)
 
-                # 5.执行文档分割步骤，并更新文档状态与时间，涵盖了片段的信息
+                # 6.执行文档分割步骤，并更新文档状态与时间，涵盖了片段的信息
                 lc_segments = self._splitting(document, lc_documents)
 
-                # 6.执行文档索引构建，涵盖关键词提取、向量，并更新数据状态
+                # 7.执行文档索引构建，涵盖关键词提取、向量，并更新数据状态
                 self._indexing(document, lc_segments)
 
-                # 7.存储操作，涵盖文档状态更新，以及向量数据库的存储
+                # 8.存储操作，涵盖文档状态更新，以及向量数据库的存储
                 self._completed(document, lc_segments)
 
             except Exception as e:
-                self.update(
-                    document,
-                    status=DocumentStatus.ERROR,
-                    error=str(e),
-                    stopped_at=datetime.now(),
-                )
-
-    def update_document_enabled(self, document_id: UUID) -> None:
-        """根据传递的文档id更新文档状态，他是修改weaviate向量数据库中的数据"""
+                self._error(document, e)
+
+    def update_document_enabled(
+            self,
+            document_id: UUID,
+            progress_callback: Callable[[int, int], None] = None,
+    ) -> None:
+        """根据传递的文档id更新文档状态，他是修改向量数据库中的数据，progress_callback接收(已处理节点数, 节点总数)"""
         # 1.构建缓存健
         cache_key = LOCK_DOCUMENT_UPDATE_ENABLED.format(document_id=document_id)
 
@@ -101,27 +128,27 @@ class IndexingService(BaseService):
         node_ids = [node_id for _, node_id, _ in segments]
 
         try:
-            # 4.执行循环遍历所有node_ids并更新向量数据
-            collection = self.vector_database_service.collection
-            for node_id in node_ids:
-                try:
-                    collection.data.update(
-                        uuid=node_id,
-                        properties={
-                            "document_enabled": document.enabled,
-                        }
-                    )
-                except Exception as e:
-                    with self.db.auto_commit():
-                        self.db.session.query(Segment).filter(
-                            Segment.node_id == node_id,
-                        ).update({
-                            "error": str(e),
+            # 4.分批并发更新向量数据库，收集失败的节点后一次性回写到数据库
+            errors = self._update_vector_properties(
+                document.dataset_id,
+                node_ids,
+                {"document_enabled": document.enabled},
+                progress_callback,
+            )
+            if errors:
+                failed_segment_ids = {node_id: id for id, node_id, _ in segments if node_id in errors}
+                with self.db.auto_commit():
+                    self.db.session.execute(update(Segment), [
+                        {
+                            "id": failed_segment_ids[node_id],
+                            "error": error,
                             "status": SegmentStatus.ERROR,
                             "enabled": False,
                             "disabled_at": datetime.now(),
                             "stopped_at": datetime.now(),
-                        })
+                        } for node_id, error in errors.items()
+                    ])
+                segments = [segment for segment in segments if segment[1] not in errors]
 
             # 5.更新关键词表对应的数据（enabled为false表示从关键词表中删除数据，enabled为true表示在关键词表中新增数据）
             if document.enabled is True:
@@ -141,8 +168,9 @@ class IndexingService(BaseService):
                 disabled_at=None if origin_enabled else datetime.now(),
             )
         finally:
-            # 6.清空缓存键表示异步操作已经执行完成，无论请求成功还是失败都清除
+            # 6.清空缓存键表示异步操作已经执行完成，无论请求成功还是失败都清除，并递增知识库版本号淘汰检索缓存
             self.redis_client.delete(cache_key)
+            self.dataset_version_service.bump_versions([document.dataset_id])
 
     def delete_document(self, dataset_id: UUID, document_id: UUID) -> None:
         """根据传递的知识库id+文档id删除文档信息"""
@@ -154,10 +182,7 @@ class IndexingService(BaseService):
         ]
 
         # 2.调用向量数据库删除其关联数据
-        collection = self.vector_database_service.collection
-        collection.data.delete_many(
-            where=Filter.by_property("document_id").equal(document_id),
-        )
+        self.vector_database_service.delete_by_document_id(dataset_id, document_id)
 
         # 3.删除MySQL关联的segment记录
         with self.db.auto_commit():
@@ -168,6 +193,9 @@ class IndexingService(BaseService):
         # 4.删除片段id对应的关键词记录
         self.keyword_table_service.delete_keyword_table_from_ids(dataset_id, segment_ids)
 
+        # 5.递增知识库版本号淘汰检索缓存
+        self.dataset_version_service.bump_versions([dataset_id])
+
     def delete_dataset(self, dataset_id: UUID) -> None:
         """根据传递的知识库id执行相应的删除操作"""
         try:
@@ -182,9 +210,12 @@ class IndexingService(BaseService):
                     Segment.document_id == str(dataset_id),
                 ).delete()
 
-                # 3.删除关联的关键词表
-                self.db.session.query(KeywordTable).filter(
-                    KeywordTable.dataset_id == str(dataset_id),
+                # 3.删除关联的关键词倒排记录
+                self.db.session.query(KeywordPosting).filter(
+                    KeywordPosting.dataset_id == str(dataset_id),
+                ).delete()
+                self.db.session.query(KeywordStatistic).filter(
+                    KeywordStatistic.dataset_id == str(dataset_id),
                 ).delete()
 
                 # 4.删除知识库查询记录
@@ -193,29 +224,192 @@ class IndexingService(BaseService):
                 ).delete()
 
             # 5.调用向量数据库删除知识库的关联记录
-            self.vector_database_service.collection.data.delete_many(
-                where=Filter.by_property("dataset_id").equal(str(dataset_id)),
-            )
+            self.vector_database_service.delete_by_dataset_id(dataset_id)
+
+            # 6.递增知识库版本号淘汰检索缓存
+            self.dataset_version_service.bump_versions([dataset_id])
         except Exception as e:
             print()
 
-    def _parsing(self, document: Document) -> list[LCDocument]:
-        """解析传递的文档为LangChain文档列表"""
+    def _update_vector_properties(
+            self,
+            dataset_id: UUID,
+            node_ids: list[str],
+            properties: dict,
+            progress_callback: Callable[[int, int], None] = None,
+    ) -> dict[str, str]:
+        """将节点按INDEXING_ENABLED_UPDATE_BATCH_SIZE分批，在有界线程池中并发更新向量数据库属性，返回失败的节点及错误信息"""
+        # 1.读取批次大小及并发数，线程中只访问向量数据库，不涉及数据库会话
+        batch_size = max(int(current_app.config.get("INDEXING_ENABLED_UPDATE_BATCH_SIZE", 200)), 1)
+        max_workers = max(int(current_app.config.get("INDEXING_ENABLED_UPDATE_WORKERS", 4)), 1)
+        batches = [node_ids[i:i + batch_size] for i in range(0, len(node_ids), batch_size)]
+
+        # 2.提交所有批次并在完成时汇总错误、上报进度，整批异常时该批次所有节点均记为失败
+        errors = {}
+        processed = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.vector_database_service.update_properties, dataset_id, batch, properties): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    errors.update(future.result())
+                except Exception as e:
+                    errors.update({node_id: str(e) for node_id in batch})
+                processed += len(batch)
+                if progress_callback is not None:
+                    progress_callback(processed, len(node_ids))
+
+        return errors
+
+    def _build_documents_with_pipeline(
+            self,
+            documents: list[Document],
+            parse_workers: int,
+            keyword_workers: int,
+    ) -> None:
+        """使用多阶段流水线并行构建多个文档，解析与关键词提取在进程池中执行，向量写入跨文档批量执行，
+        数据库读写始终在当前线程中完成，每个阶段的在途任务数受INDEXING_QUEUE_SIZE限制"""
+        # 1.读取阶段队列长度及向量批次大小
+        queue_size = max(int(current_app.config.get("INDEXING_QUEUE_SIZE", 4)), 1)
+        vector_batch_size = max(int(current_app.config.get("INDEXING_VECTOR_BATCH_SIZE", 32)), 1)
+
+        # 2.初始化各阶段的队列，parsing/keywords记录在途任务，vector_buffer缓存等待写入向量数据库的片段
+        pending_documents = deque(documents)
+        parsing_futures: dict[Future, Document] = {}
+        keyword_futures: dict[Future, tuple[Document, list[LCDocument]]] = {}
+        vector_buffer: list[tuple[Document, LCDocument]] = []
+        remaining_segments: dict[str, int] = {}
+
+        with ThreadPoolExecutor(max_workers=parse_workers) as download_executor, \
+                self._create_process_executor(parse_workers) as parse_executor, \
+                self._create_process_executor(keyword_workers, JiebaService) as keyword_executor:
+            while pending_documents or parsing_futures or keyword_futures:
+                # 3.解析队列及下游关键词队列均未满时，下载文件并投递到解析进程池
+                while (
+                        pending_documents
+                        and len(parsing_futures) < queue_size
+                        and len(keyword_futures) < queue_size
+                ):
+                    document = pending_documents.popleft()
+                    try:
+                        self.update(document, status=DocumentStatus.PARSING, processing_started_at=datetime.now())
+                        self.document_progress_service.publish(document)
+                        future = download_executor.submit(
+                            self.file_extractor.load_from_key,
+                            document.upload_file.key, False, True, parse_executor,
+                        )
+                        parsing_futures[future] = document
+                    except Exception as e:
+                        self._error(document, e)
+
+                # 4.等待任意一个在途任务完成
+                done, _ = wait([*parsing_futures, *keyword_futures], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in parsing_futures:
+                        # 5.解析完成的文档执行分割，并将片段投递到关键词提取进程池
+                        document = parsing_futures.pop(future)
+                        try:
+                            lc_segments = self._splitting(document, self._parsing(document, future.result()))
+                            keyword_future = keyword_executor.submit(
+                                JiebaService.extract_keywords_batch,
+                                [lc_segment.page_content for lc_segment in lc_segments],
+                                10,
+                            )
+                            keyword_futures[keyword_future] = (document, lc_segments)
+                        except Exception as e:
+                            self._error(document, e)
+                    else:
+                        # 6.关键词提取完成的文档构建关键词索引，并将片段加入向量写入缓冲区
+                        document, lc_segments = keyword_futures.pop(future)
+                        try:
+                            self._indexing(document, lc_segments, future.result())
+                            if len(lc_segments) == 0:
+                                self._mark_completed(document)
+                                continue
+                            for lc_segment in lc_segments:
+                                lc_segment.metadata["document_enabled"] = True
+                                lc_segment.metadata["segment_enabled"] = True
+                            remaining_segments[document.id] = len(lc_segments)
+                            vector_buffer.extend((document, lc_segment) for lc_segment in lc_segments)
+                        except Exception as e:
+                            self._error(document, e)
+
+                # 7.缓冲区达到批次大小时，跨文档批量写入向量数据库
+                while len(vector_buffer) >= vector_batch_size:
+                    self._flush_vector_buffer(vector_buffer[:vector_batch_size], remaining_segments)
+                    del vector_buffer[:vector_batch_size]
+
+        # 8.写入缓冲区中剩余的片段
+        if vector_buffer:
+            self._flush_vector_buffer(vector_buffer, remaining_segments)
+
+    @classmethod
+    def _create_process_executor(cls, max_workers: int, initializer: Callable = None) -> Executor:
+        """创建进程池，Celery prefork模式下的子进程为守护进程，无法再创建子进程，此时退化为线程池"""
+        if multiprocessing.current_process().daemon:
+            return ThreadPoolExecutor(max_workers=max_workers, initializer=initializer)
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=initializer)
+
+    def _flush_vector_buffer(
+            self,
+            buffer: list[tuple[Document, LCDocument]],
+            remaining_segments: dict[str, int],
+    ) -> None:
+        """将跨文档的片段缓冲区写入向量数据库，并将片段全部写入完毕的文档标记为已完成，
+        写入过程出现异常时将该批次中尚未完成的文档标记为构建失败，不影响其他批次及后续文档"""
+        # 1.跳过此前已构建失败的文档剩余的片段
+        buffer = [(document, lc_segment) for document, lc_segment in buffer if document.id in remaining_segments]
+        if not buffer:
+            return
+        documents = {}
+        stored_counts = defaultdict(int)
+        for document, _ in buffer:
+            documents[document.id] = document
+            stored_counts[document.id] += 1
+
+        try:
+            # 2.批量写入向量数据库并更新片段状态
+            stored = self._store_vectors([lc_segment for _, lc_segment in buffer])
+
+            # 3.扣减每个文档剩余待写入的片段数，写入成功时推送已完成片段数，全部写入后更新文档状态
+            for document_id, count in stored_counts.items():
+                if stored:
+                    self.document_progress_service.incr_completed_segment_count(documents[document_id], count)
+                remaining_segments[document_id] -= count
+                if remaining_segments[document_id] == 0:
+                    del remaining_segments[document_id]
+                    self._mark_completed(documents[document_id])
+        except Exception as e:
+            # 4.该批次中尚未完成的文档逐个标记为构建失败，并不再处理其剩余片段
+            for document_id, document in documents.items():
+                if remaining_segments.pop(document_id, None) is not None or document.status != DocumentStatus.COMPLETED:
+                    self._error(document, e)
+
+    def _parsing(self, document: Document, lc_documents: list[LCDocument] = None) -> list[LCDocument]:
+        """解析传递的文档为LangChain文档列表，如果传递了已加载的文档列表则跳过加载步骤"""
         # 1.获取upload_file并加载LangChain文档
-        upload_file = document.upload_file
-        lc_documents = self.file_extractor.load(upload_file, False, True)
+        if lc_documents is None:
+            upload_file = document.upload_file
+            lc_documents = self.file_extractor.load(upload_file, False, True)
 
         # 2.循环处理LangChain文档，并删除多余的空白字符串
         for lc_document in lc_documents:
             lc_document.page_content = self._clean_extra_text(lc_document.page_content)
 
-        # 3.更新文档状态并记录时间
-        self.update(
-            document,
-            character_count=sum([len(lc_document.page_content) for lc_document in lc_documents]),
-            status=DocumentStatus.SPLITTING,
-            parsing_completed_at=datetime.now(),
-        )
+        # 3.更新文档状态并记录时间，同时按字符数的变化量更新知识库的字符总数
+        character_count = sum([len(lc_document.page_content) for lc_document in lc_documents])
+        with self.db.auto_commit():
+            self.dataset_counter_service.incr_dataset_counters(
+                document.dataset_id,
+                character_count=character_count - document.character_count,
+            )
+            document.character_count = character_count
+            document.status = DocumentStatus.SPLITTING
+            document.parsing_completed_at = datetime.now()
+        self.document_progress_service.publish(document)
 
         return lc_documents
 
@@ -225,7 +419,7 @@ class IndexingService(BaseService):
         process_rule = document.process_rule
         text_splitter = self.process_rule_service.get_text_splitter_by_process_rule(
             process_rule,
-            self.embeddings_service.calculate_token_count,
+            self.token_counter.count,
         )
 
         # 2.按照process_rule规则清除多余的字符串
@@ -238,14 +432,31 @@ class IndexingService(BaseService):
         # 3.分割文档列表为片段列表
         lc_segments = text_splitter.split_documents(lc_documents)
 
-        # 4.获取对应文档下得到最大片段位置
+        # 4.开启增量构建且文档已存在片段时(重新构建)，按内容哈希复用未变化的片段，只为新增内容创建片段
+        if current_app.config.get("INDEXING_INCREMENTAL", True):
+            existing_segments = self.db.session.query(Segment).with_entities(
+                Segment.id,
+                Segment.node_id,
+                Segment.hash,
+                Segment.status,
+                Segment.enabled,
+                Segment.token_count,
+                Segment.hit_count,
+            ).filter(
+                Segment.document_id == document.id,
+            ).order_by(Segment.position.asc()).all()
+            if existing_segments:
+                return self._incremental_splitting(document, lc_segments, existing_segments)
+
+        # 5.获取对应文档下得到最大片段位置
         position = self.db.session.query(func.coalesce(func.max(Segment.position), 0)).filter(
             Segment.document_id == document.id,
         ).scalar()
 
-        # 5.循环处理片段数据并添加有数据，他是存储到MySQL数据库中
+        # 6.循环处理片段数据并添加有数据，他是存储到MySQL数据库中，片段token数一次性批量计算(分割时已计算过的片段直接命中缓存)
         segments = []
-        for lc_segment in lc_segments:
+        token_counts = self.token_counter.count_batch([lc_segment.page_content for lc_segment in lc_segments])
+        for lc_segment, token_count in zip(lc_segments, token_counts):
             position += 1
             content = lc_segment.page_content
             segment = self.create(
@@ -257,7 +468,7 @@ class IndexingService(BaseService):
                 position=position,
                 content=content,
                 character_count=len(content),
-                token_count=self.embeddings_service.calculate_token_count(content),
+                token_count=token_count,
                 hash=generate_text_hash(content),
                 status=SegmentStatus.WAITING,
             )
@@ -272,50 +483,170 @@ class IndexingService(BaseService):
             }
             segments.append(segment)
 
-        # 6.更新文档的数据，涵盖状态、token数等内容
-        self.update(
-            document,
-            token_count=sum([segment.token_count for segment in segments]),
-            status=DocumentStatus.INDEXING,
-            splitting_completed_at=datetime.now(),
-        )
+        # 7.更新文档的数据，涵盖状态、token数、片段数等内容
+        with self.db.auto_commit():
+            self.dataset_counter_service.incr_document_counters(document.id, segment_count=len(segments))
+            document.token_count = sum([segment.token_count for segment in segments])
+            document.status = DocumentStatus.INDEXING
+            document.splitting_completed_at = datetime.now()
+        self.document_progress_service.publish(document, segment_count=len(segments), completed_segment_count=0)
 
         return lc_segments
 
-    def _indexing(self, document: Document, lc_segments: list[LCDocument]) -> None:
-        """根据传递的信息构建索引，涵盖关键词提取、词表构建"""
-        for lc_segment in lc_segments:
-            # 1.提取每一个片段对应的关键词，关键词的梳理最多不超过10个
-            keywords = self.jieba_service.extract_keywords(lc_segment.page_content, 10)
+    def _incremental_splitting(
+            self,
+            document: Document,
+            lc_segments: list[LCDocument],
+            existing_segments: list,
+    ) -> list[LCDocument]:
+        """将新的分割结果与已有片段按hash对比，未变化的片段连同向量及关键词一起保留，删除消失的片段，
+        新增片段批量写入数据库，返回只包含新增片段的列表，后续的索引及向量构建只处理这部分片段"""
+        # 1.按hash对已完成构建的片段分组，相同内容出现多次时按原有顺序依次复用，其余状态的片段需要重新构建
+        reusable_segments = defaultdict(deque)
+        for segment in existing_segments:
+            if segment.status == SegmentStatus.COMPLETED:
+                reusable_segments[segment.hash].append(segment)
+
+        # 2.按新的顺序匹配片段，匹配成功的片段只需要更新位置
+        kept_segments = []
+        kept_positions = []
+        new_lc_segments = []
+        for position, lc_segment in enumerate(lc_segments, start=1):
+            text_hash = generate_text_hash(lc_segment.page_content)
+            if reusable_segments.get(text_hash):
+                segment = reusable_segments[text_hash].popleft()
+                kept_segments.append(segment)
+                kept_positions.append({"id": segment.id, "position": position})
+            else:
+                lc_segment.metadata["position"] = position
+                lc_segment.metadata["hash"] = text_hash
+                new_lc_segments.append(lc_segment)
+        kept_segment_ids = {segment.id for segment in kept_segments}
+        vanished_segments = [segment for segment in existing_segments if segment.id not in kept_segment_ids]
+
+        # 3.清除消失片段在向量数据库及关键词表中的数据
+        if vanished_segments:
+            self.vector_database_service.delete_by_node_ids(
+                document.dataset_id, [segment.node_id for segment in vanished_segments],
+            )
+            self.keyword_table_service.delete_keyword_table_from_ids(
+                document.dataset_id, [segment.id for segment in vanished_segments],
+            )
 
-            # 2.逐条更新文档片段的关键词
-            self.db.session.query(Segment).filter(
-                Segment.id == lc_segment.metadata["segment_id"]
-            ).update({
-                "keywords": keywords,
-                "status": SegmentStatus.INDEXING,
-                "indexing_completed_at": datetime.now(),
+        # 4.构建新增片段的记录，片段id及节点id在本地生成以便直接写入元数据
+        token_counts = self.token_counter.count_batch([lc_segment.page_content for lc_segment in new_lc_segments])
+        new_segments = []
+        for lc_segment, token_count in zip(new_lc_segments, token_counts):
+            content = lc_segment.page_content
+            new_segments.append({
+                "id": str(uuid.uuid4()),
+                "account_id": document.account_id,
+                "dataset_id": document.dataset_id,
+                "document_id": document.id,
+                "node_id": str(uuid.uuid4()),
+                "position": lc_segment.metadata["position"],
+                "content": content,
+                "character_count": len(content),
+                "token_count": token_count,
+                "hash": lc_segment.metadata["hash"],
+                "status": SegmentStatus.WAITING,
             })
-
-            # 4.获取当前知识库的关键词表
-            keyword_table_record = self.keyword_table_service.get_keyword_table_from_dataset_id(UUID(document.dataset_id))
-            keyword_table = {
-                field: set(value) for field, value in keyword_table_record.keyword_table.items()
+            lc_segment.metadata = {
+                "account_id": str(document.account_id),
+                "dataset_id": str(document.dataset_id),
+                "document_id": str(document.id),
+                "segment_id": new_segments[-1]["id"],
+                "node_id": new_segments[-1]["node_id"],
+                "document_enabled": False,
+                "segment_enabled": False,
             }
 
-            # 4.循环将新关键词添加到关键词表中
-            for keyword in keywords:
-                if keyword not in keyword_table:
-                    keyword_table[keyword] = set()
-                keyword_table[keyword].add(lc_segment.metadata["segment_id"])
-
-            # 5.更新关键词表
-            self.update(
-                keyword_table_record,
-                keyword_table={field: list(value) for field, value in keyword_table.items()}
+        # 5.在同一个事务中删除消失的片段、批量重排保留片段的位置、批量插入新增片段，并同步文档及知识库的计数
+        vanished_hit_count = sum(segment.hit_count for segment in vanished_segments)
+        with self.db.auto_commit():
+            if vanished_segments:
+                self.db.session.query(Segment).filter(
+                    Segment.id.in_([segment.id for segment in vanished_segments]),
+                ).delete(synchronize_session=False)
+            self.dataset_counter_service.incr_document_counters(
+                document.id,
+                segment_count=len(new_segments) - len(vanished_segments),
+                hit_count=-vanished_hit_count,
+            )
+            self.dataset_counter_service.incr_dataset_counters(document.dataset_id, hit_count=-vanished_hit_count)
+            if kept_positions:
+                self.db.session.execute(update(Segment), kept_positions)
+            if new_segments:
+                self.db.session.execute(insert(Segment), new_segments)
+
+        # 6.文档处于禁用状态时保留片段的向量及关键词已被剔除，构建完成后文档会被启用，需要同步恢复
+        if not document.enabled and kept_segments:
+            self._update_vector_properties(
+                document.dataset_id,
+                [segment.node_id for segment in kept_segments],
+                {"document_enabled": True},
+            )
+            self.keyword_table_service.add_keyword_table_from_ids(
+                document.dataset_id,
+                [segment.id for segment in kept_segments if segment.enabled],
             )
 
-        # 6.更新文档状态
+        # 7.更新文档的数据，token数涵盖保留片段及新增片段
+        self.update(
+            document,
+            token_count=sum(segment.token_count for segment in kept_segments) + sum(token_counts),
+            status=DocumentStatus.INDEXING,
+            splitting_completed_at=datetime.now(),
+        )
+        self.document_progress_service.publish(
+            document,
+            segment_count=len(kept_segments) + len(new_lc_segments),
+            completed_segment_count=len(kept_segments),
+        )
+
+        return new_lc_segments
+
+    def _indexing(
+            self,
+            document: Document,
+            lc_segments: list[LCDocument],
+            keywords_list: list[list[str]] = None,
+    ) -> None:
+        """根据传递的信息构建索引，涵盖关键词提取、词表构建，keywords_list为已提前提取好的各片段关键词"""
+        # 1.先提取所有片段对应的关键词，每个片段的关键词最多不超过10个
+        if keywords_list is None:
+            keywords_list = self.jieba_service.extract_keywords_batch(
+                [lc_segment.page_content for lc_segment in lc_segments],
+                10,
+            )
+        segment_keywords = {
+            lc_segment.metadata["segment_id"]: keywords
+            for lc_segment, keywords in zip(lc_segments, keywords_list)
+        }
+
+        # 2.使用一条批量语句更新所有片段的关键词及状态，避免逐条UPDATE
+        if segment_keywords:
+            indexing_completed_at = datetime.now()
+            with self.db.auto_commit():
+                self.db.session.execute(update(Segment), [
+                    {
+                        "id": segment_id,
+                        "keywords": keywords,
+                        "status": SegmentStatus.INDEXING,
+                        "indexing_completed_at": indexing_completed_at,
+                    } for segment_id, keywords in segment_keywords.items()
+                ])
+
+        # 3.上锁并一次性将整个文档的关键词合并到知识库关键词表
+        self.keyword_table_service.add_keyword_table_from_segments(document.dataset_id, [
+            (
+                lc_segment.metadata["segment_id"],
+                segment_keywords[lc_segment.metadata["segment_id"]],
+                lc_segment.page_content,
+            ) for lc_segment in lc_segments
+        ])
+
+        # 4.更新文档状态
         self.update(
             document,
             indexing_completed_at=datetime.now(),
@@ -328,40 +659,63 @@ class IndexingService(BaseService):
             lc_segment.metadata["document_enabled"] = True
             lc_segment.metadata["segment_enabled"] = True
 
-        # 2.调用向量数据库，每次存储10条数据，避免一次性传递过多的数据
-        for i in range(0, len(lc_segments), 10):
-            chunks = lc_segments[i: i + 10]
-            ids = [chunk.metadata["node_id"] for chunk in chunks]
-            try:
-                self.vector_database_service.vector_store.add_documents(chunks, ids=ids)
-                with self.db.auto_commit():
-                    self.db.session.query(Segment).filter(
-                        Segment.node_id.in_(ids)
-                    ).update({
-                        "status": SegmentStatus.COMPLETED,
-                        "completed_at": datetime.now(),
-                        "enabled": True,
-                    })
-            except Exception as e:
-                print(f"构建文档片段索引发生异常，错误信息{str(e)}")
-                with self.db.auto_commit():
-                    self.db.session.query(Segment).filter(
-                        Segment.node_id.in_(ids)
-                    ).update({
-                        "status": SegmentStatus.ERROR,
-                        "completed_at": datetime.now(),
-                        "stopped_at": datetime.now(),
-                        "enabled": False,
-                        "error": str(e),
-                    })
+        # 2.调用向量数据库，每次存储100条数据，向量由嵌入服务按token预算动态分批计算
+        for i in range(0, len(lc_segments), 100):
+            if self._store_vectors(lc_segments[i: i + 100]):
+                self.document_progress_service.incr_completed_segment_count(document, len(lc_segments[i: i + 100]))
 
         # 3.更新文档的状态数据
+        self._mark_completed(document)
+
+    def _store_vectors(self, lc_segments: list[LCDocument]) -> bool:
+        """将一批片段存储到向量数据库，并根据存储结果更新片段状态，返回是否存储成功"""
+        ids = [lc_segment.metadata["node_id"] for lc_segment in lc_segments]
+        try:
+            vectors = self.embeddings_service.embed_batch([lc_segment.page_content for lc_segment in lc_segments])
+            self.vector_database_service.add_documents(lc_segments, vectors, ids)
+            with self.db.auto_commit():
+                self.db.session.query(Segment).filter(
+                    Segment.node_id.in_(ids)
+                ).update({
+                    "status": SegmentStatus.COMPLETED,
+                    "completed_at": datetime.now(),
+                    "enabled": True,
+                })
+            return True
+        except Exception as e:
+            print(f"构建文档片段索引发生异常，错误信息{str(e)}")
+            with self.db.auto_commit():
+                self.db.session.query(Segment).filter(
+                    Segment.node_id.in_(ids)
+                ).update({
+                    "status": SegmentStatus.ERROR,
+                    "completed_at": datetime.now(),
+                    "stopped_at": datetime.now(),
+                    "enabled": False,
+                    "error": str(e),
+                })
+            return False
+
+    def _mark_completed(self, document: Document) -> None:
+        """将文档标记为构建完成，并递增知识库版本号淘汰检索缓存"""
         self.update(
             document,
             status=DocumentStatus.COMPLETED,
             completed_at=datetime.now(),
             enabled=True,
         )
+        self.document_progress_service.publish(document)
+        self.dataset_version_service.bump_versions([document.dataset_id])
+
+    def _error(self, document: Document, error: Exception) -> None:
+        """将文档标记为构建失败并记录错误信息"""
+        self.update(
+            document,
+            status=DocumentStatus.ERROR,
+            error=str(error),
+            stopped_at=datetime.now(),
+        )
+        self.document_progress_service.publish(document)
 
     @classmethod
     def _clean_extra_text(cls, text: str) -> str:
@@ -28,4 +28,9 @@ class JiebaService:
         return jieba.analyse.extract_tags(
             sentence=text,
             topK=max_keyword_pre_chunk,
-        )
\ No newline at end of file
+        )
+
+    @classmethod
+    def extract_keywords_batch(cls, texts: list[str], max_keyword_pre_chunk: int = 10) -> list[list[str]]:
+        """批量提取文本列表的关键词，便于整体投递到进程池中执行"""
+        return [cls.extract_keywords(text, max_keyword_pre_chunk) for text in texts]
@@ -0,0 +1,106 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 23:50
+#Author  :Emcikem
+@File    :keyword_indexing_benchmark.py
+"""
+import random
+import time
+import uuid
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import update
+
+from internal.entity.dataset_entity import SegmentStatus
+from internal.extension.database_extension import db
+from internal.model import Segment
+from internal.service.jieba_service import JiebaService
+
+
+def build_segments(segment_count: int) -> list[tuple[str, str]]:
+    """构造segment_count个(片段id, 片段内容)，内容由随机组合的中文词语构成，保证关键词分布足够分散"""
+    random.seed(42)
+    words = [
+        "知识库", "向量", "检索", "分词", "关键词", "倒排", "索引", "文档", "片段", "模型", "嵌入", "召回",
+        "排序", "相似度", "数据库", "事务", "缓存", "队列", "进程", "线程", "解析", "分割", "统计", "权重",
+    ]
+    return [
+        (str(uuid.uuid4()), "".join(random.choice(words) + f"第{random.randint(0, 5000)}项" for _ in range(60)))
+        for _ in range(segment_count)
+    ]
+
+
+def index_per_segment(jieba_service: JiebaService, segments: list[tuple[str, str]]) -> None:
+    """原先IndexingService._indexing的片段处理方式，逐个片段提取关键词并单独执行UPDATE后提交"""
+    for segment_id, content in segments:
+        keywords = jieba_service.extract_keywords(content, 10)
+        db.session.query(Segment).filter(
+            Segment.id == segment_id
+        ).update({
+            "keywords": keywords,
+            "status": SegmentStatus.INDEXING,
+            "indexing_completed_at": datetime.now(),
+        })
+        db.session.commit()
+
+
+def index_batched(jieba_service: JiebaService, segments: list[tuple[str, str]]) -> None:
+    """当前IndexingService._indexing的片段处理方式，批量提取关键词后使用一条批量UPDATE语句更新全部片段"""
+    keywords_list = jieba_service.extract_keywords_batch([content for _, content in segments], 10)
+    indexing_completed_at = datetime.now()
+    with db.auto_commit():
+        db.session.execute(update(Segment), [
+            {
+                "id": segment_id,
+                "keywords": keywords,
+                "status": SegmentStatus.INDEXING,
+                "indexing_completed_at": indexing_completed_at,
+            } for (segment_id, _), keywords in zip(segments, keywords_list)
+        ])
+
+
+def measure(jieba_service: JiebaService, segment_count: int, index_func) -> float:
+    """返回为一个包含segment_count个片段的文档更新片段关键词的耗时(秒)，每次测量使用新建的片段表"""
+    segments = build_segments(segment_count)
+    Segment.__table__.drop(db.engine, checkfirst=True)
+    Segment.__table__.create(db.engine)
+    document_id = str(uuid.uuid4())
+    with db.auto_commit():
+        db.session.add_all([
+            Segment(
+                id=segment_id,
+                account_id=document_id,
+                dataset_id=document_id,
+                document_id=document_id,
+                node_id=segment_id,
+                content=content,
+                keywords=[],
+                status=SegmentStatus.WAITING,
+            ) for segment_id, content in segments
+        ])
+
+    start_at = time.perf_counter()
+    index_func(jieba_service, segments)
+    return time.perf_counter() - start_at
+
+
+if __name__ == "__main__":
+    # 使用内存SQLite数据库承载真实的Segment模型及Flask-SQLAlchemy会话
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+
+    with app.app_context():
+        jieba_service = JiebaService()
+        jieba_service.extract_keywords("预热结巴分词词典")
+
+        for segment_count in (500, 1000, 2000, 5000):
+            per_segment = measure(jieba_service, segment_count, index_per_segment)
+            batched = measure(jieba_service, segment_count, index_batched)
+            print(
+                f"{segment_count} segments: per segment {per_segment:.2f}s "
+                f"({per_segment / segment_count * 1000:.2f}ms/segment), "
+                f"batched {batched:.2f}s ({batched / segment_count * 1000:.2f}ms/segment)"
+            )
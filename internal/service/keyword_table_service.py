@@ -5,90 +5,193 @@
 #Author  :Emcikem
 @File    :keyword_table_service.py
 """
+import math
+import uuid
 from dataclasses import dataclass
 from uuid import UUID
 
 from injector import inject
 from redis import Redis
+from sqlalchemy import func, insert, and_, case, desc, literal
 
 from internal.entity.cache_entity import (
     LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE,
     LOCK_EXPIRE_TIME,
 )
-from internal.model import Segment, KeywordTable
+from internal.entity.dataset_entity import BM25_K1, BM25_B
+from internal.model import Segment, KeywordPosting, KeywordStatistic
 from pkg.sqlalchemy import SQLAlchemy
 from .base_service import BaseService
 
 @inject
 @dataclass
 class KeywordTableService(BaseService):
-    """知识库关键词表服务"""
+    """知识库关键词表服务，关键词以倒排记录(dataset_id, keyword, segment_id)的形式存储"""
     db: SQLAlchemy
     redis_client: Redis
 
-    def get_keyword_table_from_dataset_id(self, dataset_id: UUID) -> KeywordTable:
-        """根据传递的知识库id获取关键词表"""
-        keyword_table = self.db.session.query(KeywordTable).filter(
-            KeywordTable.dataset_id == str(dataset_id),
-        ).one_or_none()
-        if keyword_table is None:
-            keyword_table = self.create(KeywordTable, dataset_id=dataset_id, keyword_table={})
+    def search_segments_by_bm25(
+            self,
+            dataset_ids: list[UUID],
+            keywords: list[str],
+            k: int = 4,
+    ) -> list[tuple[str, float]]:
+        """根据传递的知识库id列表+关键词列表，使用BM25计算片段得分，返回得分最高的k条(segment_id, score)"""
+        # 1.关键词去重并校验参数
+        dataset_ids = [str(dataset_id) for dataset_id in dataset_ids]
+        keywords = list(set(keywords))
+        if len(dataset_ids) == 0 or len(keywords) == 0:
+            return []
+
+        # 2.获取每个知识库的片段数与片段总长度
+        statistics = {
+            dataset_id: (segment_count, total_length)
+            for dataset_id, segment_count, total_length in self.db.session.query(
+                KeywordStatistic.dataset_id,
+                KeywordStatistic.segment_count,
+                KeywordStatistic.total_length,
+            ).filter(KeywordStatistic.dataset_id.in_(dataset_ids)).all()
+        }
+
+        # 3.统计query关键词在各个知识库下的文档频率，只会扫描这些关键词对应的索引范围
+        document_frequencies = self.db.session.query(
+            KeywordPosting.dataset_id,
+            KeywordPosting.keyword,
+            func.count(KeywordPosting.id),
+        ).filter(
+            KeywordPosting.dataset_id.in_(dataset_ids),
+            KeywordPosting.keyword.in_(keywords),
+        ).group_by(KeywordPosting.dataset_id, KeywordPosting.keyword).all()
+        if len(document_frequencies) == 0:
+            return []
+
+        # 4.计算每个(知识库, 关键词)的IDF，以及每个知识库的平均片段长度
+        idf_whens = []
+        for dataset_id, keyword, document_frequency in document_frequencies:
+            segment_count = max(statistics.get(dataset_id, (0, 0))[0], document_frequency)
+            idf = math.log((segment_count - document_frequency + 0.5) / (document_frequency + 0.5) + 1)
+            idf_whens.append((and_(KeywordPosting.dataset_id == dataset_id, KeywordPosting.keyword == keyword), idf))
+        avgdl_whens = [
+            (KeywordPosting.dataset_id == dataset_id, total_length / segment_count)
+            for dataset_id, (segment_count, total_length) in statistics.items()
+            if segment_count > 0 and total_length > 0
+        ]
+        avgdl = case(*avgdl_whens, else_=1) if avgdl_whens else literal(1)
+
+        # 5.在数据库中完成BM25打分、聚合与top-k截取，避免将全部倒排记录加载到内存中
+        score = func.sum(
+            case(*idf_whens, else_=0) * KeywordPosting.term_frequency * (BM25_K1 + 1)
+            / (KeywordPosting.term_frequency + BM25_K1 * (
+                1 - BM25_B + BM25_B * KeywordPosting.segment_length / avgdl
+            ))
+        ).label("score")
+        rows = self.db.session.query(KeywordPosting.segment_id, score).filter(
+            KeywordPosting.dataset_id.in_(dataset_ids),
+            KeywordPosting.keyword.in_(keywords),
+        ).group_by(KeywordPosting.segment_id).order_by(desc("score")).limit(k).all()
 
-        return keyword_table
+        return [(str(segment_id), float(segment_score)) for segment_id, segment_score in rows]
 
     def delete_keyword_table_from_ids(self, dataset_id: UUID, segment_ids: list[UUID]) -> None:
         """根据传递的知识库id+片段id列表删除对应关键词表中多余的数据"""
-        # 1.删除知识库关键词表里多余的数据，该操作需要上锁，避免在并发的情况下拿到错误的数据
+        if len(segment_ids) == 0:
+            return
+
+        # 1.删除知识库关键词表里多余的数据，该操作需要上锁，避免与新增操作并发执行
         cache_key = LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE.format(dataset_id=dataset_id)
         with self.redis_client.lock(cache_key, timeout=LOCK_EXPIRE_TIME):
-            # 2.获取当前知识库的关键词表
-            keyword_table_record = self.get_keyword_table_from_dataset_id(dataset_id)
-            keyword_table = keyword_table_record.keyword_table.copy()
-
-            # 3.将片段id列表转换成集合，并创建关键词集合用于清除空关键词
-            segment_ids_to_delete = set([str(segment_id) for segment_id in segment_ids])
-            keywords_to_delete = set()
+            with self.db.auto_commit():
+                # 2.删除片段对应的倒排记录，并同步扣减知识库统计信息
+                removed_count, removed_length = self._delete_postings(dataset_id, segment_ids)
+                self._update_statistic(dataset_id, -removed_count, -removed_length)
 
-            # 4.循环遍历所有关键词执行判断与更新
-            for keyword, ids in keyword_table.items():
-                ids_set = set(ids)
-                if segment_ids_to_delete.intersection(ids_set):
-                    keyword_table[keyword] = list(ids_set.difference(segment_ids_to_delete))
-                    if not keyword_table[keyword]:
-                        keywords_to_delete.add(keyword)
+    def add_keyword_table_from_ids(self, dataset_id: UUID, segment_ids: list[UUID]) -> None:
+        """根据传递的知识库id+片段id列表，在关键词表中添加关键词"""
+        # 1.根据segment_ids查找片段的关键词及内容信息
+        segments = self.db.session.query(Segment).with_entities(Segment.id, Segment.keywords, Segment.content).filter(
+            Segment.id.in_(segment_ids),
+        ).all()
 
-            # 5.检测空关键词数据并删除（关键词并没有映射任何字段id的数据）
-            for keyword in keywords_to_delete:
-                del keyword_table[keyword]
+        # 2.将片段关键词合并到关键词表中
+        self.add_keyword_table_from_segments(dataset_id, [tuple(segment) for segment in segments])
 
-            # 6.将数据更新到关键词表中
-            self.update(keyword_table_record, keyword_table=keyword_table)
+    def add_keyword_table_from_segments(self, dataset_id: UUID, segments: list[tuple[str, list[str], str]]) -> None:
+        """根据传递的知识库id+片段信息列表(segment_id, keywords, content)，批量写入关键词倒排记录"""
+        if len(segments) == 0:
+            return
 
-    def add_keyword_table_from_ids(self, dataset_id: UUID, segment_ids: list[UUID]) -> None:
-        """根据传递的知识库id+片段id列表，在关键词表中添加关键词"""
-        # 1.新增知识库关键词表里多余的数据，该操作需要上锁，避免在并发的情况下拿到错误的数据
+        # 1.新增知识库关键词表里的数据，该操作需要上锁，避免在并发的情况下写入重复数据
         cache_key = LOCK_KEYWORD_TABLE_UPDATE_KEYWORD_TABLE.format(dataset_id=dataset_id)
         with self.redis_client.lock(cache_key, timeout=LOCK_EXPIRE_TIME):
-            # 2.获取指定知识库的关键词比哦啊
-            keyword_table_record = self.get_keyword_table_from_dataset_id(dataset_id)
-            keyword_table = {
-                field: set(value) for field, value in keyword_table_record.keyword_table.items()
-            }
-
-            # 3.根据segment_ids查找片段的关键词信息
-            segments = self.db.session.query(Segment).with_entities(Segment.id, Segment.keywords).filter(
-                Segment.id.in_(segment_ids),
-            ).all()
-
-            # 4.循环将新关键词添加到关键词表中
-            for id, keywords in segments:
-                for keyword in keywords:
-                    if keyword not in keyword_table:
-                        keyword_table[keyword] = set()
-                    keyword_table[keyword].add(str(id))
-
-            # 5.更新关键词表
-            self.update(
-                keyword_table_record,
-                keyword_table={field: list(value) for field, value in keyword_table.items()}
-            )
+            with self.db.auto_commit():
+                # 2.先删除这批片段已有的倒排记录，保证重复启用/更新时不会产生重复数据
+                removed_count, removed_length = self._delete_postings(
+                    dataset_id,
+                    [segment_id for segment_id, _, _ in segments],
+                )
+
+                # 3.构建倒排记录，记录关键词在片段中的词频以及片段长度
+                postings = []
+                added_count, added_length = 0, 0
+                for segment_id, keywords, content in segments:
+                    keywords = set(keywords or [])
+                    if len(keywords) == 0:
+                        continue
+                    added_count += 1
+                    added_length += len(content)
+                    postings.extend([
+                        {
+                            "id": str(uuid.uuid4()),
+                            "dataset_id": str(dataset_id),
+                            "keyword": keyword,
+                            "segment_id": str(segment_id),
+                            "term_frequency": max(content.count(keyword), 1),
+                            "segment_length": len(content),
+                        } for keyword in keywords
+                    ])
+
+                # 4.批量插入倒排记录并增量更新知识库统计信息
+                if postings:
+                    self.db.session.execute(insert(KeywordPosting), postings)
+                self._update_statistic(dataset_id, added_count - removed_count, added_length - removed_length)
+
+    def _delete_postings(self, dataset_id: UUID, segment_ids: list[UUID]) -> tuple[int, int]:
+        """删除指定片段的倒排记录，并返回被删除的片段数与片段总长度，需在事务中调用"""
+        # 1.查询这批片段已有倒排记录对应的片段长度
+        segment_ids = [str(segment_id) for segment_id in segment_ids]
+        filters = [
+            KeywordPosting.dataset_id == str(dataset_id),
+            KeywordPosting.segment_id.in_(segment_ids),
+        ]
+        rows = self.db.session.query(
+            KeywordPosting.segment_id,
+            func.max(KeywordPosting.segment_length),
+        ).filter(*filters).group_by(KeywordPosting.segment_id).all()
+
+        # 2.删除倒排记录
+        if rows:
+            self.db.session.query(KeywordPosting).filter(*filters).delete(synchronize_session=False)
+
+        return len(rows), sum(segment_length for _, segment_length in rows)
+
+    def _update_statistic(self, dataset_id: UUID, segment_count: int, total_length: int) -> None:
+        """增量更新知识库的关键词统计信息，需在事务中调用"""
+        if segment_count == 0 and total_length == 0:
+            return
+
+        statistic = self.db.session.query(KeywordStatistic).filter(
+            KeywordStatistic.dataset_id == str(dataset_id),
+        ).one_or_none()
+        if statistic is None:
+            self.db.session.add(KeywordStatistic(
+                dataset_id=str(dataset_id),
+                segment_count=max(segment_count, 0),
+                total_length=max(total_length, 0),
+            ))
+        else:
+            self.db.session.query(KeywordStatistic).filter(
+                KeywordStatistic.id == statistic.id,
+            ).update({
+                "segment_count": KeywordStatistic.segment_count + segment_count,
+                "total_length": KeywordStatistic.total_length + total_length,
+            }, synchronize_session=False)
@@ -5,35 +5,28 @@
 #Author  :Emcikem
 @File    :openapi_service.py
 """
-import json
 from dataclasses import dataclass
 from threading import Thread
 from typing import Generator
 from uuid import UUID
 
-from flask import current_app
 from injector import inject
 from langchain_core.messages import HumanMessage
 
-from internal.core.agent.agents import FunctionCallAgent, ReACTAgent
-from internal.core.agent.entities.agent_entity import AgentConfig
-from internal.core.agent.entities.queue_entity import QueueEvent
-from internal.core.language_model.entities.model_entity import ModelFeature
+from internal.core.agent.agents import AgentStreamAggregator
 from internal.core.memory import TokenBufferMemory
 from internal.entity.app_entity import AppStatus
 from internal.entity.conversation_entity import InvokeFrom, MessageStatus
-from internal.entity.dataset_entity import RetrievalSource
 from internal.exception import NotFoundException, ForbiddenException
 from internal.model import Account, EndUser, Conversation, Message
 from internal.schema.openapi_schema import OpenAPIChatReq
 from pkg.response import Response
 from pkg.sqlalchemy import SQLAlchemy
 from .app_config_service import AppConfigService
+from .app_runtime_service import AppRuntimeService
 from .app_service import AppService
 from .base_service import BaseService
 from .conversation_service import ConversationService
-from .language_model_service import LanguageModelService
-from .retrieval_service import RetrievalService
 
 @inject
 @dataclass
@@ -41,10 +34,9 @@ class OpenAPIService(BaseService):
     """开发API服务"""
     db: SQLAlchemy
     app_service: AppService
-    retrieval_service: RetrievalService
     app_config_service: AppConfigService
     conversation_service: ConversationService
-    language_model_service: LanguageModelService
+    app_runtime_service: AppRuntimeService
 
     def chat(self, req: OpenAPIChatReq, account: Account):
         """根据传递的请求+账号信息发起聊天对话，返回数据为块内容或生成器"""
@@ -100,8 +92,12 @@ class OpenAPIService(BaseService):
             "status": MessageStatus.NORMAL,
         })
 
-        # 9.从语言模型中根据模型配置获取模型实例
-        llm = self.language_model_service.load_language_model(app_config.get("model_config", {}))
+        # 9.获取应用运行时，涵盖根据应用配置构建好的大语言模型及智能体
+        runtime = self.app_runtime_service.get_runtime(
+            app_id=UUID(app.id),
+            app_config=app_config,
+        )
+        llm = runtime.llm
 
         # 10.实例化tokenBufferMemory用于提取短期记忆
         token_buffer_memory = TokenBufferMemory(
@@ -113,105 +109,43 @@ class OpenAPIService(BaseService):
             message_limit=app_config["dialog_round"]
         )
 
-        # 11.将草稿配置中的tools转换成LangChain工具
-        tools = self.app_config_service.get_langchain_tools_by_tools_config(app_config["tools"])
-
-        # 12.检测是否关联了知识库
-        if app_config["datasets"]:
-            # 13.构建LangChain知识库检索工具
-            dataset_retrieval = self.retrieval_service.create_langchain_tool_from_search(
-                flask_app=current_app._get_current_object(),
-                dataset_ids=[dataset["id"] for dataset in app_config["datasets"]],
-                account_id=UUID(account.id),
-                retrieval_source=RetrievalSource.APP,
-                **app_config["retrieval_config"],
-            )
-            tools.append(dataset_retrieval)
-
-        # 14.检索是否关联工作流，如果关联工作流则将工作流关联成根据添加到tools中
-        if app_config["workflows"]:
-            workflow_tools = self.app_config_service.get_langchain_tools_by_workflows_ids(
-                [workflow["id"] for workflow in app_config["workflows"]]
-            )
-            tools.extend(workflow_tools)
-
-        # 15.工具LLM是否支持tool_call决定使用不同Agent
-        agent_class = FunctionCallAgent if ModelFeature.TOOL_CALL in llm.features else ReACTAgent
-        agent = agent_class(
-            llm=llm,
-            agent_config=AgentConfig(
-                user_id=UUID(account.id),
-                invoke_from=InvokeFrom.DEBUGGER,
-                preset_prompt=app_config["preset_prompt"],
-                enable_long_term_memory=app_config["long_term_memory"]["enable"],
-                tools=tools,
-                review_config=app_config["review_config"],
-            ),
-        )
-
-        # 16.定义智能体状态基础数据
+        # 11.定义智能体状态基础数据
         agent_state = {
             "messages": [llm.convert_to_human_message(req.query.data, req.image_urls.data)],
             "history": history,
             "long_term_memory": conversation.summary,
         }
 
-        # 16.根据stream类型差异执行不同的代码
+        # 12.根据stream类型差异执行不同的代码
         if req.stream.data is True:
-            agent_thoughts_dict = {}
-
             def handle_stream() -> Generator:
                 """流式事件处理器，在Python只要在函数内部使用了yield关键词，那么这个函数的返回值类型肯定是生成器"""
-                for agent_thought in agent.stream(agent_state):
-                    # 提取thought以及answer
-                    event_id = str(agent_thought.id)
-
-                    # 将数据填充到agent_thought，便于存储到数据库服务中
-                    if agent_thought.event != QueueEvent.PING:
-                        # 19.除了agent_message数据为叠加，其他均为覆盖
-                        if agent_thought.event == QueueEvent.AGENT_MESSAGE:
-                            if event_id not in agent_thoughts_dict:
-                                # 初始化智能体消息事件
-                                agent_thoughts_dict[event_id] = agent_thought
-                            else:
-                                # 叠加智能体消息
-                                agent_thoughts_dict[event_id] = agent_thoughts_dict[event_id].model_copy(update={
-                                    "thought": agent_thoughts_dict[event_id]["thought"] + agent_thought.thought,
-                                    "answer": agent_thoughts_dict[event_id]["answer"] + agent_thought.answer,
-                                    "latency": agent_thought.latency,
-                                })
-                        else:
-                            # 处理其他类型事件的消息
-                            agent_thoughts_dict[event_id] = agent_thought
-
-                    data = {
-                        **agent_thought.model_dump(include={
-                            "event", "thought", "observation", "tool", "tool_input", "answer", "latency",
-                        }),
-                        "id": event_id,
-                        "end_user_id": end_user.id,
-                        "conversation_id": str(conversation.id),
-                        "message_id": str(message.id),
-                        "task_id": str(agent_thought.task_id),
-                    }
-                    yield f"event: {agent_thought.event}\ndata:{json.dumps(data)}\n\n"
-
-                # 22.将消息以及推理过程添加到数据库
-                self.conversation_service.save_agent_thoughts(
+                # 使用聚合器聚合智能体事件并输出SSE数据帧
+                aggregator = AgentStreamAggregator()
+                yield from aggregator.aggregate(
+                    runtime.agent.stream(agent_state, user_id=UUID(account.id), invoke_from=InvokeFrom.DEBUGGER),
+                    {"event", "thought", "observation", "tool", "tool_input", "answer", "latency"},
+                    end_user_id=end_user.id,
+                    conversation_id=str(conversation.id),
+                    message_id=str(message.id),
+                )
+
+                # 将消息以及推理过程添加到数据库
+                self.conversation_service.dispatch_save_agent_thoughts(
                     account_id=UUID(account.id),
                     app_id=UUID(app.id),
                     app_config=app_config,
                     conversation_id=UUID(conversation.id),
                     message_id=message.id,
-                    agent_thoughts=[agent_thought for agent_thought in agent_thoughts_dict.values()],
+                    agent_thoughts=aggregator.agent_thoughts,
                 )
 
             return handle_stream()
 
-        # 17.块内容输出
-        agent_result = agent.invoke(agent_state)
+        # 13.块内容输出
+        agent_result = runtime.agent.invoke(agent_state, user_id=UUID(account.id), invoke_from=InvokeFrom.DEBUGGER)
 
-        # 18.将消息以及推理过程添加到数据库
+        # 14.将消息以及推理过程添加到数据库
         self.conversation_service.save_agent_thoughts(
             account_id=UUID(account.id),
             app_id=UUID(app.id),
@@ -12,6 +12,9 @@ from typing import Callable
 from injector import inject
 from langchain_text_splitters import TextSplitter, RecursiveCharacterTextSplitter
 
+from internal.core.text_splitter import TokenOffsetTextSplitter
+from internal.core.token_counter import TokenCounter
+from internal.entity.dataset_entity import TextSplitterType
 from internal.model import ProcessRule
 
 @inject
@@ -26,7 +29,17 @@ class ProcessRuleService:
             length_function: Callable[[str], int],
             **kwargs
     ) -> TextSplitter:
-        """根据传递的处理规则+长度计算函数，获取相应的文本分割器"""
+        """根据传递的处理规则+长度计算函数，获取相应的文本分割器，segment.splitter为token时使用基于token偏移量的分割器"""
+        if process_rule.rule["segment"].get("splitter") == TextSplitterType.TOKEN:
+            return TokenOffsetTextSplitter(
+                token_counter=TokenCounter(),
+                chunk_size=process_rule.rule["segment"]["chunk_size"],
+                chunk_overlap=process_rule.rule["segment"]["chunk_overlap"],
+                separators=process_rule.rule["segment"]["separators"],
+                is_separator_regex=True,
+                **kwargs
+            )
+
         return RecursiveCharacterTextSplitter(
             chunk_size=process_rule.rule["segment"]["chunk_size"],
             chunk_overlap=process_rule.rule["segment"]["chunk_overlap"],
@@ -0,0 +1,145 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 19:20
+#Author  :Emcikem
+@File    :retrieval_record_service.py
+"""
+import json
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from injector import inject
+from redis import Redis
+from sqlalchemy import insert
+
+from internal.entity.cache_entity import (
+    RETRIEVAL_RECORD_QUEUE,
+    RETRIEVAL_RECORD_DEAD_LETTER_QUEUE,
+    RETRIEVAL_RECORD_MAX_ATTEMPTS,
+)
+from internal.model import Dataset, Document, DatasetQuery, Segment
+from pkg.sqlalchemy import SQLAlchemy
+from .dataset_counter_service import DatasetCounterService
+
+
+@inject
+@dataclass
+class RetrievalRecordService:
+    """检索记录服务，检索时只向Redis列表追加一条记录，知识库查询记录及片段命中次数由定时任务聚合后批量写入数据库"""
+    db: SQLAlchemy
+    redis_client: Redis
+    dataset_counter_service: DatasetCounterService
+
+    def record(
+            self,
+            dataset_ids: list[str],
+            segment_ids: list[str],
+            query: str,
+            source: str,
+            source_app_id: Optional[UUID],
+            account_id: UUID,
+    ) -> None:
+        """追加一条检索记录，dataset_ids为命中片段所属的知识库(去重)，segment_ids为命中的片段，缓存异常时只记录日志，不影响检索"""
+        try:
+            self.redis_client.rpush(RETRIEVAL_RECORD_QUEUE, json.dumps({
+                "dataset_ids": dataset_ids,
+                "segment_ids": segment_ids,
+                "query": query,
+                "source": source,
+                "source_app_id": str(source_app_id) if source_app_id else None,
+                "created_by": str(account_id),
+                "created_at": time.time(),
+            }))
+        except Exception as e:
+            print(f"追加检索记录失败，错误信息:{str(e)}")
+
+    def flush(self, batch_size: int = 1000) -> int:
+        """从队列头部批量取出检索记录并写入数据库，直到队列为空，返回写入的记录数"""
+        total = 0
+        while True:
+            # 1.在同一个事务中读取并截断队列，避免多个任务重复消费
+            pipeline = self.redis_client.pipeline()
+            pipeline.lrange(RETRIEVAL_RECORD_QUEUE, 0, batch_size - 1)
+            pipeline.ltrim(RETRIEVAL_RECORD_QUEUE, batch_size, -1)
+            items, _ = pipeline.execute()
+            if not items:
+                return total
+
+            # 2.写入失败时将记录放回队列，等待下一次执行
+            try:
+                self._save([json.loads(item) for item in items])
+            except Exception as e:
+                self._requeue(items)
+                raise e
+
+            total += len(items)
+            if len(items) < batch_size:
+                return total
+
+    def _requeue(self, items: list[bytes]) -> None:
+        """累加写入失败的检索记录的尝试次数并放回队列头部，无法解析或尝试次数达到上限的记录移入死信队列"""
+        # 1.累加每条记录的尝试次数并区分重试记录及死信记录
+        retry_items, dead_items = [], []
+        for item in items:
+            try:
+                record = json.loads(item)
+                record["attempts"] = record.get("attempts", 0) + 1
+            except Exception:
+                dead_items.append(item)
+                continue
+            if record["attempts"] >= RETRIEVAL_RECORD_MAX_ATTEMPTS:
+                dead_items.append(json.dumps(record))
+            else:
+                retry_items.append(json.dumps(record))
+
+        # 2.重试记录按原顺序放回队列头部，死信记录追加到死信队列
+        pipeline = self.redis_client.pipeline()
+        if retry_items:
+            pipeline.lpush(RETRIEVAL_RECORD_QUEUE, *reversed(retry_items))
+        if dead_items:
+            pipeline.rpush(RETRIEVAL_RECORD_DEAD_LETTER_QUEUE, *dead_items)
+            print(f"检索记录落库失败次数达到上限，移入死信队列，记录数: {len(dead_items)}")
+        pipeline.execute()
+
+    def _save(self, records: list[dict]) -> None:
+        """聚合检索记录，使用一条批量插入语句写入查询记录，片段、文档、知识库的命中次数各使用一条批量更新语句累加"""
+        # 1.每条检索记录为每个命中的知识库生成一条查询记录
+        dataset_queries = []
+        for record in records:
+            created_at = datetime.fromtimestamp(record["created_at"])
+            for dataset_id in record["dataset_ids"]:
+                dataset_queries.append({
+                    "id": str(uuid.uuid4()),
+                    "dataset_id": dataset_id,
+                    "query": record["query"],
+                    "source": record["source"],
+                    "source_app_id": record["source_app_id"],
+                    "created_by": record["created_by"],
+                    "updated_at": created_at,
+                    "created_at": created_at,
+                })
+
+        # 2.按片段聚合命中次数，并查询片段所属的文档及知识库，汇总两者的命中次数增量
+        hit_counts = Counter(segment_id for record in records for segment_id in record["segment_ids"])
+        document_hit_counts = defaultdict(int)
+        dataset_hit_counts = defaultdict(int)
+        if hit_counts:
+            for segment_id, document_id, dataset_id in self.db.session.query(
+                    Segment.id, Segment.document_id, Segment.dataset_id,
+            ).filter(Segment.id.in_(list(hit_counts.keys()))).all():
+                document_hit_counts[document_id] += hit_counts[segment_id]
+                dataset_hit_counts[dataset_id] += hit_counts[segment_id]
+
+        # 3.在同一个事务中批量写入
+        with self.db.auto_commit():
+            if dataset_queries:
+                self.db.session.execute(insert(DatasetQuery), dataset_queries)
+            self.dataset_counter_service.bulk_incr_counter(Segment, "hit_count", hit_counts)
+            self.dataset_counter_service.bulk_incr_counter(Document, "hit_count", document_hit_counts)
+            self.dataset_counter_service.bulk_incr_counter(Dataset, "hit_count", dataset_hit_counts)
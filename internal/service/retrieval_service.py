@@ -5,25 +5,32 @@
 #Author  :Emcikem
 @File    :retrieval_service.py
 """
+import json
 from dataclasses import dataclass
+from typing import Optional
 from uuid import UUID
 
 from flask import Flask
 from injector import inject
-from langchain.retrievers import EnsembleRetriever
 from langchain_core.documents import Document as LCDocument
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import BaseTool, tool
 from pydantic import BaseModel, Field
-from sqlalchemy import update
+from redis import Redis
 
 from internal.core.agent.entities.agent_entity import DATASET_RETRIEVAL_TOOL_NAME
+from internal.entity.cache_entity import CACHE_RETRIEVAL_RESULT, RETRIEVAL_RESULT_CACHE_EXPIRE_TIME
 from internal.entity.dataset_entity import RetrievalStrategy, RetrievalSource
 from internal.exception import NotFoundException
-from internal.lib.helper import combine_documents
-from internal.model import Dataset, DatasetQuery, Segment
+from internal.lib.helper import combine_documents, generate_text_hash
+from internal.model import Dataset
 from pkg.sqlalchemy import SQLAlchemy
 from .base_service import BaseService
+from .dataset_version_service import DatasetVersionService
+from .embeddings_service import EmbeddingsService
 from .jieba_service import JiebaService
+from .keyword_table_service import KeywordTableService
+from .retrieval_record_service import RetrievalRecordService
 from .vector_database_service import VectorDatabaseService
 
 @inject
@@ -33,6 +40,11 @@ class RetrievalService(BaseService):
     db: SQLAlchemy
     vector_database_service: VectorDatabaseService
     jieba_service: JiebaService
+    keyword_table_service: KeywordTableService
+    embeddings_service: EmbeddingsService
+    dataset_version_service: DatasetVersionService
+    retrieval_record_service: RetrievalRecordService
+    redis_client: Redis
 
     def search_in_datasets(
             self,
@@ -44,7 +56,7 @@ class RetrievalService(BaseService):
             score: float = 0,
             retrieval_source: str = RetrievalSource.HIT_TESTING,
     ) -> list[LCDocument]:
-        """根据传递的query+知识库列表执行检索，并返回检索的文档+得分数据（如果检索策略为全文检索，则得分为0）"""
+        """根据传递的query+知识库列表执行检索，并返回检索的文档+得分数据（全文检索的得分为BM25得分）"""
         # 1.提取知识库列表并校验权限同时更新知识库id
         datasets = self.db.session.query(Dataset).filter(
             Dataset.id.in_([str(dataset_id) for dataset_id in dataset_ids]),
@@ -55,85 +67,149 @@ class RetrievalService(BaseService):
 
         dataset_ids = [dataset.id for dataset in datasets]
 
-        # 2.构建不同种类的检索器
-        from internal.core.retrievers import SemanticRetriever, FullTextRetriever
-        semantic_retriever = SemanticRetriever(
-            dataset_ids=dataset_ids,
-            vector_store=self.vector_database_service.vector_store,
-            search_kwargs={
-                "k": k,
-                "score_threshold": score,
-            },
-        )
+        # 2.读取二级检索结果缓存，缓存键包含各知识库的版本号，知识库数据变更后旧缓存自动失效，无法获取版本号时跳过缓存
+        cache_key = self._get_result_cache_key(dataset_ids, query, retrieval_strategy, k, score)
+        lc_documents = self._get_cached_results(cache_key) if cache_key is not None else None
+
+        # 3.缓存未命中时执行检索并写入缓存
+        if lc_documents is None:
+            lc_documents = self._search(dataset_ids, query, retrieval_strategy, k, score)
+            if cache_key is not None:
+                self._set_cached_results(cache_key, lc_documents)
+
+        # 4.记录知识库查询记录(一个知识库如果检索了多篇文档，也只存储一条)及片段命中次数，由定时任务批量落库
+        if lc_documents:
+            self.retrieval_record_service.record(
+                dataset_ids=list(set(str(lc_document.metadata["dataset_id"]) for lc_document in lc_documents)),
+                segment_ids=[str(lc_document.metadata["segment_id"]) for lc_document in lc_documents],
+                query=query,
+                source=retrieval_source,
+                # todo: 等到app配置模块完成后进行调整
+                source_app_id=None,
+                account_id=account_id,
+            )
+
+        return lc_documents
+
+    def _search(
+            self,
+            dataset_ids: list[str],
+            query: str,
+            retrieval_strategy: str,
+            k: int,
+            score: float,
+    ) -> list[LCDocument]:
+        """根据传递的知识库id列表+检索策略执行检索，只构建当前检索策略需要的检索器"""
+        from internal.core.retrievers import SemanticRetriever, FullTextRetriever, HybridRetriever
+
+        # 1.构建相似性检索器，query向量在检索器内部计算，混合检索时与全文检索并行执行
+        semantic_retriever = None
+        if retrieval_strategy != RetrievalStrategy.FULL_TEXT:
+            semantic_retriever = SemanticRetriever(
+                dataset_ids=dataset_ids,
+                vector_database_service=self.vector_database_service,
+                embeddings_service=self.embeddings_service,
+                search_kwargs={
+                    "k": k,
+                    "score_threshold": score,
+                },
+            )
+            if retrieval_strategy == RetrievalStrategy.SEMANTIC:
+                return semantic_retriever.invoke(query)[:k]
+
+        # 2.构建全文检索器
         full_text_retriever = FullTextRetriever(
             db=self.db,
             dataset_ids=dataset_ids,
             jieba_service=self.jieba_service,
+            keyword_table_service=self.keyword_table_service,
             search_kwargs={
                 "k": k,
             }
         )
-        hybrid_retriever = EnsembleRetriever(
-            retrievers=[semantic_retriever, full_text_retriever],
-            weights=[0.5, 0.5]
+        if retrieval_strategy == RetrievalStrategy.FULL_TEXT:
+            return full_text_retriever.invoke(query)[:k]
+
+        # 3.混合检索并行执行两路检索并融合结果，同时记录各阶段耗时
+        hybrid_retriever = HybridRetriever(
+            semantic_retriever=semantic_retriever,
+            full_text_retriever=full_text_retriever,
+            k=k,
         )
 
-        # 3.根据不同的检索策略执行检索
-        if retrieval_strategy == RetrievalStrategy.SEMANTIC:
-            lc_documents = semantic_retriever.invoke(query)[:k]
-        elif retrieval_strategy == RetrievalStrategy.FULL_TEXT:
-            lc_documents = full_text_retriever.invoke(query)[:k]
-        else:
-            lc_documents = hybrid_retriever.invoke(query)[:k]
-
-        # 4.添加知识库查询记录(只存储唯一记录，也就是一个知识库如果检索了多篇文档，也只存储一条)
-        unique_dataset_ids = list(set(str(lc_document.metadata['dataset_id']) for lc_document in lc_documents))
-        for dataset_id in unique_dataset_ids:
-            self.create(
-                DatasetQuery,
-                dataset_id=dataset_id,
-                query=query,
-                source=retrieval_source,
-                # todo: 等到app配置模块完成后进行调整
-                source_app_id=None,
-                created_by=account_id,
-            )
+        return hybrid_retriever.invoke(query)
 
-        # 5. 批量更新片段的命中次数，召回次数，涵盖构建+执行语句
-        with self.db.auto_commit():
-            stmt = (
-                update(Segment)
-                .where(Segment.id.in_([lc_document.metadata["segment_id"] for lc_document in lc_documents]))
-                .values(hit_count=Segment.hit_count + 1)
-            )
-            self.db.session.execute(stmt)
+    def _get_result_cache_key(
+            self,
+            dataset_ids: list[str],
+            query: str,
+            retrieval_strategy: str,
+            k: int,
+            score: float,
+    ) -> Optional[str]:
+        """根据知识库id及版本号、检索策略、k、score、归一化后的query计算检索结果缓存键，无法获取版本号时返回None"""
+        versions = self.dataset_version_service.get_versions(dataset_ids)
+        if versions is None:
+            return None
+        cache_source = json.dumps({
+            "datasets": sorted(versions.items()),
+            "retrieval_strategy": str(retrieval_strategy),
+            "k": k,
+            "score": score,
+            "query": " ".join(query.split()),
+        }, ensure_ascii=False)
+        return CACHE_RETRIEVAL_RESULT.format(cache_hash=generate_text_hash(cache_source))
 
-        return lc_documents
+    def _get_cached_results(self, cache_key: str) -> Optional[list[LCDocument]]:
+        """读取检索结果缓存，缓存不存在或读取异常时返回None"""
+        try:
+            cache_result = self.redis_client.get(cache_key)
+            if cache_result is None:
+                return None
+            return [LCDocument(**document) for document in json.loads(cache_result)]
+        except Exception as e:
+            print(f"读取检索结果缓存失败，错误信息:{str(e)}")
+            return None
+
+    def _set_cached_results(self, cache_key: str, lc_documents: list[LCDocument]) -> None:
+        """写入检索结果缓存"""
+        try:
+            self.redis_client.setex(
+                cache_key,
+                RETRIEVAL_RESULT_CACHE_EXPIRE_TIME,
+                json.dumps([
+                    {"page_content": lc_document.page_content, "metadata": lc_document.metadata}
+                    for lc_document in lc_documents
+                ], default=str, ensure_ascii=False),
+            )
+        except Exception as e:
+            print(f"写入检索结果缓存失败，错误信息:{str(e)}")
 
     def create_langchain_tool_from_search(
             self,
             flask_app: Flask,
             dataset_ids: list[UUID],
-            account_id: UUID,
+            account_id: Optional[UUID] = None,
             retrieval_strategy: str = RetrievalStrategy.SEMANTIC,
             k: int = 4,
             score: float = 0,
             retrieval_source: str = RetrievalSource.HIT_TESTING,
     ) -> BaseTool:
-        """根据传递的参数构建一个LangChain知识库搜索工具"""
+        """根据传递的参数构建一个LangChain知识库搜索工具，未传递account_id时使用调用工具时config中的user_id，
+        便于同一个工具在多个用户的请求间复用"""
         class DatasetRetrievalInput(BaseModel):
             """知识库检索工具输入结构"""
             query: str = Field(description="知识库搜索query语句，类型为字符串")
 
         @tool(DATASET_RETRIEVAL_TOOL_NAME, args_schema=DatasetRetrievalInput)
-        def dataset_retrieval(query: str) -> str:
+        def dataset_retrieval(query: str, config: RunnableConfig) -> str:
             """如果需要搜索扩展的知识库内容，当你觉得用户的提问超过你的知识范围时，可以尝试调用该工具，输入为搜索query语句，返回数据为检索内容字符串"""
             # 1.调用search_in_datasets检索得到LangChain文档列表
             with flask_app.app_context():
                 documents = self.search_in_datasets(
                     dataset_ids=dataset_ids,
                     query=query,
-                    account_id=account_id,
+                    account_id=account_id or config.get("configurable", {}).get("user_id"),
                     retrieval_strategy=retrieval_strategy,
                     k=k,
                     score=score,
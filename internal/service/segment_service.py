@@ -15,6 +15,7 @@ from langchain_core.documents import Document as LCDocument
 from redis import Redis
 from sqlalchemy import asc, func
 
+from internal.core.token_counter import TokenCounter
 from internal.entity.cache_entity import LOCK_EXPIRE_TIME, LOCK_SEGMENT_UPDATE_ENABLED
 from internal.entity.dataset_entity import DocumentStatus, SegmentStatus
 from internal.exception import NotFoundException, FailException, ValidateErrorException
@@ -28,6 +29,8 @@ from internal.schema.segment_schema import (
 from pkg.paginator import Paginator
 from pkg.sqlalchemy import SQLAlchemy
 from .base_service import BaseService
+from .dataset_counter_service import DatasetCounterService
+from .dataset_version_service import DatasetVersionService
 from .embeddings_service import EmbeddingsService
 from .jieba_service import JiebaService
 from .keyword_table_service import KeywordTableService
@@ -44,6 +47,9 @@ class SegmentService(BaseService):
     vector_database_service: VectorDatabaseService
     jieba_service: JiebaService
     embeddings_service: EmbeddingsService
+    dataset_version_service: DatasetVersionService
+    dataset_counter_service: DatasetCounterService
+    token_counter: TokenCounter
 
     def create_segment(
             self,
@@ -54,7 +60,7 @@ class SegmentService(BaseService):
     ) -> Segment:
         """根据传递的信息新增文档片段信息"""
         # 1.校验上传内容的token长度总数，不能超过1000
-        token_count = self.embeddings_service.calculate_token_count(req.content.data)
+        token_count = self.token_counter.count(req.content.data)
         if token_count > 1000:
             raise ValidateErrorException("片段内容的长度不能超过1000 token")
 
@@ -104,40 +110,34 @@ class SegmentService(BaseService):
                 status=SegmentStatus.COMPLETED,
             )
 
-            # 8.往向量数据库中新增数据
-            self.vector_database_service.vector_store.add_documents(
+            # 8.通过向量缓存计算片段向量，并往向量数据库中新增数据
+            self.vector_database_service.add_documents(
                 [LCDocument(
                     page_content=req.content.data,
                     metadata={
-                        "account_id": document.account_id,
-                        "dataset_id": document.dataset_id,
-                        "document_id": document_id,
-                        "segment_id": segment.id,
-                        "node_id": segment.node_id,
+                        "account_id": str(document.account_id),
+                        "dataset_id": str(document.dataset_id),
+                        "document_id": str(document_id),
+                        "segment_id": str(segment.id),
+                        "node_id": str(segment.node_id),
                         "document_enabled": document.enabled,
                         "segment_enabled": True,
                     }
                 )],
-                ids=[segment.node_id]
+                self.embeddings_service.embed_batch([req.content.data], [segment.hash]),
+                [str(segment.node_id)],
             )
 
-            # 9.重新计算片段的字符串总数以及token总数
-            document_character_count, document_token_count = self.db.session.query(
-                func.coalesce(func.sum(Segment.character_count), 0),
-                func.coalesce(func.sum(Segment.token_count), 0)
-            ).filter(Segment.document_id == document.id).first()
-
-            # 10.更新文档的对应信息
-            self.update(
-                document,
-                character_count=document_character_count,
-                token_count=document_token_count,
-            )
+            # 9.重新计算文档的字符串总数以及token总数，并累加文档的片段数
+            self._update_document_statistics(document, segment_count=1)
 
             # 11.更新关键词表信息
             if document.enabled is True:
                 self.keyword_table_service.add_keyword_table_from_ids(dataset_id, [segment.id])
 
+            # 12.递增知识库版本号淘汰检索缓存
+            self.dataset_version_service.bump_versions([dataset_id])
+
             return segment
         except Exception as e:
             if segment:
@@ -190,7 +190,7 @@ class SegmentService(BaseService):
                 content=req.content.data,
                 hash=new_hash,
                 character_count=len(req.content.data),
-                token_count=self.embeddings_service.calculate_token_count(req.content.data),
+                token_count=self.token_counter.count(req.content.data),
             )
 
             # 7.更新片段归属关键词信息
@@ -200,29 +200,19 @@ class SegmentService(BaseService):
             # 8.检测是否需要更新文档信息以及向量数据库
             if required_update:
                 # 7.更新文档信息，涵盖字符总数、token总次数
-                document = segment.document
-                document_character_count, document_token_count = self.db.session.query(
-                    func.coalesce(func.sum(Segment.character_count), 0),
-                    func.coalesce(func.sum(Segment.token_count), 0)
-                ).filter(Segment.document_id == document.id).first()
-
-                # 7.更新文档的对应信息
-                self.update(
-                    document,
-                    character_count=document_character_count,
-                    token_count=document_token_count,
-                )
+                self._update_document_statistics(segment.document)
 
                 # 8.更新向量数据库对应记录
-                self.vector_database_service.collection.data.update(
-                    uuid=segment.node_id,
-                    properties={
-                        "text": req.content.data,
-                    },
-                    vector=self.embeddings_service.embeddings.embed_query(req.content.data)
+                self.vector_database_service.update_document(
+                    dataset_id,
+                    segment.node_id,
+                    req.content.data,
+                    self.embeddings_service.embed_batch([req.content.data], [new_hash])[0],
                 )
         except Exception as e:
             raise FailException("更新片段记录失败，请稍后重试")
+        finally:
+            self.dataset_version_service.bump_versions([dataset_id])
 
         return segment
 
@@ -324,11 +314,15 @@ class SegmentService(BaseService):
                 else:
                     self.keyword_table_service.delete_keyword_table_from_ids(dataset_id, [segment_id])
 
-                # 8.同步处理weaviate数据
-                self.vector_database_service.collection.data.update(
-                    uuid=segment.node_id,
-                    properties={"segment_enabled": enabled},
+                # 8.同步处理向量数据库数据，更新失败时抛出错误进入异常处理
+                errors = self.vector_database_service.update_properties(
+                    dataset_id, [segment.node_id], {"segment_enabled": enabled},
                 )
+                if errors:
+                    raise Exception(errors.get(segment.node_id) or next(iter(errors.values())))
+
+                # 9.递增知识库版本号淘汰检索缓存
+                self.dataset_version_service.bump_versions([dataset_id])
                 return segment
             except Exception as e:
                 self.update(
@@ -372,21 +366,35 @@ class SegmentService(BaseService):
 
         # 5.同步删除向量数据库存储的记录
         try:
-            self.vector_database_service.collection.data.delete_by(segment.node_id)
+            self.vector_database_service.delete_by_node_ids(dataset_id, [segment.node_id])
         except Exception as e:
             print("")
+        self.dataset_version_service.bump_versions([dataset_id])
 
-        # 6.更新文档信息，涵盖字符串总数、token总次数
-        document_character_count, document_token_count = self.db.session.query(
+        # 6.更新文档信息，涵盖字符串总数、token总次数，并扣减片段数及该片段的命中次数
+        self._update_document_statistics(document, segment_count=-1, hit_count=-segment.hit_count)
+
+        return segment
+
+    def _update_document_statistics(self, document: Document, segment_count: int = 0, hit_count: int = 0) -> None:
+        """重新计算文档的字符总数与token总数，并在同一个事务中增量更新文档及知识库的计数字段"""
+        # 1.根据文档下的片段汇总字符总数与token总数
+        character_count, token_count = self.db.session.query(
             func.coalesce(func.sum(Segment.character_count), 0),
             func.coalesce(func.sum(Segment.token_count), 0)
         ).filter(Segment.document_id == document.id).first()
 
-        # 7.更新文档的对应信息
-        self.update(
-            document,
-            character_count=document_character_count,
-            token_count=document_token_count,
-        )
-
-        return segment
+        # 2.知识库的字符总数按文档字符数的变化量更新
+        with self.db.auto_commit():
+            self.dataset_counter_service.incr_document_counters(
+                document.id,
+                segment_count=segment_count,
+                hit_count=hit_count,
+            )
+            self.dataset_counter_service.incr_dataset_counters(
+                document.dataset_id,
+                character_count=character_count - document.character_count,
+                hit_count=hit_count,
+            )
+            document.character_count = character_count
+            document.token_count = token_count
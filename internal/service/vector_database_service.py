@@ -6,53 +6,88 @@
 @File    :vector_database_service.py
 """
 import os
+from typing import Any
+from uuid import UUID
 
-import weaviate
 from injector import inject
+from langchain_core.documents import Document as LCDocument
 from langchain_core.vectorstores import VectorStoreRetriever
-from langchain_weaviate import WeaviateVectorStore
-from weaviate import WeaviateClient
-from weaviate.auth import Auth, AuthApiKey
-from weaviate.collections import Collection
 
+from internal.core.vector_database import BaseVectorDatabase, FaissVectorDatabase, WeaviateVectorDatabase
+from internal.entity.dataset_entity import VectorDatabaseType
 from .embeddings_service import EmbeddingsService
 
-# 向量数据库的集合名字
-COLLECTION_NAME = "Dataset"
-
 
 @inject
 class VectorDatabaseService:
-    """向量数据库服务"""
-    client: WeaviateClient
-    vector_store: WeaviateVectorStore
+    """向量数据库服务，根据VECTOR_DATABASE_TYPE选择weaviate或本地faiss后端"""
+    vector_database: BaseVectorDatabase
     embeddings_service: EmbeddingsService
 
     def __init__(self, embeddings_services: EmbeddingsService):
-        """构造函数，完成向量数据库服务的客户端+LangChain向量数据库实例的创建"""
+        """构造函数，完成向量数据库后端的创建"""
         # 1.赋值embeddings_service
         self.embeddings_service = embeddings_services
 
-        # 2.创建/连接weaviate向量数据库
-        # todo: 打开
-        # self.client = weaviate.connect_to_weaviate_cloud(
-        #     cluster_url=os.getenv("WEAVIATE_URL"),
-        #     auth_credentials=AuthApiKey(os.getenv("WEAVIATE_API_KEY")),
-        # )
-
-        # 3.创建LangChain向量数据库
-        # todo:打开
-        # self.vector_store = WeaviateVectorStore(
-        #     client=self.client,
-        #     index_name=COLLECTION_NAME,
-        #     text_key="text",
-        #     embedding=self.embeddings_service.embeddings,
-        # )
+        # 2.根据配置创建向量数据库后端
+        vector_database_type = os.getenv("VECTOR_DATABASE_TYPE", VectorDatabaseType.WEAVIATE)
+        if vector_database_type == VectorDatabaseType.FAISS:
+            self.vector_database = FaissVectorDatabase.get_instance(
+                path=os.getenv("FAISS_VECTOR_STORE_PATH", os.path.join("storage", "vector_store", "faiss")),
+                hnsw_m=int(os.getenv("FAISS_HNSW_M", 32)),
+                ef_construction=int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", 64)),
+                ef_search=int(os.getenv("FAISS_HNSW_EF_SEARCH", 64)),
+                compact_threshold=float(os.getenv("FAISS_COMPACT_THRESHOLD", 0.2)),
+                flush_interval=float(os.getenv("FAISS_FLUSH_INTERVAL", 30)),
+            )
+        else:
+            self.vector_database = WeaviateVectorDatabase(self.embeddings_service.embeddings)
 
-    def get_retriever(self) -> VectorStoreRetriever:
-        """获取检索器"""
-        return self.vector_store.as_retriever()
+    def add_documents(
+            self,
+            lc_documents: list[LCDocument],
+            vectors: list[list[float]],
+            ids: list[str],
+    ) -> None:
+        """将已经计算好向量的LangChain文档批量写入向量数据库，避免向量数据库内部再次计算向量"""
+        self.vector_database.add_documents(lc_documents, vectors, ids)
+
+    def update_properties(self, dataset_id: UUID, node_ids: list[str], properties: dict[str, Any]) -> dict[str, str]:
+        """批量更新节点的元数据属性，返回更新失败的node_id及错误信息"""
+        return self.vector_database.update_properties(
+            str(dataset_id), [str(node_id) for node_id in node_ids], properties,
+        )
+
+    def update_document(self, dataset_id: UUID, node_id: str, text: str, vector: list[float]) -> None:
+        """更新节点的文本内容及向量"""
+        self.vector_database.update_document(str(dataset_id), str(node_id), text, vector)
+
+    def delete_by_node_ids(self, dataset_id: UUID, node_ids: list[str]) -> None:
+        """根据node_id列表删除记录"""
+        self.vector_database.delete_by_node_ids(str(dataset_id), [str(node_id) for node_id in node_ids])
 
-    @property
-    def collection(self) -> Collection:
-        return self.client.collections.get(COLLECTION_NAME)
+    def delete_by_document_id(self, dataset_id: UUID, document_id: UUID) -> None:
+        """删除文档下的所有记录"""
+        self.vector_database.delete_by_document_id(str(dataset_id), str(document_id))
+
+    def delete_by_dataset_id(self, dataset_id: UUID) -> None:
+        """删除知识库下的所有记录"""
+        self.vector_database.delete_by_dataset_id(str(dataset_id))
+
+    def similarity_search(
+            self,
+            dataset_ids: list[UUID],
+            vector: list[float],
+            k: int = 4,
+            score_threshold: float = 0,
+    ) -> list[tuple[LCDocument, float]]:
+        """在知识库中执行向量检索，仅返回文档与片段均已启用的记录"""
+        return self.vector_database.similarity_search(
+            [str(dataset_id) for dataset_id in dataset_ids], vector, k, score_threshold,
+        )
+
+    def get_retriever(self) -> VectorStoreRetriever:
+        """获取检索器，仅weaviate后端支持"""
+        if not isinstance(self.vector_database, WeaviateVectorDatabase):
+            raise Exception("当前向量数据库后端不支持LangChain检索器")
+        return self.vector_database.vector_store.as_retriever()
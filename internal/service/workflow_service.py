@@ -36,6 +36,7 @@ from internal.core.workflow.nodes import (
 )
 from internal.model.workflow import Workflow, WorkflowResult
 from internal.schema.workflow_schema import CreateWorkflowReq, GetWorkflowsWithPageReq
+from .app_reference_version_service import AppReferenceVersionService
 from .base_service import BaseService
 from pkg.paginator import Paginator
 from pkg.sqlalchemy import SQLAlchemy
@@ -48,6 +49,7 @@ class WorkflowService(BaseService):
     """工作流服务"""
     db: SQLAlchemy
     builtin_provider_manager: BuiltinProviderManager
+    app_reference_version_service: AppReferenceVersionService
 
     def create_workflow(self, req: CreateWorkflowReq, account: Account) -> Workflow:
         """根据传递的请求信息创建工作流"""
@@ -88,9 +90,15 @@ class WorkflowService(BaseService):
         # 1.获取工作流基础信息并校验权限
         workflow = self.get_workflow(workflow_id, account)
 
-        # 2.删除工作流
+        # 2.在删除前查询引用了该工作流的应用
+        app_ids = self.app_reference_version_service.get_workflow_app_ids(workflow_id)
+
+        # 3.删除工作流
         self.delete(workflow)
 
+        # 4.递增工作流的引用资源版本号及引用了该工作流的应用配置版本号，淘汰对应的应用运行时及配置快照
+        self.app_reference_version_service.bump_version(workflow_id, app_ids)
+
         return workflow
 
     def update_workflow(self, workflow_id: UUID, account: Account, **kwargs) -> Workflow:
@@ -110,6 +118,12 @@ class WorkflowService(BaseService):
         # 3.更新工作流基础信息
         self.update(workflow, **kwargs)
 
+        # 4.递增工作流的引用资源版本号及引用了该工作流的应用配置版本号，工作流名称、描述变化会影响工作流工具
+        self.app_reference_version_service.bump_version(
+            workflow.id,
+            self.app_reference_version_service.get_workflow_app_ids(workflow.id),
+        )
+
         return workflow
 
     def get_workflows_with_page(
@@ -378,14 +392,16 @@ class WorkflowService(BaseService):
         # 1.根据传递的id获取工作流并校验权限
         workflow = self.get_workflow(workflow_id, account)
 
-        # 2.创建工作流工具
-        workflow_tool = WorkflowTool(workflow_config=WorkflowConfig(
+        # 2.创建工作流工具，草稿图配置及其引用资源的版本号未变化时复用编译后的图程序
+        workflow_tool = WorkflowTool.from_graph(
             account_id=UUID(account.id),
             name=workflow.tool_call_name,
             description=workflow.description,
-            nodes=workflow.draft_graph.get("nodes", []),
-            edges=workflow.draft_graph.get("edges", []),
-        ))
+            graph=workflow.draft_graph,
+            reference_versions=self.app_reference_version_service.get_versions(
+                WorkflowTool.get_reference_ids(workflow.draft_graph),
+            ),
+        )
 
         def handler_stream() -> Generator:
             # 3.定义变量存储所有节点运行结果
@@ -472,6 +488,12 @@ class WorkflowService(BaseService):
             "is_debug_passed": False,
         })
 
+        # 5.递增工作流的引用资源版本号及引用了该工作流的应用配置版本号，淘汰对应的应用运行时及配置快照
+        self.app_reference_version_service.bump_version(
+            workflow.id,
+            self.app_reference_version_service.get_workflow_app_ids(workflow.id),
+        )
+
         return workflow
 
     def cancel_publish_workflow(self, workflow_id: UUID, account: Account) -> Workflow:
@@ -489,4 +511,10 @@ class WorkflowService(BaseService):
             "status": WorkflowStatus.DRAFT,
         })
 
+        # 4.递增工作流的引用资源版本号及引用了该工作流的应用配置版本号，淘汰对应的应用运行时及配置快照
+        self.app_reference_version_service.bump_version(
+            workflow.id,
+            self.app_reference_version_service.get_workflow_app_ids(workflow.id),
+        )
+
         return workflow
\ No newline at end of file
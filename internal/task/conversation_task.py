@@ -0,0 +1,36 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 22:10
+#Author  :Emcikem
+@File    :conversation_task.py
+"""
+from typing import Any
+from uuid import UUID
+
+from celery import shared_task
+
+
+@shared_task
+def save_agent_thoughts(
+        account_id: str,
+        app_id: str,
+        app_config: dict[str, Any],
+        conversation_id: str,
+        message_id: str,
+        agent_thoughts: list[dict[str, Any]],
+) -> None:
+    """根据传递的序列化推理步骤，批量存储智能体推理步骤并更新消息"""
+    from app.http.module import injector
+    from internal.core.agent.entities.queue_entity import AgentThought
+    from internal.service import ConversationService
+
+    conversation_service = injector.get(ConversationService)
+    conversation_service.save_agent_thoughts(
+        account_id=UUID(account_id),
+        app_id=UUID(app_id),
+        app_config=app_config,
+        conversation_id=UUID(conversation_id),
+        message_id=UUID(message_id),
+        agent_thoughts=[AgentThought.model_validate(agent_thought) for agent_thought in agent_thoughts],
+    )
@@ -16,4 +16,24 @@ def delete_dataset(dataset_id: UUID) -> None:
     from internal.service import IndexingService
 
     indexing_service = injector.get(IndexingService)
-    indexing_service.delete_dataset(dataset_id)
\ No newline at end of file
+    indexing_service.delete_dataset(dataset_id)
+
+@shared_task
+def flush_retrieval_records() -> None:
+    """定时将Redis中缓冲的检索记录批量写入数据库，涵盖知识库查询记录及片段命中次数"""
+    from flask import current_app
+    from app.http.module import injector
+    from internal.service import RetrievalRecordService
+
+    retrieval_record_service = injector.get(RetrievalRecordService)
+    retrieval_record_service.flush(int(current_app.config.get("RETRIEVAL_RECORD_FLUSH_BATCH_SIZE", 1000)))
+
+@shared_task
+def reconcile_dataset_counters() -> None:
+    """定时按实际数据校准知识库及文档的计数字段，修正增量更新过程中产生的偏差"""
+    from flask import current_app
+    from app.http.module import injector
+    from internal.service import DatasetCounterService
+
+    dataset_counter_service = injector.get(DatasetCounterService)
+    dataset_counter_service.reconcile(int(current_app.config.get("DATASET_COUNTER_RECONCILE_BATCH_SIZE", 500)))
@@ -18,14 +18,19 @@ def build_documents(document_ids: list[UUID]) -> None:
     indexing_service = injector.get(IndexingService)
     indexing_service.build_documents(document_ids)
 
-@shared_task
-def update_document_enabled(document_id: UUID) -> None:
-    """根据传递的文档id修改文档的状态"""
+@shared_task(bind=True)
+def update_document_enabled(self, document_id: UUID) -> None:
+    """根据传递的文档id修改文档的状态，异步执行时通过PROGRESS状态上报已同步的节点数"""
     from app.http.module import injector
     from internal.service.indexing_service import IndexingService
 
+    def progress_callback(current: int, total: int) -> None:
+        # 同步调用时不存在任务id，无需上报进度
+        if self.request.id is not None:
+            self.update_state(state="PROGRESS", meta={"current": current, "total": total})
+
     indexing_service = injector.get(IndexingService)
-    indexing_service.update_document_enabled(document_id)
+    indexing_service.update_document_enabled(document_id, progress_callback)
 
 @shared_task
 def delete_document(dataset_id: UUID, document_id: UUID) -> None:
@@ -0,0 +1,10 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 22:30
+#Author  :Emcikem
+@File    :__init__.py.py
+"""
+from .coalescing_executor import CoalescingExecutor
+
+__all__ = ["CoalescingExecutor"]
@@ -0,0 +1,135 @@
+#!/usr/bin/eny python
+# -*- coding: utf-8 -*-
+"""
+@Time    :2026/10/18 22:30
+#Author  :Emcikem
+@File    :coalescing_executor.py
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional
+
+
+@dataclass
+class _Job:
+    """等待执行的任务"""
+    fn: Callable[..., Any]
+    kwargs: dict[str, Any]
+    due_at: float
+    merge: Optional[Callable[[dict[str, Any], dict[str, Any]], dict[str, Any]]] = None
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+class CoalescingExecutor:
+    """有界的合并执行器，固定数量的工作线程执行后台任务，同一个key同时最多存在一个等待任务和一个执行中任务，
+    等待期间重复提交的任务会合并成一个(默认保留最新的参数)，等待队列已满时新任务直接丢弃"""
+
+    def __init__(
+            self,
+            max_workers: int = 4,
+            max_pending: int = 1000,
+            thread_name_prefix: str = "coalescing_executor",
+    ):
+        """构造函数，工作线程在第一次提交任务时启动"""
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.thread_name_prefix = thread_name_prefix
+        self._pending: dict[Hashable, _Job] = {}
+        self._running: set[Hashable] = set()
+        self._condition = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._counters = {"submitted": 0, "merged": 0, "dropped": 0, "completed": 0, "failed": 0}
+
+    def submit(
+            self,
+            key: Hashable,
+            fn: Callable[..., Any],
+            delay: float = 0,
+            merge: Callable[[dict[str, Any], dict[str, Any]], dict[str, Any]] = None,
+            **kwargs: Any,
+    ) -> bool:
+        """提交一个后台任务，delay秒后才会执行(防抖)，key已有等待任务时按merge合并参数并重新计时，
+        返回任务是否被接收"""
+        with self._condition:
+            self._counters["submitted"] += 1
+            due_at = time.monotonic() + delay
+
+            # 1.存在同key的等待任务时合并参数，防抖时间以最后一次提交为准
+            job = self._pending.get(key)
+            if job is not None:
+                job.kwargs = job.merge(job.kwargs, kwargs) if job.merge else kwargs
+                job.fn = fn
+                job.due_at = due_at
+                self._counters["merged"] += 1
+                self._condition.notify()
+                return True
+
+            # 2.等待队列已满时丢弃任务
+            if len(self._pending) >= self.max_pending:
+                self._counters["dropped"] += 1
+                print(f"{self.thread_name_prefix}等待队列已满，丢弃任务: {key}, 统计: {self._stats()}")
+                return False
+
+            # 3.添加等待任务并唤醒工作线程
+            self._pending[key] = _Job(fn=fn, kwargs=kwargs, due_at=due_at, merge=merge)
+            self._start_workers()
+            self._condition.notify()
+            return True
+
+    def stats(self) -> dict[str, int]:
+        """返回执行器的统计信息，涵盖等待队列深度、执行中任务数以及提交/合并/丢弃/完成/失败计数"""
+        with self._condition:
+            return self._stats()
+
+    def _stats(self) -> dict[str, int]:
+        """在持有锁的情况下汇总统计信息"""
+        return {"queue_depth": len(self._pending), "running": len(self._running), **self._counters}
+
+    def _start_workers(self) -> None:
+        """按需启动工作线程，需要在持有锁的情况下调用"""
+        while len(self._threads) < self.max_workers:
+            thread = threading.Thread(
+                target=self._work,
+                name=f"{self.thread_name_prefix}_{len(self._threads)}",
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_job(self) -> tuple[Hashable, _Job]:
+        """阻塞获取下一个可执行的任务，跳过未到执行时间以及同key正在执行的任务"""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                ready_key, wait_timeout = None, None
+                for key, job in self._pending.items():
+                    if key in self._running:
+                        continue
+                    if job.due_at <= now:
+                        if ready_key is None or job.due_at < self._pending[ready_key].due_at:
+                            ready_key = key
+                    elif wait_timeout is None or job.due_at - now < wait_timeout:
+                        wait_timeout = job.due_at - now
+
+                if ready_key is not None:
+                    self._running.add(ready_key)
+                    return ready_key, self._pending.pop(ready_key)
+                self._condition.wait(wait_timeout)
+
+    def _work(self) -> None:
+        """工作线程循环执行任务，任务异常只记录日志不影响后续任务"""
+        while True:
+            key, job = self._next_job()
+            try:
+                job.fn(**job.kwargs)
+                succeeded = True
+            except Exception as e:
+                succeeded = False
+                print(f"{self.thread_name_prefix}执行任务失败: {key}, 错误信息: {str(e)}")
+
+            with self._condition:
+                self._running.discard(key)
+                self._counters["completed" if succeeded else "failed"] += 1
+                # 同key可能有在执行期间提交的等待任务，唤醒其他工作线程
+                self._condition.notify_all()